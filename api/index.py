@@ -1,110 +1,33 @@
-from fastapi import FastAPI, Query
-from pydantic import BaseModel
-from typing import List, Optional
+import os
+import sys
+
+# The retrieval/serving engine is shared with the uvicorn app: models, corpus
+# builder, retriever and LLM client (backend/rag.py), search client
+# (backend/federation.py) and the chat/prefetch/admin handlers
+# (backend/serving.py) come from the backend package, which vercel.json
+# bundles into this function. The repository root goes on the path, not
+# backend/, so its modules cannot shadow installed packages of the same name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
-
-# RAG system - inline implementation (no imports needed)
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    OpenAI = None
-
-# Simple in-memory document store
-_DOCS: list = []
-
-def ingest_corpus(docs: list) -> None:
-    """Store documents in memory"""
-    global _DOCS
-    _DOCS = docs
-    print(f"✅ Ingested {len(docs)} documents")
-
-def answer_question(query: str, language: str = "es", **kwargs) -> dict:
-    """Answer a question using the ingested documents and OpenAI"""
-    import os
-    
-    # Get translations for the specified language
-    t = TRANSLATIONS.get(language, TRANSLATIONS["es"])
-    
-    if not OPENAI_AVAILABLE:
-        return {
-            "answer": "OpenAI SDK not available.",
-            "sources": []
-        }
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return {
-            "answer": t["no_api_key"],
-            "sources": []
-        }
-    
-    try:
-        # Simple keyword-based search
-        query_lower = query.lower()
-        relevant_docs = []
-        
-        for doc in _DOCS:
-            text_lower = doc.get("text", "").lower()
-            score = sum(1 for word in query_lower.split() if word in text_lower)
-            if score > 0:
-                relevant_docs.append((score, doc))
-        
-        # Sort by score and take top 3
-        relevant_docs.sort(reverse=True, key=lambda x: x[0])
-        top_docs = [doc for _, doc in relevant_docs[:3]]
-        
-        # Build context
-        context = "\n\n".join([
-            f"Sección: {doc['section']}\n{doc['text']}"
-            for doc in top_docs
-        ])
-        
-        # Call OpenAI
-        client = OpenAI(api_key=api_key)
-        
-        system_prompt = t["system_prompt"]
-        
-        user_prompt = f"""{t["context_prefix"]}
-{context}
-
-{t["question_prefix"]} {query}
-
-{t["answer_instruction"]}"""
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=300
-        )
-        
-        answer = response.choices[0].message.content
-        sources = [doc['section'] for doc in top_docs]
-        
-        return {
-            "answer": answer,
-            "sources": sources
-        }
-        
-    except Exception as e:
-        error_msg = {
-            "es": f"Error al procesar tu pregunta: {str(e)[:100]}",
-            "pt": f"Erro ao processar sua pergunta: {str(e)[:100]}",
-            "en": f"Error processing your question: {str(e)[:100]}"
-        }
-        return {
-            "answer": error_msg.get(language, error_msg["es"]),
-            "sources": []
-        }
-
-RAG_AVAILABLE = OPENAI_AVAILABLE
-
+from typing import Optional
+from functools import lru_cache
+import json
+
+from backend.rag import ingest_or_restore, corpus_version, prompt_prefix
+from backend.metrics import REGISTRY, CONTENT_TYPE, ServerTimingMiddleware, count_event
+from backend.serialization import FastJSONResponse, json_response
+from backend.compression import Precompressed
+from backend.faqs import FAQ_TABLE_PATH, FAQTable, top_faqs
+from backend.limits import Overloaded
+from backend.models import (
+    ChatRequest, CharacteristicRating, ItemDetail, PageResponse, PaymentMethod, PrefetchRequest,
+    RatingBreakdown, Review, ReviewsData, SearchRequest, SearchResponse, SellerInfo,
+)
+from backend.corpus import build_corpus, product_sheets
+from backend.federation import SearchNotConfigured
+from backend.serving import chat, chat_response, prefetch_status, profile_response, require_admin, search_response
 
 # Translation dictionaries
 TRANSLATIONS = {
@@ -119,14 +42,8 @@ TRANSLATIONS = {
         "char2": "Calidad de la cámara",
         "char3": "Duración de la batería",
         "char4": "Durabilidad",
-        "system_prompt": "Eres un asistente de compras inteligente. Responde preguntas sobre el producto basándote ÚNICAMENTE en la información proporcionada. Si no tienes información suficiente, dilo claramente. Responde en español de manera concisa y útil.",
         "no_api_key": "Por favor, proporciona tu clave de API de OpenAI para usar el chat con IA.",
-        "context_prefix": "Contexto del producto:",
-        "question_prefix": "Pregunta del usuario:",
-        "answer_instruction": "Responde basándote en el contexto proporcionado:",
         "verified_user": "Usuario verificado",
-        "days_ago": "Hace {} días",
-        "weeks_ago": "Hace {} semana" if 1 else "Hace {} semanas",
         "review1": "Destaca por su cámara espectacular que captura fotos de alta calidad. Su rendimiento es excelente, con un procesador veloz y una batería duradera que cumple con las expectativas de los usuarios. Además, su diseño es atractivo y el teléfono es intuitivo y fácil de usar, lo que lo convierte en una opción muy recomendable.",
         "review2": "Es hermoso la cámara un espectáculo,y dura un montón la bacteria.",
         "review3": "Venía de un a54 y se nota mucho la diferencia con el nuevo procesador, si bien es un exynos, está versión cuenta con un gpu de tecnología amd. Se nota un mejor rendimiento y administración de energía. Además, no tiene tanto calentamiento como la versión anterior. Si bien no es un snapdragon, se notan mucho los cambios de una versión a la otra.",
@@ -151,14 +68,8 @@ TRANSLATIONS = {
         "char2": "Qualidade da câmera",
         "char3": "Duração da bateria",
         "char4": "Durabilidade",
-        "system_prompt": "Você é um assistente de compras inteligente. Responda perguntas sobre o produto baseando-se APENAS nas informações fornecidas. Se não tiver informações suficientes, diga claramente. Responda em português de forma concisa e útil.",
         "no_api_key": "Por favor, forneça sua chave da API OpenAI para usar o chat com IA.",
-        "context_prefix": "Contexto do produto:",
-        "question_prefix": "Pergunta do usuário:",
-        "answer_instruction": "Responda com base no contexto fornecido:",
         "verified_user": "Usuário verificado",
-        "days_ago": "Há {} dias",
-        "weeks_ago": "Há {} semana" if 1 else "Há {} semanas",
         "review1": "Destaca-se pela sua câmera espetacular que captura fotos de alta qualidade. Seu desempenho é excelente, com um processador rápido e uma bateria durável que atende às expectativas dos usuários. Além disso, seu design é atraente e o telefone é intuitivo e fácil de usar, tornando-o uma opção muito recomendável.",
         "review2": "É lindo, a câmera é um espetáculo e a bateria dura muito.",
         "review3": "Vinha de um A54 e nota-se muito a diferença com o novo processador, embora seja um Exynos, esta versão tem uma GPU de tecnologia AMD. Nota-se melhor desempenho e gestão de energia. Além disso, não aquece tanto quanto a versão anterior. Embora não seja um Snapdragon, as mudanças de uma versão para outra são muito notáveis.",
@@ -183,14 +94,8 @@ TRANSLATIONS = {
         "char2": "Camera quality",
         "char3": "Battery life",
         "char4": "Durability",
-        "system_prompt": "You are an intelligent shopping assistant. Answer questions about the product based ONLY on the information provided. If you don't have enough information, say so clearly. Respond in English concisely and helpfully.",
         "no_api_key": "Please provide your OpenAI API key to use the AI chat.",
-        "context_prefix": "Product context:",
-        "question_prefix": "User question:",
-        "answer_instruction": "Answer based on the provided context:",
         "verified_user": "Verified user",
-        "days_ago": "{} days ago",
-        "weeks_ago": "{} week ago" if 1 else "{} weeks ago",
         "review1": "It stands out for its spectacular camera that captures high-quality photos. Its performance is excellent, with a fast processor and long-lasting battery that meets user expectations. Additionally, its design is attractive and the phone is intuitive and easy to use, making it a highly recommended option.",
         "review2": "It's beautiful, the camera is spectacular, and the battery lasts a long time.",
         "review3": "I came from an A54 and the difference with the new processor is very noticeable. Although it's an Exynos, this version has an AMD technology GPU. You can notice better performance and power management. Also, it doesn't heat up as much as the previous version. While it's not a Snapdragon, the changes from one version to another are very noticeable.",
@@ -207,70 +112,53 @@ TRANSLATIONS = {
 }
 
 
-class PaymentMethod(BaseModel):
-    type: str
-    description: str
-
+app = FastAPI(title="GenAI Product Assistant API", default_response_class=FastJSONResponse)
 
-class SellerInfo(BaseModel):
-    name: str
-    reputation: str
-    sales: int
-
-
-class Review(BaseModel):
-    id: str
-    rating: int
-    text: str
-    author: str
-    date: str
-    verified_purchase: bool = False
-
-
-class RatingBreakdown(BaseModel):
-    five_stars: int
-    four_stars: int
-    three_stars: int
-    two_stars: int
-    one_star: int
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allow all origins for Vercel
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
+)
+app.add_middleware(ServerTimingMiddleware)
 
 
-class CharacteristicRating(BaseModel):
-    name: str
-    rating: float
+@app.exception_handler(Overloaded)
+async def _overloaded_handler(request: Request, exc: Overloaded):
+    # Shed load early with a retry hint instead of queueing until a timeout
+    return FastJSONResponse(
+        {"detail": "Service is busy, please retry", "limit": exc.limit},
+        status_code=429,
+        headers={"Retry-After": exc.retry_after_header},
+    )
 
 
-class ReviewsData(BaseModel):
-    overall_rating: float
-    total_reviews: int
-    rating_breakdown: RatingBreakdown
-    characteristic_ratings: List[CharacteristicRating]
-    reviews: List[Review]
+@app.exception_handler(SearchNotConfigured)
+async def _search_not_configured_handler(request: Request, exc: SearchNotConfigured):
+    return FastJSONResponse({"detail": "Search is not configured"}, status_code=503)
 
 
-class ItemDetail(BaseModel):
-    id: str
-    title: str
-    description: str
-    price: float
-    currency: str
-    images: List[str]
-    payment_methods: List[PaymentMethod]
-    seller: SellerInfo
-    stock: int
-    ratings: float
-    reviews_count: int
+@app.post("/py-api/admin/profile", include_in_schema=False)
+@app.post("/admin/profile", include_in_schema=False)  # Keep both for compatibility
+async def profile_endpoint(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    include_idle: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+) -> Response:
+    """Profile for `seconds` and return collapsed stacks; 404 unless
+    ADMIN_TOKEN is set and sent as X-Admin-Token"""
+    require_admin(x_admin_token)
+    return await profile_response(seconds, interval_ms, include_idle)
 
 
-app = FastAPI(title="GenAI Product Assistant API")
+@app.get("/py-api/metrics", include_in_schema=False)
+@app.get("/metrics", include_in_schema=False)  # Keep both for compatibility
+def metrics_endpoint() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for Vercel
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 SAMPLE_ITEM = ItemDetail(
     id="MLA123456",
@@ -373,11 +261,18 @@ REVIEWS_DATA = ReviewsData(
 
 @app.get("/py-api/item", response_model=ItemDetail)
 @app.get("/item", response_model=ItemDetail)  # Keep both for compatibility
-def get_item_detail(lang: str = Query("es", regex="^(es|pt|en)$")) -> ItemDetail:
+def get_item_detail(request: Request, lang: str = Query("es", regex="^(es|pt|en)$")) -> Response:
     """Get item details in the specified language"""
+    return _localized_payload("item", lang).response(request)
+
+
+@lru_cache(maxsize=None)
+def _localized_item(lang: str) -> ItemDetail:
+    """Item in the given language, built once per language from trusted data
+    (model_construct skips validation; the result must not be mutated)"""
     t = TRANSLATIONS.get(lang, TRANSLATIONS["es"])
     
-    return ItemDetail(
+    return ItemDetail.model_construct(
         id=SAMPLE_ITEM.id,
         title=t["title"],
         description=t["description"],
@@ -385,10 +280,10 @@ def get_item_detail(lang: str = Query("es", regex="^(es|pt|en)$")) -> ItemDetail
         currency=SAMPLE_ITEM.currency,
         images=SAMPLE_ITEM.images,
         payment_methods=[
-            PaymentMethod(type="credit_card", description=t["payment1"]),
-            PaymentMethod(type="credit_card", description=t["payment2"]),
-            PaymentMethod(type="transfer", description=t["payment3"]),
-            PaymentMethod(type="mercado_credito", description=t["payment4"]),
+            PaymentMethod.model_construct(type="credit_card", description=t["payment1"]),
+            PaymentMethod.model_construct(type="credit_card", description=t["payment2"]),
+            PaymentMethod.model_construct(type="transfer", description=t["payment3"]),
+            PaymentMethod.model_construct(type="mercado_credito", description=t["payment4"]),
         ],
         seller=SAMPLE_ITEM.seller,
         stock=SAMPLE_ITEM.stock,
@@ -399,13 +294,19 @@ def get_item_detail(lang: str = Query("es", regex="^(es|pt|en)$")) -> ItemDetail
 
 @app.get("/py-api/reviews", response_model=ReviewsData)
 @app.get("/reviews", response_model=ReviewsData)  # Keep both for compatibility
-def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
+def get_reviews(request: Request, lang: str = Query("es", regex="^(es|pt|en)$")) -> Response:
     """Get reviews in the specified language"""
+    return _localized_payload("reviews", lang).response(request)
+
+
+@lru_cache(maxsize=None)
+def _localized_reviews(lang: str) -> ReviewsData:
+    """Reviews in the given language, built once per language (see _localized_item)"""
     t = TRANSLATIONS.get(lang, TRANSLATIONS["es"])
     
     # Translate reviews
     translated_reviews = [
-        Review(
+        Review.model_construct(
             id="1",
             rating=5,
             text=t["review1"],
@@ -413,7 +314,7 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
             date=t["date1"],
             verified_purchase=True,
         ),
-        Review(
+        Review.model_construct(
             id="2",
             rating=5,
             text=t["review2"],
@@ -421,7 +322,7 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
             date=t["date2"],
             verified_purchase=True,
         ),
-        Review(
+        Review.model_construct(
             id="3",
             rating=5,
             text=t["review3"],
@@ -429,7 +330,7 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
             date=t["date3"],
             verified_purchase=True,
         ),
-        Review(
+        Review.model_construct(
             id="4",
             rating=5,
             text=t["review4"],
@@ -437,7 +338,7 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
             date=t["date4"],
             verified_purchase=True,
         ),
-        Review(
+        Review.model_construct(
             id="5",
             rating=5,
             text=t["review5"],
@@ -445,7 +346,7 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
             date=t["date5"],
             verified_purchase=True,
         ),
-        Review(
+        Review.model_construct(
             id="6",
             rating=5,
             text=t["review6"],
@@ -455,162 +356,91 @@ def get_reviews(lang: str = Query("es", regex="^(es|pt|en)$")) -> ReviewsData:
         ),
     ]
     
-    return ReviewsData(
+    return ReviewsData.model_construct(
         overall_rating=REVIEWS_DATA.overall_rating,
         total_reviews=REVIEWS_DATA.total_reviews,
         rating_breakdown=REVIEWS_DATA.rating_breakdown,
         characteristic_ratings=[
-            CharacteristicRating(name=t["char1"], rating=4.5),
-            CharacteristicRating(name=t["char2"], rating=4.5),
-            CharacteristicRating(name=t["char3"], rating=4.5),
-            CharacteristicRating(name=t["char4"], rating=4.5),
+            CharacteristicRating.model_construct(name=t["char1"], rating=4.5),
+            CharacteristicRating.model_construct(name=t["char2"], rating=4.5),
+            CharacteristicRating.model_construct(name=t["char3"], rating=4.5),
+            CharacteristicRating.model_construct(name=t["char4"], rating=4.5),
         ],
         reviews=translated_reviews,
     )
 
 
-class ChatRequest(BaseModel):
-    question: str
-    openai_key: str = None
-    language: str = "es"
-
-
-class SearchResult(BaseModel):
-    title: str
-    url: str
-    content: str
-    score: Optional[float] = None
-
+@lru_cache(maxsize=None)
+def _localized_payload(kind: str, lang: str) -> Precompressed:
+    """Serialized and precompressed payload per (kind, language); the endpoints
+    return it directly, skipping response_model validation and re-encoding,
+    and answer revalidations with 304"""
+    if kind == "page":
+        # Composite bootstrap payload, spliced from the cached sections
+        faqs = json.dumps(top_faqs(_localized_item(lang), lang), ensure_ascii=False).encode("utf-8")
+        return Precompressed(b'{"item":' + _localized_payload("item", lang).body + b',"reviews":'
+                             + _localized_payload("reviews", lang).body + b',"faqs":' + faqs + b"}")
+    model = _localized_item(lang) if kind == "item" else _localized_reviews(lang)
+    return Precompressed(model.model_dump_json().encode("utf-8"))
 
-class SearchRequest(BaseModel):
-    query: str
 
-
-class SearchResponse(BaseModel):
-    results: List[SearchResult]
+@app.get("/py-api/page/{item_id}", response_model=PageResponse)
+@app.get("/page/{item_id}", response_model=PageResponse)  # Keep both for compatibility
+def get_page(request: Request, item_id: str, lang: str = Query("es", regex="^(es|pt|en)$")) -> Response:
+    """Item, reviews and suggested Q&A in one response (one invocation per page load)"""
+    if item_id != SAMPLE_ITEM.id:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return _localized_payload("page", lang).response(request)
 
 
 @app.on_event("startup")
 def _bootstrap_vectors() -> None:
-    # Build a tiny in-memory corpus from existing sections
-    if RAG_AVAILABLE:
-        docs = [
-            {"id": "title", "section": "Título", "text": SAMPLE_ITEM.title},
-            {"id": "desc", "section": "Descripción", "text": SAMPLE_ITEM.description},
-            {
-                "id": "specs",
-                "section": "Características del producto",
-                "text": "\n".join([f"{c.name}: {c.rating}★" for c in REVIEWS_DATA.characteristic_ratings]),
-            },
-            {
-                "id": "seller",
-                "section": "Vendedor",
-                "text": f"{SAMPLE_ITEM.seller.name} reputación {SAMPLE_ITEM.seller.reputation} ventas {SAMPLE_ITEM.seller.sales}",
-            },
-            {
-                "id": "payments",
-                "section": "Medios de pago",
-                "text": ", ".join([m.description for m in SAMPLE_ITEM.payment_methods]),
-            },
-            {
-                "id": "reviews",
-                "section": "Opiniones destacadas",
-                "text": "\n\n".join([r.text for r in REVIEWS_DATA.reviews]),
-            },
-        ]
-        ingest_corpus(docs)
+    _ensure_docs()
+
+
+def _ensure_docs() -> None:
+    # Serverless instances may skip startup hooks; ingest on first use then
+    if corpus_version() is not None:
+        return
+    ingest_or_restore(build_corpus(SAMPLE_ITEM, REVIEWS_DATA), product_sheet=product_sheets(SAMPLE_ITEM))
 
 
 @app.post("/py-api/search", response_model=SearchResponse)
 @app.post("/search", response_model=SearchResponse)  # Keep both for compatibility
 async def search_endpoint(payload: SearchRequest):
-    """Search Amazon using Tavily API - defaults to amazon.com"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                json={
-                    "api_key": "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",
-                    "query": f"{payload.query} site:amazon.com -wikipedia -wikimedia",
-                    "search_depth": "basic",
-                    "include_answer": False,
-                    "include_images": False,
-                    "include_raw_content": False,
-                    "max_results": 7
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get("results", [])[:7]:
-                    results.append(SearchResult(
-                        title=item.get("title", ""),
-                        url=item.get("url", ""),
-                        content=item.get("content", ""),
-                        score=item.get("score")
-                    ))
-                
-                return SearchResponse(results=results)
-            else:
-                return SearchResponse(results=[])
-                
-    except Exception as e:
-        print(f"Search error: {e}")
-        return SearchResponse(results=[])
+    """Search MercadoLibre (and the other SEARCH_PROVIDERS) using Tavily API"""
+    return await search_response(payload)
+
+
+# Answers precomputed offline by `python -m backend.faqs` (FAQ_TABLE_PATH);
+# empty when no table is bundled with the function
+FAQ_TABLE = FAQTable.load(FAQ_TABLE_PATH)
 
 
 @app.post("/py-api/agent/chat")
 @app.post("/agent/chat")  # Keep both for compatibility
 def chat_endpoint(payload: ChatRequest):
-    # Ensure documents are ingested (serverless might not preserve state)
-    if len(_DOCS) == 0:
-        docs = [
-            {"id": "title", "section": "Título", "text": SAMPLE_ITEM.title},
-            {"id": "desc", "section": "Descripción", "text": SAMPLE_ITEM.description},
-            {
-                "id": "specs",
-                "section": "Características del producto",
-                "text": "\n".join([f"{c.name}: {c.rating}★" for c in REVIEWS_DATA.characteristic_ratings]),
-            },
-            {
-                "id": "seller",
-                "section": "Vendedor",
-                "text": f"{SAMPLE_ITEM.seller.name} reputación {SAMPLE_ITEM.seller.reputation} ventas {SAMPLE_ITEM.seller.sales}",
-            },
-            {
-                "id": "payments",
-                "section": "Medios de pago",
-                "text": ", ".join([m.description for m in SAMPLE_ITEM.payment_methods]),
-            },
-            {
-                "id": "reviews",
-                "section": "Opiniones destacadas",
-                "text": "\n\n".join([r.text for r in REVIEWS_DATA.reviews]),
-            },
-        ]
-        ingest_corpus(docs)
-        print(f"✅ Documents ingested on-demand: {len(docs)} docs")
-    
-    # Temporarily set the API key if provided
-    import os
-    original_key = os.environ.get("OPENAI_API_KEY")
-    if payload.openai_key:
-        os.environ["OPENAI_API_KEY"] = payload.openai_key
-    
-    try:
-        result = answer_question(payload.question, language=payload.language, top_k=4)
-        return result
-    finally:
-        # Restore original key
-        if original_key:
-            os.environ["OPENAI_API_KEY"] = original_key
-        elif "OPENAI_API_KEY" in os.environ:
-            del os.environ["OPENAI_API_KEY"]
+    return chat_response(payload, _chat)
 
 
-# No special handler needed - Vercel handles FastAPI directly
+def _chat(payload: ChatRequest) -> dict:
+    # Factual lookups are answered from the localized item; serverless
+    # instances may not preserve state, so the corpus is ingested on demand
+    no_key_answer = TRANSLATIONS.get(payload.language, TRANSLATIONS["es"])["no_api_key"]
+    return chat(payload, _localized_item(payload.language), FAQ_TABLE, refresh=_ensure_docs,
+                no_key_answer=no_key_answer)
+
 
+@app.post("/py-api/agent/prefetch")
+@app.post("/agent/prefetch")  # Keep both for compatibility
+def prefetch_endpoint(payload: PrefetchRequest):
+    """Warm this function instance while the question is typed: corpus,
+    prompt prefix and the question's embedding/retrieval."""
+    _ensure_docs()
+    prompt_prefix(payload.language)
+    status = prefetch_status(payload, _localized_item(payload.language), FAQ_TABLE, refresh=_ensure_docs)
+    count_event("prefetch", status)
+    return json_response({"status": status})
+
+
+# No special handler needed - Vercel handles FastAPI directly
@@ -0,0 +1,12 @@
+"""
+GenAI Product Assistant backend.
+
+A package so both apps import it under one namespace (`backend.rag`,
+`backend.metrics`, ...) instead of putting flat module names such as
+`metrics` or `limits` on sys.path, where they would shadow PyPI packages of
+the same name. Run it from the repository root:
+
+    uvicorn backend.main:app
+
+or through asgi.py where backend/ itself is the project root (backend/vercel.json).
+"""
@@ -0,0 +1,19 @@
+"""
+Entry point for serving backend/ as the project root, as the standalone
+Vercel deploy (backend/vercel.json) does: the directory is loaded as the
+`backend` package, so its relative imports resolve. From the repository
+root, `uvicorn backend.main:app` is equivalent.
+"""
+import importlib.util
+import os
+import sys
+
+if "backend" not in sys.modules:
+    _here = os.path.dirname(os.path.abspath(__file__))
+    _spec = importlib.util.spec_from_file_location(
+        "backend", os.path.join(_here, "__init__.py"), submodule_search_locations=[_here]
+    )
+    sys.modules["backend"] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules["backend"])
+
+from backend.main import app  # noqa: E402,F401
@@ -0,0 +1 @@
+# Benchmarks package for the GenAI Product Assistant backend
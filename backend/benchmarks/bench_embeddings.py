@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark: recall@k and latency of the embedding backends.
+
+Runs a small labelled question set against the product corpus built by
+main.py with the keyword fallback, the local hashing embedder and (when
+OPENAI_API_KEY is set) the OpenAI embedder.
+
+Usage:
+    python benchmarks/bench_embeddings.py [--k 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag  # noqa: E402
+from backend.main import SAMPLE_ITEM, _bootstrap_vectors  # noqa: E402
+
+
+# (question, id of the doc that answers it)
+EVAL_SET = [
+    ("¿Qué procesador tiene?", "desc"),
+    ("¿De cuánto es la batería?", "desc"),
+    ("¿Cómo es la pantalla?", "desc"),
+    ("¿Tiene carga rápida?", "desc"),
+    ("¿Cuál es el nombre del modelo?", "title"),
+    ("¿Qué color es?", "title"),
+    ("¿Es 5G?", "title"),
+    ("¿Qué reputación tiene el vendedor?", "seller"),
+    ("¿Cuántas ventas tiene la tienda?", "seller"),
+    ("¿Se puede pagar con transferencia?", "payments"),
+    ("¿Tiene cuotas sin interés?", "payments"),
+    ("¿Acepta Mercado Crédito?", "payments"),
+    ("¿Cómo puntúan la calidad de la cámara?", "specs"),
+    ("¿Qué tal la durabilidad?", "specs"),
+    ("¿Qué opinan los compradores?", "reviews"),
+    ("¿Se calienta mucho?", "reviews"),
+    ("¿Llega rápido el envío?", "reviews"),
+]
+
+
+def _rank_keyword(question: str, k: int) -> list:
+    return [rag._DOCS[i]["id"] for _, i in rag.keyword_search(question, k)]
+
+
+def _bench_embedder(embedder, k: int) -> dict:
+    docs = rag._DOCS
+    start = time.perf_counter()
+    matrix = np.array(embedder.embed_documents([d["text"] for d in docs]), dtype=np.float32)
+    ingest_ms = (time.perf_counter() - start) * 1000
+
+    def rank(question: str) -> list:
+        q_vec = np.array(embedder.embed_query(question), dtype=np.float32)
+        sims = rag._cosine_sim(matrix, q_vec)
+        return [docs[i]["id"] for i in np.argsort(-sims)[:k]]
+
+    result = _evaluate(rank, k)
+    result["ingest_ms"] = round(ingest_ms, 2)
+    return result
+
+
+def _evaluate(rank, k: int) -> dict:
+    hits_at_1 = hits_at_k = 0
+    latencies = []
+    for question, expected in EVAL_SET:
+        start = time.perf_counter()
+        ranked = rank(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits_at_1 += bool(ranked) and ranked[0] == expected
+        hits_at_k += expected in ranked
+    return {
+        "recall@1": round(hits_at_1 / len(EVAL_SET), 3),
+        f"recall@{k}": round(hits_at_k / len(EVAL_SET), 3),
+        "query_ms_p50": round(statistics.median(latencies), 3),
+        "query_ms_max": round(max(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval backends on the product corpus")
+    parser.add_argument("--k", type=int, default=3, help="Cut-off for recall@k")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    api_key = os.environ.pop("OPENAI_API_KEY", None)
+    _bootstrap_vectors()
+
+    results = {
+        "keyword": _evaluate(lambda q: _rank_keyword(q, args.k), args.k),
+        "local (hashing-512)": _bench_embedder(rag.HashingEmbeddings(dim=512), args.k),
+        "local (hashing-2048)": _bench_embedder(rag.HashingEmbeddings(dim=2048), args.k),
+    }
+    if api_key:
+        results["openai (text-embedding-3-small)"] = _bench_embedder(
+            rag.OpenAIEmbeddings(api_key=api_key), args.k
+        )
+    else:
+        results["openai (text-embedding-3-small)"] = {"skipped": "OPENAI_API_KEY not set"}
+
+    if args.json:
+        print(json.dumps({"item": SAMPLE_ITEM.id, "questions": len(EVAL_SET), "results": results}, indent=2))
+        return
+
+    print(f"{len(EVAL_SET)} questions, {len(rag._DOCS)} docs")
+    for name, result in results.items():
+        print(f"{name:<34} " + "  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+HTTP benchmark: latency percentiles and throughput of the API endpoints.
+
+Drives /item, /reviews, /search and /agent/chat either in-process (httpx
+ASGI transport, no sockets) or against a real uvicorn process, at several
+concurrency levels. OpenAI and Tavily are replaced by local stubs with
+configurable latency, so results are reproducible and free.
+
+Usage:
+    python benchmarks/bench_http.py [--mode inprocess|uvicorn|both] \\
+        [--concurrency 1 8 32] [--requests 200] \\
+        [--openai-latency-ms 50] [--tavily-latency-ms 120] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT_DIR)
+
+from backend.benchmarks.stubs import StubServer, free_port  # noqa: E402
+
+
+ENDPOINTS = {
+    "item": ("GET", "/item", None),
+    "reviews": ("GET", "/reviews", None),
+    "page": ("GET", "/page/MLA123456", None),
+    "search": ("POST", "/search", {"query": "samsung galaxy a55"}),
+    "chat": ("POST", "/agent/chat", {"question": "¿Cómo es la cámara del teléfono?"}),
+}
+
+
+async def run_load(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int) -> dict:
+    """Send `total` requests with `concurrency` workers; return latency stats."""
+    method, path, body = ENDPOINTS[endpoint]
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            issued += 1
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    values = np.array(latencies)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
+
+
+async def bench_client(client: httpx.AsyncClient, args) -> list:
+    results = []
+    for endpoint in args.endpoints:
+        for _ in range(args.warmup):
+            await run_load(client, endpoint, 1, 1)
+        for concurrency in args.concurrency:
+            results.append(await run_load(client, endpoint, concurrency, args.requests))
+    return results
+
+
+async def bench_inprocess(args) -> list:
+    from backend import main
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            return await bench_client(client, args)
+    finally:
+        await main.app.router.shutdown()
+
+
+async def bench_uvicorn(args, env: dict) -> list:
+    port = free_port()
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+            deadline = time.time() + 20
+            while True:
+                try:
+                    if (await client.get("/item")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.1)
+            return await bench_client(client, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP API against stubbed upstreams")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="both")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--openai-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tavily-latency-ms", type=float, default=120.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args()
+
+    stub = StubServer(
+        latency_ms={"openai": args.openai_latency_ms, "tavily": args.tavily_latency_ms},
+        jitter_ms=args.jitter_ms,
+    ).start()
+    # Configure before main is imported; upstream URLs are read at import time
+    os.environ.update(stub.env())
+    report = {
+        "revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": {},
+    }
+    try:
+        if args.mode in ("inprocess", "both"):
+            report["results"]["inprocess"] = asyncio.run(bench_inprocess(args))
+        if args.mode in ("uvicorn", "both"):
+            report["results"]["uvicorn"] = asyncio.run(bench_uvicorn(args, dict(os.environ)))
+    finally:
+        stub.stop()
+    report["upstream_requests"] = stub.requests
+
+    if args.json:
+        output = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(output)
+        else:
+            with open(args.json, "w") as f:
+                f.write(output + "\n")
+    for mode, results in report["results"].items():
+        print(f"\n[{mode}] revision {report['revision']}")
+        print(f"{'endpoint':<10} {'conc':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for r in results:
+            print(
+                f"{r['endpoint']:<10} {r['concurrency']:>5} {r['rps']:>8} {r['p50_ms']:>9} "
+                f"{r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
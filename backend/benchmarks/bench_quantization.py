@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Quantization benchmark: memory, recall@k and query latency of the vector
+storage modes (float32 / float16 / int8) on a synthetic clustered corpus,
+alone and combined with truncated (Matryoshka) candidate dimensions.
+
+Recall is measured against exact full-dimension float32 search, with and
+without the float32 re-rank of the candidate set.
+
+Usage:
+    python benchmarks/bench_quantization.py [--docs 20000] [--dims 1536] \
+        [--candidate-dims 256 512] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import quantization  # noqa: E402
+
+
+def synthetic_corpus(docs: int, dims: int, queries: int, seed: int = 0):
+    """Clustered unit vectors (like topical product docs) and nearby queries.
+
+    Variance decays along the dimensions, as in Matryoshka-trained
+    embeddings where the leading components carry most of the signal.
+    """
+    rng = np.random.default_rng(seed)
+    decay = (1.0 / np.sqrt(1.0 + np.arange(dims) / 64.0)).astype(np.float32)
+    centers = rng.standard_normal((max(1, docs // 50), dims)).astype(np.float32) * decay
+    assignment = rng.integers(0, len(centers), size=docs)
+    corpus = centers[assignment] + 0.6 * rng.standard_normal((docs, dims)).astype(np.float32)
+    picks = rng.integers(0, docs, size=queries)
+    query_vecs = corpus[picks] + 0.8 * rng.standard_normal((queries, dims)).astype(np.float32)
+    return quantization.normalize(corpus), quantization.normalize(query_vecs)
+
+
+def bench_mode(mode, corpus, queries, k, candidates, truth, candidate_dims=0):
+    if mode == "float32" and not candidate_dims:
+        codes, scales, resident = corpus, None, corpus.nbytes
+    else:
+        stage = quantization.truncate(corpus, candidate_dims) if candidate_dims else corpus
+        codes, scales = quantization.quantize(stage, mode)
+        # Full float32 vectors stay memory-mapped except in float32 mode
+        resident = quantization.resident_bytes(codes, scales)
+        if mode == "float32":
+            resident += corpus.nbytes
+
+    recall_approx = recall_rerank = 0.0
+    latencies = []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        if mode == "float32" and not candidate_dims:
+            found = quantization.top_indices(corpus @ q, k)
+            approx_found = found
+        else:
+            stage_q = quantization.truncate(q, candidate_dims) if candidate_dims else q
+            approx = quantization.approximate_scores(codes, scales, stage_q)
+            cand = np.sort(quantization.top_indices(approx, max(k, candidates)))
+            exact = corpus[cand] @ q
+            found = cand[quantization.top_indices(exact, k)]
+            approx_found = quantization.top_indices(approx, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recall_approx += len(set(approx_found) & expected) / k
+        recall_rerank += len(set(found) & expected) / k
+
+    return {
+        "resident_mb": round(resident / 2**20, 2),
+        "bytes_per_doc": round(resident / len(corpus), 1),
+        f"recall@{k}_compact_only": round(recall_approx / len(queries), 4),
+        f"recall@{k}_reranked": round(recall_rerank / len(queries), 4),
+        "query_ms_p50": round(float(np.median(latencies)), 3),
+        "query_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector storage modes")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=32, help="Re-rank candidate set size")
+    parser.add_argument(
+        "--candidate-dims", type=int, nargs="*", default=[256, 512],
+        help="Truncated dimensions for the candidate stage",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_corpus(args.docs, args.dims, args.queries)
+    truth = [set(quantization.top_indices(corpus @ q, args.k)) for q in queries]
+
+    results = {
+        mode: bench_mode(mode, corpus, queries, args.k, args.candidates, truth)
+        for mode in quantization.STORAGE_MODES
+    }
+    for dims in args.candidate_dims:
+        for mode in ("float32", "int8"):
+            results[f"{mode}/{dims}d"] = bench_mode(
+                mode, corpus, queries, args.k, args.candidates, truth, candidate_dims=dims
+            )
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "results": results}, indent=2))
+        return
+
+    print(f"{args.docs} docs x {args.dims} dims, {args.queries} queries, k={args.k}, candidates={args.candidates}")
+    for mode, result in results.items():
+        print(f"{mode:<12} " + "  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
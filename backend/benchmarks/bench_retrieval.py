@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Retrieval micro-benchmark: how rag.py scales with corpus size.
+
+Generates synthetic corpora (10 to 1M docs) and measures, per size:
+ingest_corpus, the legacy _cosine_sim + argsort top-k, vector_search, the
+keyword fallback and answer_question end-to-end (no LLM). Embeddings come
+from a stub embedder so only the retrieval code is timed.
+
+Reports per-query latency, memory per doc, the log-log scaling slope of each
+stage and the first size at which a stage exceeds the --slo-ms budget.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--sizes 10 100 1000 10000 100000] \\
+        [--dims 384] [--queries 50] [--slo-ms 50] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag  # noqa: E402
+
+
+_SECTIONS = ["Título", "Descripción", "Características", "Opiniones", "Preguntas", "Envío"]
+_WORDS = (
+    "celular samsung galaxy pantalla cámara batería carga rápida memoria almacenamiento "
+    "procesador envío gratis garantía color negro azul precio cuotas vendedor opinión "
+    "excelente bueno malo duración resistente agua diseño liviano sonido parlante video "
+    "noche zoom gb ram 5g wifi bluetooth nfc huella desbloqueo facial android actualización"
+).split()
+
+
+class StubEmbedder:
+    """Deterministic random vectors; records the time spent embedding."""
+
+    def __init__(self, dims: int):
+        self.model = f"stub-{dims}"
+        self.dimensions = None
+        self.dims = dims
+        self.elapsed = 0.0
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        rng = np.random.default_rng(len(texts))
+        vectors = rng.standard_normal((len(texts), self.dims), dtype=np.float32)
+        self.elapsed += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal(self.dims, dtype=np.float32)
+
+
+def synthetic_docs(count: int, words_per_doc: int = 40, vocab: int = 5000, seed: int = 0):
+    """Product-like docs: common domain words plus a long tail of rare terms."""
+    rng = np.random.default_rng(seed)
+    vocabulary = _WORDS + [f"term{i}" for i in range(vocab)]
+    # Zipf-like draw, so a few words are frequent and most are rare
+    ranks = np.minimum(rng.zipf(1.3, size=(count, words_per_doc)) - 1, len(vocabulary) - 1)
+    return [
+        {"id": f"doc-{i}", "section": _SECTIONS[i % len(_SECTIONS)], "text": " ".join(vocabulary[r] for r in row)}
+        for i, row in enumerate(ranks)
+    ]
+
+
+def _timed_queries(fn, queries, max_seconds):
+    """Run fn over the queries until they run out or the time budget is spent."""
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    return {
+        "p50_ms": round(float(np.median(latencies)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "runs": len(latencies),
+    }
+
+
+def bench_size(size, embedder, args):
+    tracemalloc.start()
+    docs = synthetic_docs(size, seed=size)
+    docs_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    queries = [" ".join(doc["text"].split()[:6]) for doc in docs[: args.queries]]
+    while len(queries) < args.queries:
+        queries += queries[: args.queries - len(queries)]
+
+    embedder.elapsed = 0.0
+    start = time.perf_counter()
+    rag.ingest_corpus(docs)
+    ingest_ms = (time.perf_counter() - start) * 1000
+    embed_ms = embedder.elapsed * 1000
+
+    stats = rag.vector_stats()
+    matrix = np.asarray(rag._EMBEDDINGS)
+    query_vecs = {q: np.asarray(embedder.embed_query(q), dtype=np.float32) for q in queries}
+
+    def cosine_argsort(q):
+        sims = rag._cosine_sim(matrix, query_vecs[q])
+        return np.argsort(-sims)[: args.k]
+
+    result = {
+        "docs": size,
+        "ingest_ms": round(ingest_ms, 2),
+        "ingest_ms_excl_embed": round(ingest_ms - embed_ms, 2),
+        "docs_bytes_per_doc": round(docs_bytes / size, 1),
+        "index_bytes_per_doc": stats["bytes_per_doc"],
+        "cosine_argsort": _timed_queries(cosine_argsort, queries, args.max_seconds),
+        "vector_search": _timed_queries(lambda q: rag.vector_search(query_vecs[q], args.k), queries, args.max_seconds),
+        "keyword_search": _timed_queries(lambda q: rag.keyword_search(q, args.k), queries, args.max_seconds),
+        "answer_question": _timed_queries(lambda q: rag.answer_question(q, top_k=args.k), queries, args.max_seconds),
+    }
+    del matrix
+    return result
+
+
+_STAGES = ["cosine_argsort", "vector_search", "keyword_search", "answer_question"]
+
+
+def scaling_summary(results, slo_ms):
+    """Log-log slope of p50 vs docs between the two largest sizes, and the
+    first size whose p50 exceeds the SLO."""
+    summary = {}
+    for stage in _STAGES:
+        points = [(r["docs"], r[stage]["p50_ms"]) for r in results]
+        slope = None
+        if len(points) >= 2 and points[-2][1] > 0:
+            (n0, t0), (n1, t1) = points[-2], points[-1]
+            slope = round(float(np.log(t1 / t0) / np.log(n1 / n0)), 2)
+        over = next((n for n, t in points if t > slo_ms), None)
+        summary[stage] = {"slope": slope, "exceeds_slo_at": over}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval scaling benchmark on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--storage", default="float32", help="RAG_VECTOR_STORAGE for the index")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Time budget per stage and size")
+    parser.add_argument("--slo-ms", type=float, default=50.0, help="Per-query latency budget")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Retrieval only: no LLM call, index built by the stub embedder
+    os.environ.pop("OPENAI_API_KEY", None)
+    os.environ["RAG_VECTOR_STORAGE"] = args.storage
+    embedder = StubEmbedder(args.dims)
+    rag._ensure_embedder = lambda: embedder
+
+    results = [bench_size(size, embedder, args) for size in sorted(args.sizes)]
+    summary = scaling_summary(results, args.slo_ms)
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "results": results, "scaling": summary}, indent=2))
+        return
+
+    print(f"dims={args.dims} k={args.k} storage={args.storage} (p50 / p95 ms per query)")
+    print(f"{'docs':>8} {'ingest ms':>10} {'B/doc':>8} " + " ".join(f"{s:>22}" for s in _STAGES))
+    for r in results:
+        per_doc = r["docs_bytes_per_doc"] + r["index_bytes_per_doc"]
+        cells = " ".join(f"{r[s]['p50_ms']:>11} / {r[s]['p95_ms']:<8}" for s in _STAGES)
+        print(f"{r['docs']:>8} {r['ingest_ms']:>10} {per_doc:>8.0f} {cells}")
+    print(f"\nscaling (slope of log p50 vs log docs; SLO {args.slo_ms} ms)")
+    for stage, s in summary.items():
+        print(f"  {stage:<16} slope={s['slope']}  exceeds SLO at {s['exceeds_slo_at'] or '-'} docs")
+
+
+if __name__ == "__main__":
+    main()
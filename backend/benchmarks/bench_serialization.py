@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark: per-request CPU of /item and /reviews with the
+previous response path (return the model, FastAPI validates it against
+response_model and encodes it with jsonable_encoder) versus the current one
+(pre-serialized bytes returned as a Response), plus building the /search
+response from Tavily hits: per-hit models re-validated by FastAPI, versus
+model_construct, versus one model_validate pass (what the endpoint uses).
+
+Requests go through the full ASGI stack in-process, so the numbers include
+routing and middleware; CPU time is process time per request.
+
+Usage:
+    python benchmarks/bench_serialization.py [--requests 2000] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from backend import main  # noqa: E402
+from backend import models  # noqa: E402
+from backend.serialization import model_response  # noqa: E402
+
+
+def baseline_app() -> FastAPI:
+    """The endpoints as they were before the fast path, same middleware."""
+    app = FastAPI()
+    app.user_middleware = list(main.app.user_middleware)
+
+    @app.get("/item", response_model=main.ItemDetail)
+    def get_item_detail():
+        return main.SAMPLE_ITEM
+
+    @app.get("/reviews", response_model=main.ReviewsData)
+    def get_reviews():
+        return main.REVIEWS_DATA
+
+    return app
+
+
+async def cpu_per_request(app, path: str, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(path)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path)
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return {
+        "cpu_us_per_request": round(cpu / requests * 1e6, 1),
+        "wall_us_per_request": round(wall / requests * 1e6, 1),
+        "bytes": len(response.content),
+    }
+
+
+def tavily_hits(n: int = 7) -> list:
+    return [
+        {
+            "title": f"Samsung Galaxy A55 5G 256 GB - oferta {i}",
+            "url": f"https://articulo.mercadolibre.com.ar/MLA-{1000 + i}",
+            "content": "Samsung Galaxy A55 5G Dual SIM 256 GB 8 GB RAM, envío gratis. " * 4,
+            "score": 0.9 - i / 100,
+        }
+        for i in range(n)
+    ]
+
+
+async def bench_search(iterations: int) -> dict:
+    """Build the /search response from 7 Tavily hits and serialize it."""
+    hits = tavily_hits()
+    field = create_model_field("response", main.SearchResponse)
+
+    async def per_hit():
+        # Validated per hit, then re-validated by FastAPI and rendered
+        results = [models.SearchResult(title=h.get("title", ""), url=h.get("url", ""),
+                                     content=h.get("content", ""), score=h.get("score")) for h in hits]
+        content = await serialize_response(field=field, response_content=main.SearchResponse(results=results))
+        return JSONResponse(content).body
+
+    async def constructed():
+        results = [models.SearchResult.model_construct(title=str(h.get("title") or ""), url=str(h.get("url") or ""),
+                                                     content=str(h.get("content") or ""), score=float(h["score"]))
+                   for h in hits]
+        return model_response(main.SearchResponse.model_construct(results=results)).body
+
+    async def single_pass():
+        results = [{"title": h.get("title", ""), "url": h.get("url", ""),
+                    "content": h.get("content", ""), "score": h.get("score")} for h in hits]
+        return model_response(main.SearchResponse.model_validate({"results": results})).body
+
+    out = {}
+    for name, fn in (("per_hit", per_hit), ("model_construct", constructed), ("single_validate", single_pass)):
+        await fn()
+        start = time.process_time()
+        for _ in range(iterations):
+            await fn()
+        out[name] = round((time.process_time() - start) / iterations * 1e6, 1)
+    return out
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Compare response serialization paths")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    baseline = baseline_app()
+    results = {}
+    for path in ("/item", "/reviews"):
+        results[path] = {
+            "before": asyncio.run(cpu_per_request(baseline, path, args.requests)),
+            "after": asyncio.run(cpu_per_request(main.app, path, args.requests)),
+        }
+    search = asyncio.run(bench_search(args.requests))
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "endpoints": results, "search_us": search}, indent=2))
+        return
+
+    print(f"{args.requests} in-process requests per endpoint (CPU us per request)")
+    for path, r in results.items():
+        before, after = r["before"]["cpu_us_per_request"], r["after"]["cpu_us_per_request"]
+        print(f"{path:<9} before={before:>8}  after={after:>8}  saved={before - after:.1f} us "
+              f"({(1 - after / before) * 100:.0f}%)  {r['after']['bytes']} bytes")
+    print("search (7 hits, build + serialize, CPU us): " + "  ".join(f"{k}={v}" for k, v in search.items()))
+
+
+if __name__ == "__main__":
+    main_()
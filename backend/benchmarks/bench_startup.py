@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time and peak RSS of the RAG module.
+
+Compares the current `rag` module (direct openai SDK) against the LangChain
+stack it replaced (`langchain_openai`), each imported in a fresh interpreter.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Each snippet prints "<seconds> <max_rss_kb>" for the import it measures
+_PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+TARGETS = {
+    "baseline (python + numpy)": "import numpy",
+    "before: langchain_openai": "import numpy\nfrom langchain_openai import OpenAIEmbeddings, ChatOpenAI",
+    "after: rag (openai SDK)": "from backend import rag",
+}
+
+
+def measure(statement: str, runs: int) -> dict:
+    """Import `statement` in `runs` fresh interpreters and aggregate."""
+    times, rss = [], []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(root=ROOT_DIR, statement=statement)],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1]}
+        elapsed, maxrss = proc.stdout.split()
+        times.append(float(elapsed))
+        rss.append(int(maxrss))
+    return {
+        "import_ms_median": round(statistics.median(times) * 1000, 1),
+        "import_ms_min": round(min(times) * 1000, 1),
+        "max_rss_mb": round(statistics.median(rss) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RAG module startup time and RSS")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {name: measure(statement, args.runs) for name, statement in TARGETS.items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'target':<30} {'import ms (median)':>20} {'max RSS MB':>12}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<30} {'skipped: ' + result['error']}")
+        else:
+            print(f"{name:<30} {result['import_ms_median']:>20} {result['max_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Replay logged traffic: re-drives /agent/chat and /search requests from the
+query log (see querylog.py) against a local instance whose OpenAI and Tavily
+upstreams are stubbed, keeping the logged arrival pattern (optionally sped
+up), so caching and retrieval changes can be evaluated against the real
+question distribution.
+
+Reports, per endpoint, replayed latency percentiles next to the logged ones,
+the outcome mix (fast path / FAQ table / RAG, results / no results), mean
+per-stage time from the Server-Timing header and how far behind schedule
+requests were sent.
+
+Usage:
+    python benchmarks/replay.py query.jsonl [--speedup 10] [--mode inprocess|uvicorn] \\
+        [--max-in-flight 64] [--limit 1000] [--endpoints chat search] [--json PATH|-]
+
+--speedup 0 ignores the timestamps and sends as fast as --max-in-flight allows.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT_DIR)
+
+from backend.benchmarks.stubs import StubServer, free_port  # noqa: E402
+from backend.querylog import read_query_log, set_query_log  # noqa: E402
+
+
+def to_request(record: dict):
+    """(path, json body) for a logged record, or None if it can't be replayed."""
+    if record.get("endpoint") == "chat" and record.get("question"):
+        # Language picks the fast-path template, the FAQ table and the prompt
+        return "/agent/chat", {"question": record["question"], "language": record.get("language", "es")}
+    if record.get("endpoint") == "search" and record.get("query"):
+        return "/search", {"query": record["query"]}
+    return None
+
+
+def outcome_of(endpoint: str, response: httpx.Response) -> str:
+    if response.status_code >= 400:
+        return "error"
+    data = response.json()
+    if endpoint == "search":
+        return "results" if data.get("results") else "no_results"
+    return "fast_path" if "intent" in data else "faq_table" if "faq" in data else "rag"
+
+
+def parse_server_timing(value: str) -> dict:
+    stages = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        name, _, params = entry.partition(";")
+        if name != "total" and params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+async def replay(client: httpx.AsyncClient, records: list, speedup: float, max_in_flight: int) -> list:
+    """Send the records on their logged schedule divided by `speedup`."""
+    semaphore = asyncio.Semaphore(max_in_flight)
+    t0 = records[0]["ts"] if records else 0.0
+    start = time.perf_counter()
+    results = []
+
+    async def send(record: dict):
+        path, body = to_request(record)
+        if speedup > 0:
+            delay = (record["ts"] - t0) / speedup - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with semaphore:
+            sent = time.perf_counter() - start
+            lag = max(0.0, sent - (record["ts"] - t0) / speedup) if speedup > 0 else 0.0
+            begin = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                outcome = outcome_of(record["endpoint"], response)
+                stages = parse_server_timing(response.headers.get("server-timing", ""))
+            except httpx.HTTPError:
+                outcome, stages = "error", {}
+            results.append({
+                "endpoint": record["endpoint"],
+                "latency_ms": (time.perf_counter() - begin) * 1000,
+                "lag_ms": lag * 1000,
+                "outcome": outcome,
+                "stages": stages,
+                "logged": record,
+            })
+
+    await asyncio.gather(*(send(r) for r in records))
+    return results
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    array = np.array(values)
+    return {f"p{p}_ms": round(float(np.percentile(array, p)), 2) for p in (50, 95, 99)}
+
+
+def summarize(results: list, wall: float) -> dict:
+    by_endpoint = defaultdict(list)
+    for r in results:
+        by_endpoint[r["endpoint"]].append(r)
+    summary = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        stage_totals = defaultdict(float)
+        for r in rows:
+            for name, ms in r["stages"].items():
+                stage_totals[name] += ms
+        summary[endpoint] = {
+            "requests": len(rows),
+            "errors": sum(r["outcome"] == "error" for r in rows),
+            "replayed": _percentiles([r["latency_ms"] for r in rows]),
+            "logged": _percentiles([r["logged"]["latency_ms"] for r in rows if "latency_ms" in r["logged"]]),
+            "outcomes": dict(Counter(r["outcome"] for r in rows)),
+            "logged_outcomes": dict(Counter(r["logged"].get("outcome", "unknown") for r in rows)),
+            "stage_mean_ms": {name: round(total / len(rows), 3) for name, total in stage_totals.items()},
+            "max_lag_ms": round(max(r["lag_ms"] for r in rows), 2),
+        }
+    return {"wall_s": round(wall, 2), "rps": round(len(results) / wall, 1) if wall else 0.0, "endpoints": summary}
+
+
+async def replay_inprocess(records: list, args) -> tuple:
+    from backend import main
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=60) as client:
+            start = time.perf_counter()
+            results = await replay(client, records, args.speedup, args.max_in_flight)
+            return results, time.perf_counter() - start
+    finally:
+        await main.app.router.shutdown()
+
+
+async def replay_uvicorn(records: list, args, env: dict) -> tuple:
+    port = free_port()
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            deadline = time.time() + 20
+            while True:
+                try:
+                    if (await client.get("/item")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            results = await replay(client, records, args.speedup, args.max_in_flight)
+            return results, time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def load_records(paths: list, endpoints: list, limit: int) -> list:
+    records = []
+    for path in paths:
+        records.extend(
+            r for r in read_query_log(path)
+            if r.get("endpoint") in endpoints and "ts" in r and to_request(r) is not None
+        )
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Replay logged chat/search traffic against stubbed upstreams")
+    parser.add_argument("logs", nargs="+", help="Query log files (rotated .1, .2, ... files are included)")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Time compression factor (0 = no pacing)")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N records")
+    parser.add_argument("--endpoints", nargs="+", choices=["chat", "search"], default=["chat", "search"])
+    parser.add_argument("--openai-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tavily-latency-ms", type=float, default=120.0)
+    parser.add_argument("--json", metavar="PATH", help="Write the summary as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args()
+
+    records = load_records(args.logs, args.endpoints, args.limit)
+    if not records:
+        sys.exit("No replayable chat/search records found")
+
+    stub = StubServer(latency_ms={"openai": args.openai_latency_ms, "tavily": args.tavily_latency_ms}).start()
+    # Upstream URLs are read when main is imported; the replay itself is not logged
+    os.environ.update(stub.env())
+    os.environ["QUERY_LOG_PATH"] = ""
+    set_query_log(None)
+    try:
+        if args.mode == "inprocess":
+            results, wall = asyncio.run(replay_inprocess(records, args))
+        else:
+            results, wall = asyncio.run(replay_uvicorn(records, args, dict(os.environ)))
+    finally:
+        stub.stop()
+
+    report = {"config": vars(args), "summary": summarize(results, wall), "upstream_requests": stub.requests}
+    if args.json:
+        output = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(output)
+            return
+        with open(args.json, "w") as f:
+            f.write(output + "\n")
+
+    summary = report["summary"]
+    print(f"Replayed {len(results)} requests in {summary['wall_s']} s ({summary['rps']} rps, speedup {args.speedup})")
+    for endpoint, s in summary["endpoints"].items():
+        print(f"\n[{endpoint}] {s['requests']} requests, {s['errors']} errors, max lag {s['max_lag_ms']} ms")
+        print(f"  latency replayed: {s['replayed']}")
+        print(f"  latency logged:   {s['logged']}")
+        print(f"  outcomes replayed: {s['outcomes']}  logged: {s['logged_outcomes']}")
+        print("  stage mean ms: " + "  ".join(f"{k}={v}" for k, v in s["stage_mean_ms"].items()))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,188 @@
+"""
+Local stub upstreams for benchmarks and replay.
+
+One HTTP server that mimics the parts of the OpenAI API (embeddings, chat
+completions) and the Tavily search API used by the backend, plus listing
+pages for the search results (for enrichment), with configurable latency.
+Point the app at it with:
+
+    OPENAI_BASE_URL=<stub.url>/v1  OPENAI_API_KEY=sk-stub
+    TAVILY_API_URL=<stub.url>/search  TAVILY_API_KEY=tvly-stub  ENRICH_ALLOWED_HOSTS=127.0.0.1
+"""
+import asyncio
+import hashlib
+import random
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fake_embedding(text: str, dims: int) -> list:
+    """Deterministic unit vector per text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+class StubServer:
+    """Stub OpenAI + Tavily + listing pages server running in a background thread.
+
+    Latencies are in milliseconds per upstream ("openai", "tavily", "pages"),
+    with optional uniform jitter.
+    """
+
+    def __init__(
+        self,
+        latency_ms: Optional[Dict[str, float]] = None,
+        jitter_ms: float = 0.0,
+        port: Optional[int] = None,
+    ):
+        self.latency_ms = {"openai": 0.0, "tavily": 0.0, "pages": 0.0}
+        self.latency_ms.update(latency_ms or {})
+        self.jitter_ms = jitter_ms
+        self.port = port or free_port()
+        self.requests: Dict[str, int] = {}
+        self.app = self._build_app()
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that route the backend to this stub."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "sk-stub",
+            "TAVILY_API_URL": f"{self.url}/search",
+            "TAVILY_API_KEY": "tvly-stub",
+            "ENRICH_ALLOWED_HOSTS": "127.0.0.1",
+        }
+
+    async def _delay(self, upstream: str) -> None:
+        self.requests[upstream] = self.requests.get(upstream, 0) + 1
+        delay = self.latency_ms.get(upstream, 0.0)
+        if self.jitter_ms:
+            delay += random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Upstream stubs")
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request):
+            body = await request.json()
+            await self._delay("openai")
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            dims = body.get("dimensions") or 1536
+            return {
+                "object": "list",
+                "model": body.get("model", "text-embedding-3-small"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _fake_embedding(text, dims)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": sum(len(t) // 4 for t in inputs), "total_tokens": 0},
+            }
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            await self._delay("openai")
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+            return {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Respuesta de prueba del stub."},
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": 8,
+                    "total_tokens": prompt_tokens + 8,
+                    "prompt_tokens_details": {"cached_tokens": 0},
+                },
+            }
+
+        @app.post("/search")
+        async def tavily_search(request: Request):
+            body = await request.json()
+            await self._delay("tavily")
+            count = min(int(body.get("max_results", 5)), 10)
+            return {
+                "query": body.get("query", ""),
+                "results": [
+                    {
+                        "title": f"Resultado {i + 1}",
+                        "url": f"{self.url}/articulo/MLA-{1000 + i}",
+                        "content": "Samsung Galaxy A55 5G 256 GB en oferta.",
+                        "score": round(1.0 - i * 0.1, 2),
+                    }
+                    for i in range(count)
+                ],
+            }
+
+        @app.get("/articulo/{listing_id}", response_class=HTMLResponse)
+        async def listing_page(listing_id: str):
+            await self._delay("pages")
+            number = int(listing_id.rsplit("-", 1)[-1])
+            # Meta tags first, then a large body, like real listing pages
+            return (
+                "<!DOCTYPE html><html><head>"
+                f"<title>Samsung Galaxy A55 {listing_id} | MercadoLibre</title>"
+                f'<meta property="og:title" content="Samsung Galaxy A55 5G 256 GB ({listing_id})">'
+                f'<meta itemprop="price" content="{900000 + number}">'
+                '<meta itemprop="priceCurrency" content="ARS">'
+                "</head><body>"
+                + "<script>var state = {};</script>" * 4000
+                + f'<span class="andes-money-amount__fraction">{900000 + number:,}</span>'.replace(",", ".")
+                + "</body></html>"
+            )
+
+        @app.get("/redirect")
+        async def redirect(to: str):
+            # Result links that bounce through a redirect before the listing
+            return RedirectResponse(to, status_code=302)
+
+        return app
+
+    def start(self) -> "StubServer":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("stub server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,174 @@
+"""
+Response compression and conditional GET.
+
+- negotiate(): picks br/gzip from Accept-Encoding (q-values honored).
+- Precompressed: a static payload compressed once per encoding, with a
+  strong ETag and Cache-Control; answers If-None-Match with 304.
+- CompressionMiddleware: compresses other responses above a size threshold
+  (skips already-encoded, streamed and non-text bodies).
+
+Brotli is optional; without the `brotli` package only gzip is offered.
+"""
+import gzip
+import hashlib
+import os
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bodies smaller than this are sent as-is; headers dominate below ~1 KB
+MIN_COMPRESS_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Static payloads change only on deploy; ETag revalidation covers the rest
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=300, stale-while-revalidate=86400")
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY_STATIC = 11  # precompressed once, so spend the CPU
+_BROTLI_QUALITY_DYNAMIC = 4
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=_BROTLI_QUALITY_STATIC if static else _BROTLI_QUALITY_DYNAMIC)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding!r}")
+
+
+def _etag_matches(if_none_match: Optional[str], etags) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison on the digest: proxies and CDN edges may weaken the tag
+    # or append their own encoding suffix after re-encoding
+    candidates = {_digest(tag) for tag in if_none_match.split(",")}
+    return not candidates.isdisjoint(_digest(tag) for tag in etags)
+
+
+def _digest(etag: str) -> str:
+    return etag.strip().removeprefix("W/").strip('"').split("-")[0]
+
+
+class Precompressed:
+    """A fixed body with its compressed variants and validators, built once."""
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        cache_control: str = STATIC_CACHE_CONTROL,
+    ):
+        self.body = body
+        self.media_type = media_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.variants: Dict[str, bytes] = {}
+        # Strong validators are per representation, so each coding gets its own tag
+        self.etags: Dict[Optional[str], str] = {None: self.etag}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            for encoding in supported_encodings():
+                self.variants[encoding] = compress(body, encoding, static=True)
+                self.etags[encoding] = f'"{digest}-{encoding}"'
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        if encoding not in self.variants:
+            encoding = None
+        headers = {"ETag": self.etags[encoding], "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        # Any of our tags means the client holds the current content
+        if _etag_matches(request.headers.get("if-none-match"), self.etags.values()):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(self.body, media_type=self.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-message responses above a size
+    threshold. Streamed bodies and already-encoded responses pass through."""
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict((k.lower(), v) for k, v in scope.get("headers", []))
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            response_headers = [(k.lower(), v) for k, v in start.get("headers", [])]
+            names = {k for k, _ in response_headers}
+            content_type = dict(response_headers).get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body")
+                or b"content-encoding" in names
+                or len(body) < self.minimum_size
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            response_headers = [(k, v) for k, v in response_headers if k != b"content-length"]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            if b"vary" not in names:
+                response_headers.append((b"vary", b"Accept-Encoding"))
+            await send({**start, "headers": response_headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,92 @@
+"""
+RAG corpus for an item: the documents retrieval searches over and the static
+product sheet that goes into the cached prompt prefix (see rag.ingest_corpus).
+"""
+from typing import Any, Dict, List
+
+from .models import ItemDetail, ReviewsData
+
+
+def build_corpus(item: ItemDetail, reviews: ReviewsData) -> List[Dict[str, Any]]:
+    """One {id, section, text} document per section of the product page."""
+    return [
+        {"id": "title", "section": "Título", "text": item.title},
+        {"id": "desc", "section": "Descripción", "text": item.description},
+        {
+            "id": "specs",
+            "section": "Características del producto",
+            "text": "\n".join([f"{c.name}: {c.rating}★" for c in reviews.characteristic_ratings]),
+        },
+        {
+            "id": "seller",
+            "section": "Vendedor",
+            "text": f"{item.seller.name} reputación {item.seller.reputation} ventas {item.seller.sales}",
+        },
+        {
+            "id": "payments",
+            "section": "Medios de pago",
+            "text": ", ".join([m.description for m in item.payment_methods]),
+        },
+        {
+            "id": "reviews",
+            "section": "Opiniones destacadas",
+            "text": "\n\n".join([r.text for r in reviews.reviews]),
+        },
+    ]
+
+
+_SHEET_LABELS: Dict[str, Dict[str, str]] = {
+    "es": {
+        "product": "Producto",
+        "price": "Precio",
+        "stock": "Stock disponible",
+        "seller": "Vendedor",
+        "seller_detail": "reputación {reputation}, {sales} ventas",
+        "payments": "Medios de pago",
+        "rating": "Calificación",
+        "reviews": "{count} opiniones",
+        "description": "Descripción",
+    },
+    "pt": {
+        "product": "Produto",
+        "price": "Preço",
+        "stock": "Estoque disponível",
+        "seller": "Vendedor",
+        "seller_detail": "reputação {reputation}, {sales} vendas",
+        "payments": "Meios de pagamento",
+        "rating": "Avaliação",
+        "reviews": "{count} opiniões",
+        "description": "Descrição",
+    },
+    "en": {
+        "product": "Product",
+        "price": "Price",
+        "stock": "Stock available",
+        "seller": "Seller",
+        "seller_detail": "{reputation} reputation, {sales} sales",
+        "payments": "Payment methods",
+        "rating": "Rating",
+        "reviews": "{count} reviews",
+        "description": "Description",
+    },
+}
+
+
+def product_sheet(item: ItemDetail, lang: str = "es") -> str:
+    """Static facts about the item; part of the cached prompt prefix."""
+    labels = _SHEET_LABELS.get(lang, _SHEET_LABELS["es"])
+    seller = labels["seller_detail"].format(reputation=item.seller.reputation, sales=item.seller.sales)
+    return "\n".join([
+        f"{labels['product']}: {item.title}",
+        f"{labels['price']}: {item.price:.0f} {item.currency}",
+        f"{labels['stock']}: {item.stock}",
+        f"{labels['seller']}: {item.seller.name} ({seller})",
+        f"{labels['payments']}: {', '.join(m.description for m in item.payment_methods)}",
+        f"{labels['rating']}: {item.ratings} ({labels['reviews'].format(count=item.reviews_count)})",
+        f"{labels['description']}: {item.description}",
+    ])
+
+
+def product_sheets(item: ItemDetail) -> Dict[str, str]:
+    """product_sheet() in every language, for rag.ingest_corpus."""
+    return {lang: product_sheet(item, lang) for lang in _SHEET_LABELS}
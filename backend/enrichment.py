@@ -0,0 +1,288 @@
+"""
+Search result enrichment: fetch the result pages and pull the listing's
+title and price, so the search dropdown can show them.
+
+Pages are fetched concurrently (at most ENRICH_CONCURRENCY per request) over
+one pooled client, parsed while they stream in and dropped as soon as title
+and price are found (or after ENRICH_MAX_BYTES). Results, including misses,
+are cached per URL. Result URLs come from a third party, so only hosts in
+ENRICH_ALLOWED_HOSTS (and their subdomains) are fetched; every redirect hop
+is checked too, and at most ENRICH_MAX_REDIRECTS are followed.
+"""
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from .metrics import count_event, count_upstream_error, timed
+
+
+ENRICH_TOP_N = int(os.getenv("ENRICH_TOP_N", "5"))
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "4"))
+ENRICH_MAX_CONNECTIONS = int(os.getenv("ENRICH_MAX_CONNECTIONS", "16"))
+ENRICH_TIMEOUT_S = float(os.getenv("ENRICH_TIMEOUT_S", "3"))
+ENRICH_MAX_BYTES = int(os.getenv("ENRICH_MAX_BYTES", str(512 * 1024)))
+ENRICH_MAX_REDIRECTS = int(os.getenv("ENRICH_MAX_REDIRECTS", "3"))
+ENRICH_CACHE_TTL_S = float(os.getenv("ENRICH_CACHE_TTL_S", "600"))
+# Failed fetches are retried sooner than found listings are refreshed
+ENRICH_ERROR_TTL_S = float(os.getenv("ENRICH_ERROR_TTL_S", "60"))
+ENRICH_CACHE_SIZE = int(os.getenv("ENRICH_CACHE_SIZE", "2048"))
+
+
+def _allowed_hosts() -> List[str]:
+    value = os.getenv("ENRICH_ALLOWED_HOSTS", "mercadolibre.com.ar,mercadolibre.com,mercadolivre.com.br")
+    return [h.strip().lower() for h in value.split(",") if h.strip()]
+
+
+def is_allowed(url: str) -> bool:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        return False
+    return any(host == allowed or host.endswith("." + allowed) for allowed in _allowed_hosts())
+
+
+class BlockedHost(Exception):
+    """A redirect led outside ENRICH_ALLOWED_HOSTS."""
+
+
+async def _check_host(request: httpx.Request) -> None:
+    # Request hooks run for every hop, so a redirect can't leave the allowed hosts
+    if not is_allowed(str(request.url)):
+        raise BlockedHost(request.url.host)
+
+
+def parse_price(text: str) -> Optional[float]:
+    """Price from "972000", "972.000", "$ 1.299.999", "1,299.99" or "12,5"."""
+    cleaned = re.sub(r"[^\d.,]", "", text)
+    if not re.search(r"\d", cleaned):
+        return None
+    if "," in cleaned and "." in cleaned:
+        decimal = "," if cleaned.rfind(",") > cleaned.rfind(".") else "."
+        cleaned = cleaned.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif len(re.findall(r"[.,]", cleaned)) == 1 and len(re.split(r"[.,]", cleaned)[1]) != 3:
+        # One separator not followed by a thousands group: decimals
+        cleaned = cleaned.replace(",", ".")
+    else:
+        cleaned = cleaned.replace(",", "").replace(".", "")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+_PRICE_META = {"price", "product:price:amount", "og:price:amount"}
+_CURRENCY_META = {"pricecurrency", "product:price:currency", "og:price:currency"}
+_TITLE_META = {"og:title", "twitter:title"}
+_PRICE_CLASS = "andes-money-amount__fraction"  # MercadoLibre's visible price
+
+
+class ListingParser(HTMLParser):
+    """Incremental parser for a listing's title and price.
+
+    Prefers schema.org/Open Graph meta tags, falling back to <title>/<h1> and
+    the first visible price; `done` turns true once both are known.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: Optional[str] = None
+        self.price: Optional[float] = None
+        self.currency: Optional[str] = None
+        self._meta_title = False
+        self._capture: Optional[str] = None
+        self._text: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._meta_title and self.price is not None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        a = {k: v or "" for k, v in attrs}
+        if tag == "meta":
+            name = (a.get("itemprop") or a.get("property") or a.get("name") or "").lower()
+            content = a.get("content", "").strip()
+            if not content:
+                return
+            if name in _PRICE_META and self.price is None:
+                self.price = parse_price(content)
+            elif name in _CURRENCY_META and self.currency is None:
+                self.currency = content.upper()
+            elif name in _TITLE_META and not self._meta_title:
+                self.title, self._meta_title = content, True
+        elif tag in ("title", "h1") and self.title is None:
+            self._capture, self._text = tag, []
+        elif tag == "span" and self.price is None and _PRICE_CLASS in a.get("class", "").split():
+            self._capture, self._text = "span", []
+
+    def handle_data(self, data: str) -> None:
+        if self._capture:
+            self._text.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag != self._capture:
+            return
+        text = " ".join("".join(self._text).split())
+        if tag == "span":
+            self.price = parse_price(text)
+        elif text:
+            self.title = text
+        self._capture = None
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self.title is None and self.price is None:
+            return None
+        return {"title": self.title, "price": self.price, "currency": self.currency}
+
+
+async def fetch_listing(client: httpx.AsyncClient, url: str) -> Optional[Dict[str, Any]]:
+    """Stream a page through ListingParser, stopping as soon as it is done."""
+    parser = ListingParser()
+    received = 0
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+                return None
+            async for chunk in response.aiter_text():
+                parser.feed(chunk)
+                received += len(chunk)
+                if parser.done:
+                    count_event("enrich", "early_exit")
+                    break
+                if received >= ENRICH_MAX_BYTES:
+                    break
+    except BlockedHost:
+        count_event("enrich", "blocked")
+        return None
+    return parser.result()
+
+
+class ListingCache:
+    """Per-URL results with a TTL; concurrent requests for a URL share one fetch."""
+
+    def __init__(self, maxsize: int = ENRICH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, url: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        entry = self._data.get(url)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        self._data.move_to_end(url)
+        return True, entry[1]
+
+    def put(self, url: str, value: Optional[Dict[str, Any]], ttl: float) -> None:
+        self._data[url] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(url)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_fetch(self, client: httpx.AsyncClient, url: str) -> Optional[Dict[str, Any]]:
+        found, value = self.get(url)
+        if found:
+            count_event("enrich", "cache_hit")
+            return value
+        pending = self._inflight.get(url)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():  # the fetching request went away
+                    return None
+                raise
+        pending = self._inflight[url] = asyncio.get_running_loop().create_future()
+        try:
+            try:
+                with timed("search", "enrich"):
+                    value = await fetch_listing(client, url)
+                ttl = ENRICH_CACHE_TTL_S
+            except Exception as e:
+                # Enrichment is best effort: a bad page only loses its extra fields
+                count_upstream_error("enrich")
+                print(f"Enrichment error for {url}: {e}")
+                value, ttl = None, ENRICH_ERROR_TTL_S
+            self.put(url, value, ttl)
+            pending.set_result(value)
+            return value
+        finally:
+            del self._inflight[url]
+            if not pending.done():
+                pending.cancel()
+
+
+CACHE = ListingCache()
+
+# Shared connection pool, opened/closed with the app (see main.py)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=ENRICH_TIMEOUT_S,
+        follow_redirects=True,
+        max_redirects=ENRICH_MAX_REDIRECTS,
+        event_hooks={"request": [_check_host]},
+        limits=httpx.Limits(max_connections=ENRICH_MAX_CONNECTIONS, max_keepalive_connections=ENRICH_MAX_CONNECTIONS),
+        headers={"User-Agent": "Mozilla/5.0 (compatible; product-assistant/1.0)"},
+    )
+
+
+def open_client() -> None:
+    global _client
+    if _client is None:
+        _client = _new_client()
+
+
+async def close_client() -> None:
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def enrichment_client() -> AsyncIterator[httpx.AsyncClient]:
+    """The shared pool, or a short-lived client when the app didn't open one."""
+    if _client is not None:
+        yield _client
+        return
+    async with _new_client() as client:
+        yield client
+
+
+async def enrich(
+    client: httpx.AsyncClient, urls: List[str], concurrency: int = ENRICH_CONCURRENCY
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """Yield (index, listing) for each URL as its fetch finishes, at most
+    `concurrency` in flight; pending fetches are cancelled if the consumer
+    stops early (e.g. the client disconnected)."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int, url: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        if not is_allowed(url):
+            count_event("enrich", "blocked")
+            return index, None
+        async with semaphore:
+            return index, await CACHE.get_or_fetch(client, url)
+
+    tasks = [asyncio.ensure_future(one(i, url)) for i, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
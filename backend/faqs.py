@@ -0,0 +1,312 @@
+"""
+Suggested questions and the precomputed FAQ answer table.
+
+- top_faqs: the most asked questions per language, answered once from the
+  item fields (see intents.answer_from_item) so the page can show them
+  without a chat round-trip. Questions the fast path cannot answer are left out.
+- FAQTable: RAG answers generated offline per (item, language) for curated
+  and learned questions, stored as gzipped JSON. /agent/chat serves exact
+  and near matches from it with no embedding or LLM call. A near match must
+  be a typo-level rewording: same words, same negations, nothing added (so
+  "¿No incluye cargador?" never gets the answer to "¿Incluye cargador?").
+  Every answer keeps
+  the corpus version it was generated from and is only served while that
+  version is current.
+- build_table / `python -m backend.faqs`: the offline job. Only questions
+  that are new or were answered from an older corpus are sent to answer_question.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .intents import answer_from_item
+from .querylog import read_query_log
+
+
+TOP_QUESTIONS: Dict[str, List[str]] = {
+    "es": [
+        "¿Cuánto cuesta?",
+        "¿Cuántas unidades quedan?",
+        "¿Se puede pagar en cuotas?",
+        "¿Quién lo vende?",
+        "¿Cuánta memoria tiene?",
+    ],
+    "pt": [
+        "Quanto custa?",
+        "Tem estoque disponível?",
+        "Posso pagar em parcelas?",
+        "Quem vende?",
+        "Quanto de armazenamento tem?",
+    ],
+    "en": [
+        "How much does it cost?",
+        "How many units are available?",
+        "Can I pay in installments?",
+        "Who sells it?",
+        "What storage does it have?",
+    ],
+}
+
+# Questions that need the reviews/description, i.e. the RAG path
+CURATED_QUESTIONS: Dict[str, List[str]] = {
+    "es": [
+        "¿Cómo es la cámara?",
+        "¿Cuánto dura la batería?",
+        "¿Cómo es la pantalla?",
+        "¿Es resistente al agua?",
+        "¿Qué opinan los compradores?",
+        "¿Tiene 5G?",
+        "¿Sirve para juegos?",
+    ],
+    "pt": [
+        "Como é a câmera?",
+        "Quanto dura a bateria?",
+        "Como é a tela?",
+        "É resistente à água?",
+        "O que os compradores acham?",
+    ],
+    "en": [
+        "How is the camera?",
+        "How long does the battery last?",
+        "How is the screen?",
+        "Is it water resistant?",
+        "What do buyers think?",
+    ],
+}
+
+FAQ_TABLE_PATH = os.getenv("FAQ_TABLE_PATH", "faq_table.json.gz")
+# Minimum trigram overlap to serve a stored answer for a reworded question
+NEAR_MATCH_THRESHOLD = float(os.getenv("FAQ_NEAR_MATCH_THRESHOLD", "0.8"))
+_TABLE_FORMAT = 1
+# Words that flip a question's meaning; a near match must carry the same ones
+_NEGATIONS = frozenset({
+    "no", "ni", "nunca", "sin", "nao", "nem", "sem", "not", "never", "without",
+    "don", "doesn", "isn", "aren", "didn", "won", "cannot",
+})
+# Minimum trigram overlap for two words to count as the same word misspelled
+_WORD_MATCH_THRESHOLD = 0.5
+
+
+def top_faqs(item: Any, language: str = "es", limit: int = 5) -> List[Dict[str, Any]]:
+    """Answered top questions as [{question, answer, sources}]."""
+    faqs = []
+    for question in TOP_QUESTIONS.get(language, TOP_QUESTIONS["es"]):
+        answer = answer_from_item(item, question, language=language)
+        if answer is None:
+            continue
+        faqs.append({"question": question, "answer": answer["answer"], "sources": answer["sources"]})
+        if len(faqs) >= limit:
+            break
+    return faqs
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, accents and punctuation stripped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def _trigrams(text: str) -> set:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _same_words(a: str, b: str) -> bool:
+    """Whether two normalized questions differ only by typos: every word of
+    each has a counterpart in the other, and the negations are identical."""
+    words_a, words_b = set(a.split()), set(b.split())
+    if words_a & _NEGATIONS != words_b & _NEGATIONS:
+        return False
+    return all(_has_counterpart(w, words_b) for w in words_a) and all(_has_counterpart(w, words_a) for w in words_b)
+
+
+def _has_counterpart(word: str, words: set) -> bool:
+    if word in words:
+        return True
+    # Short words (articles, "no", "en") must match exactly
+    if len(word) < 4:
+        return False
+    grams = _trigrams(word)
+    return any(
+        len(w) >= 4 and len(grams & _trigrams(w)) / len(grams | _trigrams(w)) >= _WORD_MATCH_THRESHOLD
+        for w in words
+    )
+
+
+class FAQTable:
+    """Precomputed answers keyed by (item, language, normalized question)."""
+
+    def __init__(self, tables: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None):
+        self._tables = tables or {}
+        self._trigram_index: Dict[str, Dict[str, set]] = {}
+
+    @staticmethod
+    def _table_key(item_id: str, language: str) -> str:
+        return f"{item_id}:{language}"
+
+    @classmethod
+    def load(cls, path: str) -> "FAQTable":
+        """Read a table written by save(); a missing file is an empty table."""
+        if not os.path.exists(path):
+            return cls()
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("format") != _TABLE_FORMAT:
+            raise ValueError(f"Unsupported FAQ table format: {data.get('format')!r}")
+        return cls(data["tables"])
+
+    def save(self, path: str) -> None:
+        """Write atomically, so a serving process never reads a partial file."""
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as fh:
+            json.dump({"format": _TABLE_FORMAT, "tables": self._tables}, fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._tables.values())
+
+    def entries(self, item_id: str, language: str) -> Dict[str, Dict[str, Any]]:
+        return self._tables.get(self._table_key(item_id, language), {})
+
+    def put(self, item_id: str, language: str, question: str, result: Dict[str, Any], corpus_version: str) -> None:
+        key = self._table_key(item_id, language)
+        self._tables.setdefault(key, {})[normalize_question(question)] = {
+            "question": question,
+            "answer": result["answer"],
+            "sources": result.get("sources", []),
+            "corpus_version": corpus_version,
+        }
+        self._trigram_index.pop(key, None)
+
+    def retain(self, item_id: str, language: str, questions: Iterable[str]) -> int:
+        """Drop entries for questions no longer in the list; returns how many."""
+        key = self._table_key(item_id, language)
+        keep = {normalize_question(q) for q in questions}
+        entries = self._tables.get(key, {})
+        dropped = [k for k in entries if k not in keep]
+        for k in dropped:
+            del entries[k]
+        if dropped:
+            self._trigram_index.pop(key, None)
+        return len(dropped)
+
+    def lookup(
+        self,
+        item_id: str,
+        language: str,
+        question: str,
+        corpus_version: Optional[str],
+        threshold: float = NEAR_MATCH_THRESHOLD,
+    ) -> Optional[Dict[str, Any]]:
+        """Stored answer for the question or a near rewording, or None.
+
+        Entries answered from another corpus version are never returned.
+        A near rewording must also pass _same_words, since the trigram overlap
+        of "¿Incluye cargador en Brasil?" and "¿Incluye cargador?" is high.
+        """
+        key = self._table_key(item_id, language)
+        entries = self._tables.get(key)
+        if not entries or corpus_version is None:
+            return None
+        normalized = normalize_question(question)
+        entry = entries.get(normalized)
+        if entry is None:
+            index = self._trigram_index.get(key)
+            if index is None:
+                index = self._trigram_index[key] = {k: _trigrams(k) for k in entries}
+            query = _trigrams(normalized)
+            best, best_score = None, 0.0
+            for k, grams in index.items():
+                score = len(query & grams) / len(query | grams)
+                if score > best_score and score >= threshold and _same_words(normalized, k):
+                    best, best_score = k, score
+            if best is None:
+                return None
+            entry = entries[best]
+        if entry["corpus_version"] != corpus_version:
+            return None
+        return entry
+
+
+def build_table(
+    table: FAQTable,
+    item_id: str,
+    language: str,
+    questions: List[str],
+    corpus_version: str,
+    answer_fn: Callable[..., Dict[str, Any]],
+) -> Dict[str, int]:
+    """Bring one (item, language) table up to date with the question list.
+
+    Questions already answered from this corpus version are kept as-is; new
+    and stale ones go through answer_fn(question, language=...). Returns
+    {answered, kept, dropped}.
+    """
+    stats = {"answered": 0, "kept": 0, "dropped": table.retain(item_id, language, questions)}
+    entries = table.entries(item_id, language)
+    for question in questions:
+        entry = entries.get(normalize_question(question))
+        if entry is not None and entry["corpus_version"] == corpus_version:
+            stats["kept"] += 1
+            continue
+        table.put(item_id, language, question, answer_fn(question, language=language), corpus_version)
+        stats["answered"] += 1
+    return stats
+
+
+def learned_questions(path: str, language: str, min_count: int = 3, limit: int = 50) -> List[str]:
+    """Most frequent chat questions in a query log (see querylog.py), rotated files included."""
+    counts: Counter = Counter()
+    first_seen: Dict[str, str] = {}
+    for record in read_query_log(path):
+        question = record.get("question")
+        if not question or record.get("language", "es") != language or record.get("status", 200) >= 400:
+            continue
+        key = normalize_question(question)
+        counts[key] += 1
+        first_seen.setdefault(key, question)
+    return [first_seen[k] for k, n in counts.most_common(limit) if n >= min_count]
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Precompute chat answers for the FAQ table")
+    parser.add_argument("--output", default=FAQ_TABLE_PATH)
+    parser.add_argument("--languages", nargs="+", default=["es"])
+    parser.add_argument("--learned", help="Query log (QUERY_LOG_PATH) to learn frequent questions from")
+    parser.add_argument("--min-count", type=int, default=3, help="Times a logged question must be asked")
+    parser.add_argument("--limit", type=int, default=50, help="Max learned questions per language")
+    args = parser.parse_args()
+
+    if not os.getenv("OPENAI_API_KEY"):
+        sys.exit("OPENAI_API_KEY is required: without an LLM the table would only hold extractive summaries")
+
+    from . import main
+    from . import rag
+
+    main._bootstrap_vectors()
+    table = FAQTable.load(args.output)
+    for language in args.languages:
+        questions = list(CURATED_QUESTIONS.get(language, []))
+        if args.learned:
+            questions += learned_questions(args.learned, language, args.min_count, args.limit)
+        # Fast-path questions are answered from the item fields anyway
+        questions = [q for q in {normalize_question(q): q for q in questions}.values()
+                     if answer_from_item(main.SAMPLE_ITEM, q, language) is None]
+        stats = build_table(
+            table, main.SAMPLE_ITEM.id, language, questions, rag.corpus_version(),
+            lambda q, language: rag.answer_question(q, top_k=4, language=language),
+        )
+        print(f"{language}: {stats['answered']} answered, {stats['kept']} kept, {stats['dropped']} dropped")
+    table.save(args.output)
+    print(f"Wrote {len(table)} answers to {args.output}")
+
+
+if __name__ == "__main__":
+    main_()
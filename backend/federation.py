@@ -0,0 +1,245 @@
+"""
+Federated product search: one query fanned out to every configured provider
+at once, with the results merged by canonical URL.
+
+A provider is a Tavily query scoped to one marketplace (SEARCH_PROVIDERS,
+in order of preference; only mercadolibre by default, since every extra
+provider is one more Tavily call per search). The response is built as soon
+as SEARCH_QUORUM providers have answered, or once SEARCH_DEADLINE_S has
+passed and at least one has; providers still running are cancelled, so a
+slow marketplace costs its own results rather than the endpoint's latency.
+
+`search()` is the client both apps call (main.py and api/index.py).
+"""
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from .limits import Overloaded, async_upstream_slot
+from .metrics import count_event, count_upstream_error, timed
+from .models import SearchResponse
+from .tracing import span
+
+
+# Upstream endpoint; overridable to point at local stubs (see benchmarks/stubs.py)
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com/search")
+
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "7"))
+# 0 = wait for every provider (up to the deadline)
+SEARCH_QUORUM = int(os.getenv("SEARCH_QUORUM", "0"))
+SEARCH_DEADLINE_S = float(os.getenv("SEARCH_DEADLINE_S", "2.5"))
+
+
+class SearchNotConfigured(RuntimeError):
+    """TAVILY_API_KEY is not set; both apps answer 503."""
+
+
+@dataclass(frozen=True)
+class Provider:
+    name: str
+    query_template: str
+    weight: float = 1.0
+
+    def query(self, text: str) -> str:
+        return self.query_template.format(query=text)
+
+
+PROVIDERS = {
+    "mercadolibre": Provider("mercadolibre", "{query} -wikipedia -wikimedia mercadolibre.com.ar"),
+    "amazon": Provider("amazon", "{query} site:amazon.com -wikipedia -wikimedia"),
+}
+
+
+def configured_providers() -> List[Provider]:
+    names = [n.strip().lower() for n in os.getenv("SEARCH_PROVIDERS", "mercadolibre").split(",")]
+    providers = [PROVIDERS[n] for n in names if n in PROVIDERS]
+    unknown = [n for n in names if n and n not in PROVIDERS]
+    if unknown:
+        print(f"Ignoring unknown search providers: {', '.join(unknown)}")
+    return providers or [PROVIDERS["mercadolibre"]]
+
+
+# Query parameters that only track how the user got to the page
+_TRACKING_PARAM = re.compile(r"^(utm_\w+|ref|ref_|tag|tracking_id|position|search_layout|pdp_filters|th|psc)$")
+_AMAZON_PRODUCT = re.compile(r"^/(?:[^/]+/)?(?:dp|gp/product)/([A-Z0-9]{10})(?:/|$)")
+
+
+def canonical_url(url: str) -> str:
+    """One key for every URL of the same page: no scheme/www/fragment
+    differences, no tracking parameters, Amazon product URLs reduced to
+    /dp/<ASIN>."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/ref=[^/]*$", "", parts.path)
+    product = _AMAZON_PRODUCT.match(path) if "amazon." in host else None
+    if product:
+        path = f"/dp/{product.group(1)}"
+    path = path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAM.match(k.lower())
+    ))
+    return urlunsplit(("", host, path, query, "")).lstrip("/")
+
+
+def merge(answers: List[Tuple[Provider, List[Dict[str, Any]]]], max_results: int = SEARCH_MAX_RESULTS) -> List[Dict[str, Any]]:
+    """Deduplicate by canonical URL, best-scored hit first.
+
+    Each provider's own (weighted) score is kept per page; a page ranks by
+    the best of them, and its title/snippet come from that provider's hit.
+    Pages found by more providers win ties.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for provider, results in answers:
+        for item in results:
+            score = item.get("score")
+            if score is not None:
+                score = min(max(float(score) * provider.weight, 0.0), 1.0)
+            key = canonical_url(item["url"])
+            page = merged.setdefault(key, {"item": item, "best": score, "sources": []})
+            if provider.name not in page["sources"]:
+                page["sources"].append(provider.name)
+            if score is not None and (page["best"] is None or score > page["best"]):
+                page["item"], page["best"] = item, score
+    ranked = sorted(merged.values(), key=lambda p: (-(p["best"] or 0.0), -len(p["sources"])))
+    return [dict(p["item"], score=p["best"], sources=p["sources"]) for p in ranked[:max_results]]
+
+
+# (provider, query) -> results, or None when the provider failed
+Fetch = Callable[[Provider, str], Awaitable[Optional[List[Dict[str, Any]]]]]
+
+
+async def federate(
+    query: str,
+    providers: List[Provider],
+    fetch: Fetch,
+    quorum: int = SEARCH_QUORUM,
+    deadline_s: float = SEARCH_DEADLINE_S,
+    max_results: int = SEARCH_MAX_RESULTS,
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """(merged results, status per provider).
+
+    Status is "ok", "empty", "error", "rejected" (its limiter shed the call)
+    or "late" (cancelled at quorum/deadline). If every provider was rejected
+    the Overloaded is raised, so the endpoint answers 429 as before.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_s
+    needed = min(quorum or len(providers), len(providers))
+    tasks = {asyncio.ensure_future(fetch(p, p.query(query))): p for p in providers}
+    answers: Dict[str, List[Dict[str, Any]]] = {}
+    status: Dict[str, str] = {}
+    rejected: Optional[Overloaded] = None
+    pending = set(tasks)
+    try:
+        while pending and len(answers) < needed:
+            remaining = deadline - loop.time()
+            if answers and remaining <= 0:
+                count_event("search", "deadline")
+                break
+            # Until someone answers there is nothing to return early with
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining if answers else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = tasks[task].name
+                try:
+                    results = task.result()
+                except Overloaded as e:
+                    rejected, status[name] = e, "rejected"
+                    continue
+                except Exception as e:
+                    print(f"Search provider {name} failed: {e}")
+                    results = None
+                if results is None:
+                    status[name] = "error"
+                else:
+                    answers[name] = results
+                    status[name] = "ok" if results else "empty"
+    finally:
+        for task in pending:
+            task.cancel()
+            status[tasks[task].name] = "late"
+            count_event("search", "late")
+    if not answers and rejected is not None and all(s == "rejected" for s in status.values()):
+        raise rejected
+    ordered = [(p, answers[p.name]) for p in providers if p.name in answers]
+    return merge(ordered, max_results), status
+
+
+async def search(query: str) -> Tuple[SearchResponse, Dict[str, str]]:
+    """Fan the query out to every configured provider; (response, status per provider).
+
+    Raises SearchNotConfigured without TAVILY_API_KEY.
+    """
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        count_event("search", "not_configured")
+        raise SearchNotConfigured("TAVILY_API_KEY is not set")
+    async with httpx.AsyncClient() as client:
+        async def fetch(provider: Provider, provider_query: str):
+            return await _search_tavily(client, api_key, provider, provider_query)
+
+        results, providers = await federate(query, configured_providers(), fetch)
+    with timed("search", "parse"):
+        # One validation pass in pydantic-core for all hits
+        search_response = SearchResponse.model_validate({"results": results})
+    if not results:
+        count_event("search", "no_results")
+    return search_response, providers
+
+
+async def _search_tavily(
+    client: httpx.AsyncClient, api_key: str, provider: Provider, query: str
+) -> Optional[List[Dict[str, Any]]]:
+    """One provider's hits, or None if the call failed."""
+    try:
+        async with async_upstream_slot("tavily"):
+            with timed("search", "tavily"), span("tavily", url=TAVILY_API_URL, provider=provider.name,
+                                                  max_results=SEARCH_MAX_RESULTS) as s:
+                response = await client.post(
+                    TAVILY_API_URL,
+                    json={
+                        "api_key": api_key,
+                        "query": query,
+                        "search_depth": "basic",
+                        "include_answer": False,
+                        "include_images": False,
+                        "include_raw_content": False,
+                        "max_results": SEARCH_MAX_RESULTS
+                    },
+                    headers={"Content-Type": "application/json"},
+                    timeout=10.0
+                )
+                if s:
+                    s.set_attribute("status_code", response.status_code)
+
+        if response.status_code == 200:
+            data = response.json()
+            return [
+                {
+                    "title": item.get("title", ""),
+                    "url": item.get("url", ""),
+                    "content": item.get("content", ""),
+                    "score": item.get("score")
+                }
+                for item in data.get("results", [])[:SEARCH_MAX_RESULTS]
+            ]
+        else:
+            count_upstream_error("tavily")
+            return None
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        count_upstream_error("tavily")
+        print(f"Search error ({provider.name}): {e}")
+        return None
@@ -0,0 +1,202 @@
+"""
+Extractive fast path: answer factual questions (price, stock, storage, seller,
+installments) straight from the item fields, without embeddings or an LLM call.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Minimum confidence to answer from the templates instead of falling through to RAG
+FAST_PATH_MIN_CONFIDENCE = 0.8
+# Longer questions are usually not simple lookups
+_MAX_QUESTION_WORDS = 12
+
+_INTENT_PATTERNS: Dict[str, List[str]] = {
+    # "how much"/"cuánto" only at the start of the question: "How much does
+    # shipping cost?" asks about shipping, not the item's price
+    "price": [
+        r"^¿?cuanto (cuesta|sale|vale)\b", r"\bprecio\b", r"^¿?quanto (custa|e)\b", r"\bpreco\b",
+        r"^how much (is it|does it cost)\b", r"\bprice\b", r"\bcost\b",
+    ],
+    "stock": [
+        r"\bstock\b", r"\bdisponible", r"\bquedan\b", r"\bunidades\b", r"\bestoque\b",
+        r"\bdisponive", r"\bavailab", r"\bunits\b",
+    ],
+    "storage": [
+        r"\bgb\b", r"\balmacenamiento\b", r"\bmemoria\b", r"\bram\b", r"\barmazenamento\b",
+        r"\bstorage\b", r"\bmemory\b",
+    ],
+    "seller": [
+        r"\bquien (lo )?vende\b", r"\bvendedor\b", r"\btienda\b", r"\bquem vende\b", r"\bloja\b",
+        r"\bseller\b", r"\bwho sells\b", r"\bstore\b",
+    ],
+    "installments": [
+        r"\bcuotas?\b", r"\bsin interes\b", r"\bmedios de pago\b", r"\bparcelas?\b", r"\bsem juros\b",
+        r"\binstallments?\b", r"\binterest.free\b", r"\bpayment\b", r"\bpagar\b", r"\bpay\b",
+    ],
+}
+# Question scaffolding; every other word has to be explained by the intent's
+# patterns, so qualifiers ("color", "envío", "compatible", "garantía") and
+# other subjects ("cámara") lower the confidence
+_FILLER_WORDS = frozenset("""
+    que cual cuales quien como cuanto cuanta cuantos cuantas es son esta estan hay tiene tienen
+    el la los las lo un una unos unas de del al en con para por se puede me y o
+    qual quais quem quanto quanta quantos quantas tem ha o a os as um uma do da dos das em no na
+    com pode posso e
+    what which who how much many is are it its there does do can i the an of in to with for have has
+""".split())
+# Questions that need reasoning over the facts rather than a lookup
+_COMPLEX_PATTERNS = [
+    r"\bcompar", r"\bvs\b", r"\bversus\b", r"\bmejor\b", r"\bmelhor\b", r"\bbetter\b",
+    r"\bdiferencia\b", r"\bdiferenca\b", r"\bdifference\b", r"\bpor que\b", r"\bwhy\b",
+]
+
+_TEMPLATES: Dict[str, Dict[str, str]] = {
+    "es": {
+        "price": "El precio es {price}.",
+        "stock": "Hay {stock} unidades disponibles.",
+        "no_stock": "En este momento no hay stock disponible.",
+        "storage": "Tiene {storage} GB de almacenamiento y {ram} GB de RAM.",
+        "seller": "Lo vende {name}, con reputación {reputation} y {sales} ventas.",
+        "installments": "Podés pagarlo así: {methods}.",
+    },
+    "pt": {
+        "price": "O preço é {price}.",
+        "stock": "Há {stock} unidades disponíveis.",
+        "no_stock": "No momento não há estoque disponível.",
+        "storage": "Tem {storage} GB de armazenamento e {ram} GB de RAM.",
+        "seller": "É vendido por {name}, com reputação {reputation} e {sales} vendas.",
+        "installments": "Você pode pagar assim: {methods}.",
+    },
+    "en": {
+        "price": "The price is {price}.",
+        "stock": "There are {stock} units available.",
+        "no_stock": "It is currently out of stock.",
+        "storage": "It has {storage} GB of storage and {ram} GB of RAM.",
+        "seller": "It is sold by {name}, with {reputation} reputation and {sales} sales.",
+        "installments": "You can pay: {methods}.",
+    },
+}
+_SECTIONS = {
+    "price": "Precio",
+    "stock": "Stock",
+    "storage": "Título",
+    "seller": "Vendedor",
+    "installments": "Medios de pago",
+}
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def classify_intent(question: str) -> Tuple[Optional[str], float]:
+    """Return (intent, confidence) for a question, or (None, 0.0).
+
+    Confidence is the share of the question's content words the intent's
+    patterns account for, and drops when several intents match, the
+    question is long or it asks for a comparison/explanation.
+    """
+    text = _normalize(question.strip())
+    words = text.split()
+    if not words:
+        return None, 0.0
+
+    hits: Dict[str, int] = {}
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    for intent, patterns in _INTENT_PATTERNS.items():
+        matches = [list(re.finditer(p, text)) for p in patterns]
+        if any(matches):
+            hits[intent] = sum(1 for m in matches if m)
+            spans[intent] = [m.span() for found in matches for m in found]
+    if not hits:
+        return None, 0.0
+
+    intent = max(hits, key=hits.get)
+    confidence = hits[intent] / sum(hits.values()) * _coverage(text, spans[intent])
+    if len(words) > _MAX_QUESTION_WORDS:
+        confidence *= 0.5
+    if _is_complex(text):
+        confidence *= 0.5
+    return intent, confidence
+
+
+def _coverage(text: str, spans: List[Tuple[int, int]]) -> float:
+    """Share of the content words overlapped by a pattern match."""
+    content = [m.span() for m in re.finditer(r"\w+", text) if m.group() not in _FILLER_WORDS]
+    if not content:
+        return 1.0
+    covered = sum(1 for start, end in content if any(s < end and start < e for s, e in spans))
+    return covered / len(content)
+
+
+def _is_complex(text: str) -> bool:
+    return any(re.search(p, text) for p in _COMPLEX_PATTERNS)
+
+
+def is_complex(question: str) -> bool:
+    """True for comparisons and why-questions, which need reasoning rather than a lookup."""
+    return _is_complex(_normalize(question))
+
+
+def _format_price(price: float, currency: str, language: str) -> str:
+    decimals = 0 if float(price).is_integer() else 2
+    amount = f"{price:,.{decimals}f}"
+    if language != "en":
+        amount = amount.replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"$ {amount} {currency}"
+
+
+def _storage_from_title(title: str) -> Optional[Tuple[str, str]]:
+    ram = re.search(r"(\d+)\s*GB\s+RAM", title, re.IGNORECASE)
+    storage = re.search(r"(\d+)\s*GB(?!\s+RAM)", title, re.IGNORECASE)
+    if not ram or not storage:
+        return None
+    return storage.group(1), ram.group(1)
+
+
+def _render(intent: str, item: Any, language: str) -> Optional[Tuple[str, str]]:
+    """Return (answer, snippet) for the intent, or None if the item lacks the facts."""
+    t = _TEMPLATES.get(language, _TEMPLATES["es"])
+    if intent == "price":
+        text = t["price"].format(price=_format_price(item.price, item.currency, language))
+        return text, text
+    if intent == "stock":
+        text = t["stock"].format(stock=item.stock) if item.stock > 0 else t["no_stock"]
+        return text, f"stock: {item.stock}"
+    if intent == "storage":
+        parsed = _storage_from_title(item.title)
+        if parsed is None:
+            return None
+        return t["storage"].format(storage=parsed[0], ram=parsed[1]), item.title
+    if intent == "seller":
+        seller = item.seller
+        text = t["seller"].format(name=seller.name, reputation=seller.reputation, sales=seller.sales)
+        return text, f"{seller.name} {seller.reputation} {seller.sales}"
+    if intent == "installments":
+        if not item.payment_methods:
+            return None
+        methods = "; ".join(m.description for m in item.payment_methods)
+        return t["installments"].format(methods=methods), methods
+    return None
+
+
+def answer_from_item(item: Any, question: str, language: str = "es") -> Optional[Dict[str, Any]]:
+    """Answer from the item's structured fields when the intent is clear.
+
+    Returns {answer, sources, intent} or None to fall through to RAG.
+    """
+    intent, confidence = classify_intent(question)
+    if intent is None or confidence < FAST_PATH_MIN_CONFIDENCE:
+        return None
+    rendered = _render(intent, item, language)
+    if rendered is None:
+        return None
+    answer, snippet = rendered
+    return {
+        "answer": answer,
+        "sources": [{"section": _SECTIONS[intent], "snippet": snippet[:160]}],
+        "intent": intent,
+    }
@@ -0,0 +1,357 @@
+"""
+Admission control for upstream calls.
+
+- Per-upstream concurrency limits (OpenAI, Tavily) with a bounded wait
+  queue: once `max_queue` callers are waiting, or a caller waited
+  LIMIT_QUEUE_TIMEOUT_S, the request is rejected with Overloaded (mapped to
+  429 + Retry-After in main.py) instead of piling up threads and timing out.
+- Per user API key: requests made with a user's own key share a small limit
+  keyed by the key's hash, so one user can't take every slot.
+- Token buckets per (upstream, hashed key) for requests and tokens per
+  minute. Short waits are paced (the call is delayed until the budget
+  refills); anything over LIMIT_MAX_WAIT_S is rejected up front. A bucket
+  that has refilled is no different from a new one, so idle keys' buckets
+  are dropped (swept at most every LIMIT_BUCKET_SWEEP_S).
+
+Configured per upstream from the environment, e.g. OPENAI_MAX_CONCURRENCY,
+OPENAI_MAX_QUEUE, OPENAI_RPM, OPENAI_TPM (0 = no rate limit).
+"""
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .metrics import count_event, record_stage
+
+
+# Defaults per upstream: (max concurrent calls, max waiting callers)
+_DEFAULTS = {"openai": (8, 16), "tavily": (4, 16), "user_key": (2, 2)}
+_SERVICE_TIME_ALPHA = 0.2  # EWMA weight for the Retry-After estimate
+
+
+class Overloaded(Exception):
+    """Raised when a call is not admitted; retry_after is in seconds."""
+
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(f"{limit} is over capacity, retry in {retry_after:.1f}s")
+        self.limit = limit
+        self.retry_after = max(1.0, retry_after)
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(math.ceil(self.retry_after))
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def hash_key(api_key: str) -> str:
+    """Stable, non-reversible id for an API key (never store the key itself)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class Limiter:
+    """Concurrency limit with a bounded FIFO-ish wait queue, for threads."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._service_time = 1.0
+        self._cond = threading.Condition()
+
+    def retry_after(self) -> float:
+        """Expected wait for a new caller, from the recent time per call."""
+        return self._service_time * (self.waiting + 1) / max(1, self.max_concurrent)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def _acquire(self) -> None:
+        with self._cond:
+            if self.in_flight < self.max_concurrent and not self.waiting:
+                self.in_flight += 1
+                return
+            if self.waiting >= self.max_queue:
+                count_event("admission", f"{self.name}_rejected")
+                raise Overloaded(self.name, self.retry_after())
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                admitted = self._cond.wait_for(lambda: self.in_flight < self.max_concurrent, self.timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                count_event("admission", f"{self.name}_timeout")
+                raise Overloaded(self.name, self.retry_after())
+            self.in_flight += 1
+        record_stage("admission", "queue", time.perf_counter() - start)
+
+    def _release(self, elapsed: float) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._service_time += _SERVICE_TIME_ALPHA * (elapsed - self._service_time)
+            self._cond.notify()
+
+
+class AsyncLimiter:
+    """Same as Limiter for coroutines on one event loop; a released slot is
+    handed directly to the oldest waiter."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._service_time = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        return self._service_time * (self.waiting + 1) / max(1, self.max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - start)
+
+    async def _acquire(self) -> None:
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            count_event("admission", f"{self.name}_rejected")
+            raise Overloaded(self.name, self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            count_event("admission", f"{self.name}_timeout")
+            raise Overloaded(self.name, self.retry_after()) from None
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self._release(0.0)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        record_stage("admission", "queue", time.perf_counter() - start)
+
+    def _release(self, elapsed: float) -> None:
+        self._service_time += _SERVICE_TIME_ALPHA * (elapsed - self._service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # in_flight stays: the slot changes hands
+                return
+        self.in_flight -= 1
+
+
+class TokenBucket:
+    """Rate budget refilled continuously; reservations may run it negative,
+    so later callers queue behind earlier ones."""
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float, max_wait: Optional[float]) -> float:
+        """Take `amount` and return how long to wait before using it; raises
+        Overloaded (taking nothing) if that is longer than max_wait."""
+        # A single call larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                count_event("admission", f"{self.name}_rate_limited")
+                raise Overloaded(self.name, wait)
+            self._tokens -= amount
+            return wait
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+    def full(self, now: float) -> bool:
+        """Whether the budget has refilled completely by `now`."""
+        with self._lock:
+            return self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+
+# Upstream limiters and per-key buckets, created on first use from the environment
+_LIMITERS: Dict[str, Limiter] = {}
+_ASYNC_LIMITERS: Dict[str, AsyncLimiter] = {}
+_BUCKETS: Dict[Tuple[str, str, str], TokenBucket] = {}
+_RATES: Dict[Tuple[str, str], float] = {}  # (upstream, unit) -> per minute
+_KEY_LIMITERS: Dict[str, List] = {}  # hashed key -> [Limiter, users]
+_REGISTRY_LOCK = threading.Lock()
+
+QUEUE_TIMEOUT = _env_float("LIMIT_QUEUE_TIMEOUT_S", 10.0)
+MAX_WAIT = _env_float("LIMIT_MAX_WAIT_S", 2.0)
+BUCKET_SWEEP_S = _env_float("LIMIT_BUCKET_SWEEP_S", 60.0)
+_swept_at = 0.0
+
+
+def _limiter_config(name: str) -> Tuple[int, int]:
+    concurrent, queue = _DEFAULTS.get(name, (8, 16))
+    prefix = name.upper()
+    return (
+        int(_env_float(f"{prefix}_MAX_CONCURRENCY", concurrent)),
+        int(_env_float(f"{prefix}_MAX_QUEUE", queue)),
+    )
+
+
+def get_limiter(name: str) -> Limiter:
+    with _REGISTRY_LOCK:
+        if name not in _LIMITERS:
+            _LIMITERS[name] = Limiter(name, *_limiter_config(name), QUEUE_TIMEOUT)
+        return _LIMITERS[name]
+
+
+def get_async_limiter(name: str) -> AsyncLimiter:
+    with _REGISTRY_LOCK:
+        if name not in _ASYNC_LIMITERS:
+            _ASYNC_LIMITERS[name] = AsyncLimiter(name, *_limiter_config(name), QUEUE_TIMEOUT)
+        return _ASYNC_LIMITERS[name]
+
+
+def _bucket(upstream: str, key: str, unit: str) -> Optional[TokenBucket]:
+    """Bucket for RPM or TPM of (upstream, key); None when not configured."""
+    with _REGISTRY_LOCK:
+        if (upstream, unit) not in _RATES:
+            _RATES[(upstream, unit)] = _env_float(f"{upstream.upper()}_{unit}", 0.0)
+        per_minute = _RATES[(upstream, unit)]
+        if per_minute <= 0:
+            return None
+        _sweep_buckets()
+        bucket = _BUCKETS.get((upstream, key, unit))
+        if bucket is None:
+            bucket = _BUCKETS[(upstream, key, unit)] = TokenBucket(f"{upstream}_{unit.lower()}", per_minute)
+        return bucket
+
+
+def _sweep_buckets() -> None:
+    # Caller holds _REGISTRY_LOCK
+    global _swept_at
+    now = time.monotonic()
+    if now - _swept_at < BUCKET_SWEEP_S:
+        return
+    _swept_at = now
+    for name in [name for name, bucket in _BUCKETS.items() if bucket.full(now)]:
+        del _BUCKETS[name]
+
+
+def _reserve(upstream: str, api_key: Optional[str], tokens: int, max_wait: Optional[float]) -> float:
+    """Reserve one request (and `tokens`) of the key's budget; returns the wait."""
+    key = hash_key(api_key) if api_key else "-"
+    reserved: List[Tuple[TokenBucket, float]] = []
+    wait = 0.0
+    try:
+        for unit, amount in (("RPM", 1), ("TPM", tokens)):
+            bucket = _bucket(upstream, key, unit)
+            if bucket is None or not amount:
+                continue
+            wait = max(wait, bucket.reserve(amount, max_wait))
+            reserved.append((bucket, amount))
+    except Overloaded:
+        for bucket, amount in reserved:
+            bucket.refund(amount)
+        raise
+    return wait
+
+
+@contextmanager
+def upstream_slot(
+    upstream: str, api_key: Optional[str] = None, tokens: int = 0, background: bool = False
+) -> Iterator[None]:
+    """Admit one blocking call to `upstream`: pace it to the rate budget, then
+    take a concurrency slot. Background work (indexing) waits for budget as
+    long as needed instead of being rejected after LIMIT_MAX_WAIT_S."""
+    wait = _reserve(upstream, api_key, tokens, None if background else MAX_WAIT)
+    if wait > 0:
+        count_event("admission", f"{upstream}_paced")
+        start = time.perf_counter()
+        time.sleep(wait)
+        record_stage("admission", "rate_limit", time.perf_counter() - start)
+    with get_limiter(upstream).slot():
+        yield
+
+
+@asynccontextmanager
+async def async_upstream_slot(upstream: str, api_key: Optional[str] = None, tokens: int = 0):
+    """upstream_slot for coroutines."""
+    wait = _reserve(upstream, api_key, tokens, MAX_WAIT)
+    if wait > 0:
+        count_event("admission", f"{upstream}_paced")
+        start = time.perf_counter()
+        await asyncio.sleep(wait)
+        record_stage("admission", "rate_limit", time.perf_counter() - start)
+    async with get_async_limiter(upstream).slot():
+        yield
+
+
+@contextmanager
+def key_slot(api_key: str) -> Iterator[None]:
+    """Per-user concurrency limit for requests made with the user's own key."""
+    key = hash_key(api_key)
+    with _REGISTRY_LOCK:
+        entry = _KEY_LIMITERS.get(key)
+        if entry is None:
+            entry = _KEY_LIMITERS[key] = [Limiter("user_key", *_limiter_config("user_key"), QUEUE_TIMEOUT), 0]
+        entry[1] += 1
+    try:
+        with entry[0].slot():
+            yield
+    finally:
+        with _REGISTRY_LOCK:
+            entry[1] -= 1
+            if entry[1] == 0 and _KEY_LIMITERS.get(key) is entry:
+                del _KEY_LIMITERS[key]
+
+
+def reset_limits() -> None:
+    """Drop all limiters and buckets so the next call re-reads the environment."""
+    global QUEUE_TIMEOUT, MAX_WAIT, BUCKET_SWEEP_S
+    with _REGISTRY_LOCK:
+        _LIMITERS.clear()
+        _ASYNC_LIMITERS.clear()
+        _BUCKETS.clear()
+        _RATES.clear()
+        _KEY_LIMITERS.clear()
+    QUEUE_TIMEOUT = _env_float("LIMIT_QUEUE_TIMEOUT_S", 10.0)
+    MAX_WAIT = _env_float("LIMIT_MAX_WAIT_S", 2.0)
+    BUCKET_SWEEP_S = _env_float("LIMIT_BUCKET_SWEEP_S", 60.0)
@@ -1,68 +1,33 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from rag import ingest_corpus, answer_question
-import httpx
+from .rag import ingest_corpus, ingest_or_restore, corpus_version, snapshot
+from .metrics import REGISTRY, CONTENT_TYPE, ServerTimingMiddleware, count_event, timed
+from .tracing import span
+from .profiler import profile_from_env
+from .serialization import FastJSONResponse, StaticJSON, json_line, json_response
+from .compression import CompressionMiddleware, Precompressed
+from .querylog import log_query
+from .faqs import FAQ_TABLE_PATH, FAQTable, top_faqs
+from .limits import Overloaded
+from .models import (
+    ChatRequest, CharacteristicRating, ItemDetail, PageResponse, PaymentMethod, PrefetchRequest,
+    RatingBreakdown, Review, ReviewsData, SearchRequest, SearchResponse, SellerInfo,
+)
+from .corpus import build_corpus, product_sheets
+from . import enrichment
+from . import federation
+from .federation import SearchNotConfigured
+from . import sharedindex
+from .serving import chat, chat_response, prefetch_status, profile_response, require_admin, search_response
+import asyncio
 import json
+import os
+import time
 
 
-class PaymentMethod(BaseModel):
-    type: str
-    description: str
-
-
-class SellerInfo(BaseModel):
-    name: str
-    reputation: str
-    sales: int
-
-
-class Review(BaseModel):
-    id: str
-    rating: int
-    text: str
-    author: str
-    date: str
-    verified_purchase: bool = False
-
-
-class RatingBreakdown(BaseModel):
-    five_stars: int
-    four_stars: int
-    three_stars: int
-    two_stars: int
-    one_star: int
-
-
-class CharacteristicRating(BaseModel):
-    name: str
-    rating: float
-
-
-class ReviewsData(BaseModel):
-    overall_rating: float
-    total_reviews: int
-    rating_breakdown: RatingBreakdown
-    characteristic_ratings: List[CharacteristicRating]
-    reviews: List[Review]
-
-
-class ItemDetail(BaseModel):
-    id: str
-    title: str
-    description: str
-    price: float
-    currency: str
-    images: List[str]
-    payment_methods: List[PaymentMethod]
-    seller: SellerInfo
-    stock: int
-    ratings: float
-    reviews_count: int
-
-
-app = FastAPI(title="GenAI Product Assistant API")
+app = FastAPI(title="GenAI Product Assistant API", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -76,7 +41,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.exception_handler(Overloaded)
+async def _overloaded_handler(request: Request, exc: Overloaded):
+    # Shed load early with a retry hint instead of queueing until a timeout
+    return FastJSONResponse(
+        {"detail": "Service is busy, please retry", "limit": exc.limit},
+        status_code=429,
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+
+@app.exception_handler(SearchNotConfigured)
+async def _search_not_configured_handler(request: Request, exc: SearchNotConfigured):
+    return FastJSONResponse({"detail": "Search is not configured"}, status_code=503)
+
 
 SAMPLE_ITEM = ItemDetail(
     id="MLA123456",
@@ -177,121 +161,189 @@ REVIEWS_DATA = ReviewsData(
 )
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/admin/profile", include_in_schema=False)
+async def profile_endpoint(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    include_idle: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+) -> Response:
+    """Sample all threads for `seconds` and return collapsed stacks.
+
+    Disabled (404) unless ADMIN_TOKEN is set and sent as X-Admin-Token.
+    """
+    require_admin(x_admin_token)
+    return await profile_response(seconds, interval_ms, include_idle)
+
+
+@app.post("/admin/reindex", include_in_schema=False)
+def reindex_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """Rebuild the RAG index from the catalog. In multi-worker mode
+    (RAG_SHARED_DIR) it is published as a new generation that every worker
+    swaps to on its next chat request.
+
+    Disabled (404) unless ADMIN_TOKEN is set and sent as X-Admin-Token.
+    """
+    require_admin(x_admin_token)
+    docs, sheet = build_corpus(SAMPLE_ITEM, REVIEWS_DATA), product_sheets(SAMPLE_ITEM)
+    if sharedindex.generation() is not None:
+        generation = sharedindex.reload(docs, sheet)
+    else:
+        ingest_corpus(docs, product_sheet=sheet)
+        generation = None
+    return json_response({"corpus_version": corpus_version(), "generation": generation})
+
+
+# Static payloads are serialized and compressed once; the endpoints skip
+# response_model validation (the models are only used for the OpenAPI schema)
+# and answer revalidations with 304
+_ITEM_PAYLOAD = Precompressed(StaticJSON(SAMPLE_ITEM).body)
+_REVIEWS_PAYLOAD = Precompressed(StaticJSON(REVIEWS_DATA).body)
+
+
 @app.get("/item", response_model=ItemDetail)
-def get_item_detail() -> ItemDetail:
-    return SAMPLE_ITEM
+def get_item_detail(request: Request) -> Response:
+    return _ITEM_PAYLOAD.response(request)
 
 
 @app.get("/reviews", response_model=ReviewsData)
-def get_reviews() -> ReviewsData:
-    return REVIEWS_DATA
+def get_reviews(request: Request) -> Response:
+    return _REVIEWS_PAYLOAD.response(request)
+
+
+# Reviews included in the page bootstrap; the rest stay behind /reviews
+REVIEWS_PAGE_SIZE = int(os.getenv("REVIEWS_PAGE_SIZE", "10"))
+
 
+# Assembled page payloads per language, precompressed like /item
+_PAGE_PAYLOADS: Dict[str, Precompressed] = {}
 
-class ChatRequest(BaseModel):
-    question: str
-    openai_key: str = None
 
+@app.get("/page/{item_id}", response_model=PageResponse)
+async def get_page(request: Request, item_id: str, lang: str = Query("es", pattern="^(es|pt|en)$")) -> Response:
+    """Item, first review page and suggested Q&A in one response for the page bootstrap"""
+    if item_id != SAMPLE_ITEM.id:
+        raise HTTPException(status_code=404, detail="Item not found")
+    payload = _PAGE_PAYLOADS.get(lang)
+    if payload is None:
+        count_event("page", "assemble")
+        with timed("page", "assemble"):
+            payload = _PAGE_PAYLOADS[lang] = await _assemble_page(lang)
+    return payload.response(request)
 
-class SearchResult(BaseModel):
-    title: str
-    url: str
-    content: str
-    score: Optional[float] = None
 
+async def _assemble_page(lang: str) -> Precompressed:
+    # Sections are built concurrently and spliced as already-serialized JSON
+    reviews, faqs = await asyncio.gather(
+        asyncio.to_thread(_first_reviews_page),
+        asyncio.to_thread(_faqs_json, lang),
+    )
+    return Precompressed(b'{"item":' + _ITEM_PAYLOAD.body + b',"reviews":' + reviews + b',"faqs":' + faqs + b"}")
 
-class SearchRequest(BaseModel):
-    query: str
 
+def _faqs_json(lang: str) -> bytes:
+    return json.dumps(top_faqs(SAMPLE_ITEM, lang), ensure_ascii=False).encode("utf-8")
 
-class SearchResponse(BaseModel):
-    results: List[SearchResult]
+
+def _first_reviews_page() -> bytes:
+    if len(REVIEWS_DATA.reviews) <= REVIEWS_PAGE_SIZE:
+        return _REVIEWS_PAYLOAD.body
+    return StaticJSON(REVIEWS_DATA.model_copy(update={"reviews": REVIEWS_DATA.reviews[:REVIEWS_PAGE_SIZE]})).body
 
 
 @app.on_event("startup")
 def _bootstrap_vectors() -> None:
-    # Build a tiny in-memory corpus from existing sections
-    docs = [
-        {"id": "title", "section": "Título", "text": SAMPLE_ITEM.title},
-        {"id": "desc", "section": "Descripción", "text": SAMPLE_ITEM.description},
-        {
-            "id": "specs",
-            "section": "Características del producto",
-            "text": "\n".join([f"{c.name}: {c.rating}★" for c in REVIEWS_DATA.characteristic_ratings]),
-        },
-        {
-            "id": "seller",
-            "section": "Vendedor",
-            "text": f"{SAMPLE_ITEM.seller.name} reputación {SAMPLE_ITEM.seller.reputation} ventas {SAMPLE_ITEM.seller.sales}",
-        },
-        {
-            "id": "payments",
-            "section": "Medios de pago",
-            "text": ", ".join([m.description for m in SAMPLE_ITEM.payment_methods]),
-        },
-        {
-            "id": "reviews",
-            "section": "Opiniones destacadas",
-            "text": "\n\n".join([r.text for r in REVIEWS_DATA.reviews]),
-        },
-    ]
-    ingest_corpus(docs)
+    # Build a tiny in-memory corpus from existing sections, or load the
+    # snapshot of it (RAG_SNAPSHOT_PATH) before serving any traffic
+    docs, sheet = build_corpus(SAMPLE_ITEM, REVIEWS_DATA), product_sheets(SAMPLE_ITEM)
+    if sharedindex.enabled():
+        # Multi-worker mode: one worker builds, every worker maps the result
+        sharedindex.start(docs, sheet)
+    else:
+        ingest_or_restore(docs, product_sheet=sheet)
+
+
+@app.on_event("shutdown")
+def _save_snapshot() -> None:
+    # Hand the queries this worker warmed to the one that replaces it
+    try:
+        snapshot()
+    except OSError as e:
+        print(f"Could not save RAG snapshot: {e}")
+
+
+# Answers precomputed offline by `python -m backend.faqs`; empty when no table was built
+FAQ_TABLE = FAQTable()
+
+
+@app.on_event("startup")
+def _load_faq_table() -> None:
+    global FAQ_TABLE
+    FAQ_TABLE = FAQTable.load(FAQ_TABLE_PATH)
+
+
+@app.on_event("startup")
+def _profile_startup() -> None:
+    # PROFILE_SECONDS=N profiles the first N seconds (see profiler.profile_from_env)
+    profile_from_env()
+
+
+@app.on_event("startup")
+async def _open_enrichment_client() -> None:
+    enrichment.open_client()
+
+
+@app.on_event("shutdown")
+async def _close_enrichment_client() -> None:
+    await enrichment.close_client()
 
 
 @app.post("/search", response_model=SearchResponse)
 async def search_endpoint(payload: SearchRequest):
-    """Search MercadoLibre Argentina using Tavily API"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
-                json={
-                    "api_key": "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",
-                    "query": f"{payload.query} -wikipedia -wikimedia mercadolibre.com.ar",
-                    "search_depth": "basic",
-                    "include_answer": False,
-                    "include_images": False,
-                    "include_raw_content": False,
-                    "max_results": 7
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                for item in data.get("results", [])[:7]:  # Limit to top 7
-                    results.append(SearchResult(
-                        title=item.get("title", ""),
-                        url=item.get("url", ""),
-                        content=item.get("content", ""),
-                        score=item.get("score")
-                    ))
-                
-                return SearchResponse(results=results)
-            else:
-                return SearchResponse(results=[])
-                
-    except Exception as e:
-        print(f"Search error: {e}")
-        return SearchResponse(results=[])
+    """Search MercadoLibre (and the other SEARCH_PROVIDERS) using Tavily API"""
+    return await search_response(payload)
+
+
+@app.post("/search/stream")
+async def search_stream_endpoint(payload: SearchRequest):
+    """/search results as the first NDJSON line, then one line per top result
+    with the title and price read from its page, in the order they finish."""
+    start = time.perf_counter()
+    with span("search_endpoint", query=payload.query[:100], enrich=True) as s:
+        response, providers = await federation.search(payload.query)
+        if s:
+            s.set_attribute("results", len(response.results))
+    log_query("search", start, query=payload.query, results=len(response.results), providers=providers,
+              enrich=True, outcome="results" if response.results else "no_results")
+    urls = [r.url for r in response.results[:enrichment.ENRICH_TOP_N]]
+
+    async def lines():
+        yield response.model_dump_json().encode("utf-8") + b"\n"
+        async with enrichment.enrichment_client() as client:
+            async for index, listing in enrichment.enrich(client, urls):
+                yield json_line({"index": index, "url": urls[index], "listing": listing})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.post("/agent/chat")
 def chat_endpoint(payload: ChatRequest):
-    # Temporarily set the API key if provided
-    import os
-    original_key = os.environ.get("OPENAI_API_KEY")
-    if payload.openai_key:
-        os.environ["OPENAI_API_KEY"] = payload.openai_key
-    
-    try:
-        result = answer_question(payload.question, top_k=4, language="es")
-        return result
-    finally:
-        # Restore original key
-        if original_key:
-            os.environ["OPENAI_API_KEY"] = original_key
-        elif "OPENAI_API_KEY" in os.environ:
-            del os.environ["OPENAI_API_KEY"]
+    return chat_response(payload, _chat)
+
+
+def _chat(payload: ChatRequest) -> dict:
+    return chat(payload, SAMPLE_ITEM, FAQ_TABLE)
+
+
+@app.post("/agent/prefetch")
+def prefetch_endpoint(payload: PrefetchRequest):
+    """Warm embedding and retrieval for a question while it is being typed,
+    so /agent/chat only waits for the LLM once it is submitted."""
+    status = prefetch_status(payload, SAMPLE_ITEM, FAQ_TABLE)
+    count_event("prefetch", status)
+    return json_response({"status": status})
@@ -0,0 +1,260 @@
+"""
+Per-stage timers and counters for the chat/search paths.
+
+Stage durations go to Prometheus histograms (text format served on /metrics)
+and, for the current request, to a Server-Timing header so the breakdown
+shows up in the browser devtools.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Seconds; covers in-process stages (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (name, seconds) recorded during the current request, None outside one
+_REQUEST_TIMINGS: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+# "operation:event" counted during the current request (cache outcomes, fallbacks)
+_REQUEST_EVENTS: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar(
+    "request_events", default=None
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return int(series[-2]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(series[-2])}")
+                plain = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{plain} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{plain} {_format_value(series[-2])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "app_stage_duration_seconds", "Time spent per stage of an operation", ("operation", "stage")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "app_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+EVENTS = REGISTRY.counter(
+    "app_events_total", "Cache hits/misses and fallbacks taken", ("operation", "event")
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "app_upstream_errors_total", "Failed calls to upstream services", ("upstream",)
+)
+TOKENS = REGISTRY.counter(
+    "app_llm_tokens_total", "LLM tokens used, by kind (prompt, completion, cached)", ("kind",)
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def record_stage(operation: str, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, operation=operation, stage=stage)
+    timings = _REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(operation: str, stage: str) -> Iterator[None]:
+    """Time a block as `stage` of `operation`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(operation, stage, time.perf_counter() - start)
+
+
+def count_event(operation: str, event: str) -> None:
+    EVENTS.inc(operation=operation, event=event)
+    events = _REQUEST_EVENTS.get()
+    if events is not None:
+        events.append(f"{operation}:{event}")
+
+
+def count_upstream_error(upstream: str) -> None:
+    UPSTREAM_ERRORS.inc(upstream=upstream)
+    events = _REQUEST_EVENTS.get()
+    if events is not None:
+        events.append(f"upstream_error:{upstream}")
+
+
+def request_stages() -> Dict[str, float]:
+    """Milliseconds per stage timed so far in the current request."""
+    merged: Dict[str, float] = {}
+    for name, seconds in _REQUEST_TIMINGS.get() or ():
+        merged[name] = round(merged.get(name, 0.0) + seconds * 1000, 3)
+    return merged
+
+
+def request_events() -> List[str]:
+    """Events counted so far in the current request."""
+    return list(_REQUEST_EVENTS.get() or ())
+
+
+def count_tokens(usage: Dict[str, int]) -> None:
+    for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if usage.get(kind):
+            TOKENS.inc(usage[kind], kind=kind[: -len("_tokens")])
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware: collects the stages timed during a request into a
+    Server-Timing header and observes the request latency per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _REQUEST_TIMINGS.set(timings)
+        events_token = _REQUEST_EVENTS.set([])
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                value = server_timing(timings, time.perf_counter() - start)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _REQUEST_TIMINGS.reset(token)
+            _REQUEST_EVENTS.reset(events_token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
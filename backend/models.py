@@ -0,0 +1,102 @@
+"""
+Request/response models shared by the uvicorn app (main.py) and the Vercel
+function (api/index.py).
+"""
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class PaymentMethod(BaseModel):
+    type: str
+    description: str
+
+
+class SellerInfo(BaseModel):
+    name: str
+    reputation: str
+    sales: int
+
+
+class Review(BaseModel):
+    id: str
+    rating: int
+    text: str
+    author: str
+    date: str
+    verified_purchase: bool = False
+
+
+class RatingBreakdown(BaseModel):
+    five_stars: int
+    four_stars: int
+    three_stars: int
+    two_stars: int
+    one_star: int
+
+
+class CharacteristicRating(BaseModel):
+    name: str
+    rating: float
+
+
+class ReviewsData(BaseModel):
+    overall_rating: float
+    total_reviews: int
+    rating_breakdown: RatingBreakdown
+    characteristic_ratings: List[CharacteristicRating]
+    reviews: List[Review]
+
+
+class ItemDetail(BaseModel):
+    id: str
+    title: str
+    description: str
+    price: float
+    currency: str
+    images: List[str]
+    payment_methods: List[PaymentMethod]
+    seller: SellerInfo
+    stock: int
+    ratings: float
+    reviews_count: int
+
+
+class FAQ(BaseModel):
+    question: str
+    answer: str
+    sources: List[Dict[str, str]] = []
+
+
+class PageResponse(BaseModel):
+    item: ItemDetail
+    reviews: ReviewsData
+    faqs: List[FAQ]
+
+
+class ChatRequest(BaseModel):
+    question: str
+    openai_key: str = None
+    language: str = "es"
+
+
+class PrefetchRequest(BaseModel):
+    question: str
+    openai_key: str = None
+    language: str = "es"
+
+
+class SearchResult(BaseModel):
+    title: str
+    url: str
+    content: str
+    score: Optional[float] = None
+    sources: List[str] = []
+
+
+class SearchRequest(BaseModel):
+    query: str
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
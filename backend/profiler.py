@@ -0,0 +1,163 @@
+"""
+Low-overhead statistical profiler for the running API.
+
+Every `interval` seconds the stacks of all threads are sampled and counted.
+The default sampler is signal based (SIGPROF via setitimer, so samples are
+only taken while the process burns CPU); signals can only be installed from
+the main thread, so elsewhere (or on platforms without setitimer) a daemon
+thread samples on wall-clock time instead.
+
+Output is in the collapsed-stack format ("frame;frame;frame count" per
+line) read by flamegraph.pl, speedscope and similar tools.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 120.0
+# Leaf frames of threads parked waiting for work; dropped unless include_idle
+_IDLE_LEAVES = {
+    "threading.py:wait",
+    "threading.py:_wait_for_tstate_lock",
+    "queue.py:get",
+    "selectors.py:select",
+    "base_events.py:_run_once",
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL, mode: str = "auto", include_idle: bool = False):
+        self.interval = max(0.001, interval)
+        self.include_idle = include_idle
+        if mode == "auto":
+            in_main = threading.current_thread() is threading.main_thread()
+            mode = "signal" if in_main and hasattr(signal, "setitimer") else "thread"
+        if mode not in ("signal", "thread"):
+            raise ValueError(f"Unknown profiler mode: {mode!r} (expected signal, thread or auto)")
+        self.mode = mode
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._previous_handler = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None
+
+    def _sample(self, interrupted=None) -> None:
+        """Record every thread's stack. The sampling thread itself is replaced
+        by the frame the signal interrupted, or skipped in thread mode."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        me = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                frame = interrupted
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack and (self.include_idle or stack[0] not in _IDLE_LEAVES):
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _handle_signal(self, signum, frame) -> None:
+        self._sample(frame)
+
+    def _run_thread(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "SamplingProfiler":
+        if self.running:
+            raise RuntimeError("Profiler already running")
+        self.samples.clear()
+        self.sample_count = 0
+        self.started_at = time.perf_counter()
+        if self.mode == "signal":
+            self._previous_handler = signal.signal(signal.SIGPROF, self._handle_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_thread, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, int]:
+        if not self.running:
+            return dict(self.samples)
+        if self.mode == "signal":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            # Handlers can only be swapped from the main thread; with the timer
+            # off, leaving ours installed is harmless
+            if threading.current_thread() is threading.main_thread():
+                signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        else:
+            self._stop.set()
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        self.started_at = None
+        return dict(self.samples)
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, hottest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+_active: Optional[SamplingProfiler] = None
+_lock = threading.Lock()
+
+
+def start_profiling(
+    interval: float = DEFAULT_INTERVAL, mode: str = "auto", include_idle: bool = False
+) -> SamplingProfiler:
+    """Start the process-wide profiler; raises RuntimeError if one is running."""
+    global _active
+    with _lock:
+        if _active is not None and _active.running:
+            raise RuntimeError("A profile is already being recorded")
+        _active = SamplingProfiler(interval, mode, include_idle).start()
+        return _active
+
+
+def stop_profiling() -> Optional[SamplingProfiler]:
+    with _lock:
+        profiler = _active
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def profile_from_env() -> Optional[threading.Timer]:
+    """Env switch: PROFILE_SECONDS=N records the first N seconds after startup
+    and writes collapsed stacks to PROFILE_OUTPUT (default profile-<pid>.collapsed)."""
+    seconds = float(os.getenv("PROFILE_SECONDS", "0") or 0)
+    if seconds <= 0:
+        return None
+    interval = float(os.getenv("PROFILE_INTERVAL_MS", "0") or 0) / 1000 or DEFAULT_INTERVAL
+    output = os.getenv("PROFILE_OUTPUT") or f"profile-{os.getpid()}.collapsed"
+    profiler = start_profiling(interval)
+
+    def finish():
+        stop_profiling()
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+        print(f"Profile written to {output} ({profiler.sample_count} samples)")
+
+    timer = threading.Timer(min(seconds, MAX_SECONDS), finish)
+    timer.daemon = True
+    timer.start()
+    return timer
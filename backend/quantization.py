@@ -0,0 +1,101 @@
+"""
+Compact vector storage for the RAG index.
+
+Vectors are L2-normalized and stored either as float16 or as int8 codes with
+a per-vector scale (symmetric scalar quantization). Scores computed on the
+compact matrix are approximate; callers re-rank a small candidate set with
+the exact float32 vectors.
+"""
+import os
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+STORAGE_MODES = ("float32", "float16", "int8")
+# Rows dequantized per block while scoring, bounds the temporary float32 copy
+_BLOCK_ROWS = 512
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 rows scaled to unit L2 norm."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+def truncate(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """Keep the leading `dims` components (Matryoshka prefix) and re-normalize."""
+    return normalize(np.asarray(vectors)[..., :dims])
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Quantize normalized vectors. Returns (codes, scales); scales is None
+    for float16/float32."""
+    if mode == "float32":
+        return np.ascontiguousarray(vectors, dtype=np.float32), None
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown vector storage mode: {mode!r} (expected one of {STORAGE_MODES})")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def approximate_scores(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """Dot products of a normalized query against the compact matrix."""
+    query = np.asarray(query, dtype=np.float32)
+    if codes.dtype == np.float32:
+        return codes @ query
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    buffer = np.empty((min(_BLOCK_ROWS, codes.shape[0]), codes.shape[1]), dtype=np.float32)
+    for start in range(0, codes.shape[0], _BLOCK_ROWS):
+        block = codes[start:start + _BLOCK_ROWS]
+        rows = buffer[: block.shape[0]]
+        np.copyto(rows, block, casting="unsafe")
+        np.dot(rows, query, out=scores[start:start + block.shape[0]])
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, then sort k)."""
+    k = min(max(1, k), scores.shape[0])
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def spill_to_disk(vectors: np.ndarray, directory: Optional[str] = None) -> np.ndarray:
+    """Move float32 vectors to a read-only memory map so they are paged in
+    only for the rows touched by a re-rank instead of staying resident."""
+    fd, path = tempfile.mkstemp(prefix="rag-vectors-", suffix=".f32", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        mapped = np.memmap(path, dtype=np.float32, mode="r", shape=vectors.shape)
+    finally:
+        # The mapping stays valid after unlink on POSIX; the file is reclaimed on exit
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return mapped
+
+
+def resident_bytes(*arrays: Optional[np.ndarray]) -> int:
+    """In-memory size of the arrays, not counting memory-mapped ones."""
+    return sum(a.nbytes for a in arrays if a is not None and not isinstance(a, np.memmap))
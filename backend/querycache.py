@@ -0,0 +1,85 @@
+"""
+Per-query caches for the RAG path (query embeddings, retrieval results).
+
+A bounded LRU with single-flight computation: when /agent/prefetch is still
+embedding a question as it is submitted to /agent/chat, the chat request
+waits for that result instead of paying for a second embedding call.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class QueryCache:
+    """Thread-safe LRU mapping keys to computed values."""
+
+    def __init__(self, maxsize: int = 1024, wait_timeout: float = 30.0):
+        self.maxsize = maxsize
+        self.wait_timeout = wait_timeout
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._pending: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(value, hit). Concurrent callers for the same key share one compute();
+        if it fails, waiters compute for themselves."""
+        while True:
+            with self._lock:
+                value = self._data.get(key)
+                if value is not None:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value, True
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is computing this key: use their result, or take
+            # over if they failed
+            if not pending.wait(self.wait_timeout):
+                with self._lock:
+                    self.misses += 1
+                return compute(), False
+        try:
+            value = compute()
+            self.put(key, value)
+            return value, False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """(key, value) pairs, least recently used first, so putting them
+        back in order restores the recency."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
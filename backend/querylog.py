@@ -0,0 +1,187 @@
+"""
+Structured query log for /agent/chat and /search.
+
+One JSON object per request, appended to a file that is rotated by size
+(query.jsonl -> query.jsonl.1 -> ... -> query.jsonl.N), or written to stdout.
+Each record holds what the replay tool (benchmarks/replay.py) needs to
+re-drive the traffic and what is needed to compare runs:
+
+    {"ts": 1718000000.123, "endpoint": "chat", "question": "...",
+     "language": "es", "status": 200, "latency_ms": 12.4,
+     "stages": {"intent": 0.05, "embed": 8.1, ...},
+     "events": ["chat:fast_path", ...], "outcome": "rag"}
+
+QUERY_LOG_PATH: unset = off, "stdout", or a file path.
+QUERY_LOG_MAX_BYTES / QUERY_LOG_BACKUPS: rotation size and files kept.
+
+Several worker processes may share one path (see sharedindex.py): writes
+hold an flock on <path>.lock while they check the size, rotate and append,
+so only one worker renames the files, no worker writes past max_bytes and a
+worker whose file was renamed reopens <path> before appending.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import request_events, request_stages
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class QueryLog:
+    """Append-only JSONL with size-based rotation (or a stream such as stdout)."""
+
+    def __init__(self, path: Optional[str] = None, stream=None, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self._stream = stream
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._stream is not None:
+                self._stream.write(line)
+                self._stream.flush()
+                return
+            if self._file is None:
+                self._open()
+            if not self.max_bytes:
+                self._append(line)
+                return
+            with self._file_lock():
+                # Another worker may have rotated since the last write: the
+                # open file is then a backup and `path` a new file
+                if self._renamed():
+                    self._file.close()
+                    self._open()
+                if self._over(len(line.encode("utf-8"))):
+                    self._file.close()
+                    self._shift_backups()
+                    self._open()
+                self._append(line)
+
+    def _open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _append(self, line: str) -> None:
+        self._file.write(line)
+        self._file.flush()
+
+    def _over(self, size: int) -> bool:
+        # Size of the open file, other workers' lines included
+        current = os.fstat(self._file.fileno()).st_size
+        return bool(current) and current + size > self.max_bytes
+
+    def _renamed(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(f"{self.path}.lock", "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _shift_backups(self) -> None:
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+def query_log_from_env() -> Optional[QueryLog]:
+    path = os.getenv("QUERY_LOG_PATH", "").strip()
+    if not path:
+        return None
+    if path == "stdout":
+        return QueryLog(stream=sys.stdout)
+    return QueryLog(
+        path,
+        max_bytes=int(os.getenv("QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backups=int(os.getenv("QUERY_LOG_BACKUPS", "5")),
+    )
+
+
+_log: Optional[QueryLog] = query_log_from_env()
+
+
+def set_query_log(log: Optional[QueryLog]) -> Optional[QueryLog]:
+    """Install a query log (None disables logging); returns the previous one."""
+    global _log
+    previous, _log = _log, log
+    return previous
+
+
+def get_query_log() -> Optional[QueryLog]:
+    return _log
+
+
+def log_query(endpoint: str, start: float, status: int = 200, **fields: Any) -> None:
+    """Record a request started at perf_counter() `start`, with the stages and
+    events collected for it so far (see metrics.ServerTimingMiddleware)."""
+    if _log is None:
+        return
+    elapsed = time.perf_counter() - start
+    record = {
+        "ts": round(time.time() - elapsed, 3),  # arrival time, used for replay pacing
+        "endpoint": endpoint,
+        **fields,
+        "status": status,
+        "latency_ms": round(elapsed * 1000, 3),
+        "stages": request_stages(),
+        "events": request_events(),
+    }
+    try:
+        _log.write(record)
+    except OSError as e:
+        # Logging must never fail the request
+        print(f"Query log error: {e}")
+
+
+def read_query_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Records from a log and its rotated files, oldest first; bad lines are skipped."""
+    rotated: List[str] = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    for name in rotated[::-1] + ([path] if os.path.exists(path) else []):
+        with open(name, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
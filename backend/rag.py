@@ -1,22 +1,296 @@
+import hashlib
+import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 
 import numpy as np
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+
+from . import quantization
+from .querycache import QueryCache
+from .routing import route_question
+from .limits import Overloaded, upstream_slot
+from .metrics import count_event, count_tokens, count_upstream_error, timed
+from .tracing import span
+
+try:
+    from openai import OpenAI
+except ImportError:
+    OpenAI = None
+
+
+# Thin provider layer on the openai SDK. Same interface as the LangChain
+# classes it replaces (embed_documents/embed_query, invoke -> .content).
+_EMBED_BATCH_SIZE = 256
+# Completion tokens reserved against the TPM budget when max_tokens is unset
+_DEFAULT_COMPLETION_TOKENS = 512
+
+
+class OpenAIEmbeddings:
+    """Embeddings provider calling the OpenAI SDK directly."""
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        api_key: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ):
+        if OpenAI is None:
+            raise RuntimeError("openai SDK is not installed")
+        self.model = model
+        # text-embedding-3 models return shortened (Matryoshka) vectors when asked
+        self.dimensions = dimensions
+        self._api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._client = OpenAI(api_key=self._api_key)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, background=True)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], background=False)[0]
+
+    def _embed(self, texts: List[str], background: bool) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        for start in range(0, len(texts), _EMBED_BATCH_SIZE):
+            batch = [t.replace("\n", " ") for t in texts[start:start + _EMBED_BATCH_SIZE]]
+            with upstream_slot("openai", self._api_key, sum(_estimate_tokens(t) for t in batch), background):
+                response = self._client.embeddings.create(model=self.model, input=batch, **extra)
+            vectors.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+        return vectors
+
+
+class HashingEmbeddings:
+    """Local embeddings: hashed character n-gram TF-IDF projected to `dim`.
+
+    No network round-trip and no extra dependency beyond NumPy. IDF weights
+    are fitted on the corpus passed to embed_documents and reused for queries.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model = f"hashing-{dim}"
+        self._idf = np.ones(dim, dtype=np.float32)
+
+    def _counts(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(max(1, len(padded) - n + 1)):
+                    h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                    # Signed hashing keeps bucket collisions from only adding up
+                    vec[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vec
+
+    def _project(self, counts: np.ndarray) -> np.ndarray:
+        weighted = np.sign(counts) * np.log1p(np.abs(counts)) * self._idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return weighted / np.maximum(norms, 1e-8)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        counts = np.stack([self._counts(t) for t in texts]) if texts else np.zeros((0, self.dim))
+        doc_freq = np.count_nonzero(counts, axis=0)
+        self._idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1.0).astype(np.float32)
+        return self._project(counts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._project(self._counts(text)).tolist()
+
+
+@dataclass
+class ChatResult:
+    content: str
+    response_metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class ChatOpenAI:
+    """Chat completion provider calling the OpenAI SDK directly."""
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        api_key: Optional[str] = None,
+    ):
+        if OpenAI is None:
+            raise RuntimeError("openai SDK is not installed")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._client = OpenAI(api_key=self._api_key)
+
+    def invoke(self, messages: Any, max_tokens: Optional[int] = None) -> ChatResult:
+        """Complete `messages`; max_tokens overrides the client's default for this call."""
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        max_tokens = self.max_tokens if max_tokens is None else max_tokens
+        kwargs: Dict[str, Any] = {"model": self.model, "messages": messages, "temperature": self.temperature}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in messages)
+        tokens += max_tokens or _DEFAULT_COMPLETION_TOKENS
+        with upstream_slot("openai", self._api_key, tokens):
+            response = self._client.chat.completions.create(**kwargs)
+        usage = response.usage.model_dump() if response.usage is not None else {}
+        return ChatResult(
+            content=response.choices[0].message.content or "",
+            response_metadata={"token_usage": usage, "model_name": response.model},
+        )
 
 
 # Simple in-memory vector store
 _DOCS: List[Dict[str, Any]] = []
 _EMBEDDINGS: Optional[np.ndarray] = None
-_embedder: Optional[OpenAIEmbeddings] = None
+# Candidate-stage matrix: the normalized vectors, optionally truncated to
+# RAG_CANDIDATE_DIMENSIONS and stored as float16/int8 (RAG_VECTOR_STORAGE).
+# With compact storage _EMBEDDINGS is a disk-backed float32 memmap only
+# read for the re-rank candidates.
+_COMPACT: Optional[np.ndarray] = None
+_COMPACT_SCALES: Optional[np.ndarray] = None
+# How the vectors were produced; a query embedder that doesn't match
+# triggers a re-embed instead of silently mixing vector spaces.
+_INDEX_META: Dict[str, Any] = {}
+_embedder: Optional[Any] = None
+# Chat clients per model (see routing.py), reused while the key is unchanged
+_llms: Dict[str, ChatOpenAI] = {}
+_llm_key: Optional[Tuple[Any, str]] = None
+# Query vectors and top-k results per (embedder, normalized query), warmed
+# by /agent/prefetch while the user types; cleared whenever the index changes
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+_QUERY_VECTORS = QueryCache(QUERY_CACHE_SIZE)
+_RETRIEVALS = QueryCache(QUERY_CACHE_SIZE)
+# Product sheet per language; a plain string sheet is stored as "es", which
+# also serves languages without their own
+ProductSheet = Union[str, Dict[str, str]]
+_PRODUCT_SHEETS: Dict[str, str] = {}
+_CORPUS_VERSION: Optional[str] = None
+# Word set per doc for the keyword fallback, built at ingest
+_KEYWORDS: List[frozenset] = []
+
+
+class _IndexLock:
+    """Many concurrent retrievals or one index swap.
+
+    Retrievals read _DOCS, the vector matrices and _INDEX_META separately;
+    ingest/restore/attach replace them under the write side so no request
+    mixes two corpora. Waiting writers hold off new readers, so a reload
+    under steady traffic isn't starved.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+_INDEX_LOCK = _IndexLock()
+
+# Saved index state (see snapshot/restore): a restarted worker loads it
+# instead of re-embedding the corpus with cold caches. Empty = disabled.
+SNAPSHOT_PATH = os.getenv("RAG_SNAPSHOT_PATH", "")
+_SNAPSHOT_FORMAT = 1
+
+# Token budget for the retrieved context in the LLM prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "700"))
+_CHARS_PER_TOKEN = 4
+_DUPLICATE_OVERLAP = 0.8
+
+# Candidates re-ranked with exact float32 vectors in compact storage modes
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "32"))
+
+# Static instructions per language. Together with the product sheet they form
+# the prompt prefix, which must stay byte-identical between requests so the
+# provider can serve it from its prompt cache.
+_SYSTEM_PROMPTS = {
+    "es": (
+        "Eres un asistente de compras inteligente. Responde en español de forma natural y conversacional. "
+        "Usa la información del contexto para responder de manera útil y precisa. "
+        "NO uses corchetes, asteriscos, o caracteres especiales en tu respuesta. "
+        "Responde de forma fluida como si fueras un experto en productos, "
+        "sin caracteres especiales o formato markdown."
+    ),
+    "pt": (
+        "Você é um assistente de compras inteligente. Responda em português de forma natural e conversacional. "
+        "Use as informações do contexto para responder de maneira útil e precisa. "
+        "NÃO use colchetes, asteriscos ou caracteres especiais na sua resposta. "
+        "Responda de forma fluida como um especialista em produtos, "
+        "sem caracteres especiais ou formatação markdown."
+    ),
+    "en": (
+        "You are an intelligent shopping assistant. Answer in English in a natural, conversational way. "
+        "Use the information in the context to answer helpfully and accurately. "
+        "Do NOT use brackets, asterisks or special characters in your answer. "
+        "Answer fluently as a product expert would, "
+        "without special characters or markdown formatting."
+    ),
+}
+_PROMPT_LABELS = {
+    "es": ("Ficha del producto:", "Contexto del producto:", "Pregunta del cliente:"),
+    "pt": ("Ficha do produto:", "Contexto do produto:", "Pergunta do cliente:"),
+    "en": ("Product sheet:", "Product context:", "Customer question:"),
+}
+_PREFIX_CACHE: Dict[Tuple[str, Optional[str]], str] = {}
+_PROMPT_CACHE_STATS = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
 
+def _ensure_embedder() -> Optional[Any]:
+    """Return the embedder selected by RAG_EMBEDDINGS ("openai" or "local").
 
-def _ensure_embedder() -> Optional[OpenAIEmbeddings]:
+    The OpenAI embedder needs OPENAI_API_KEY; without it None is returned
+    and retrieval falls back to keyword matching.
+    """
     global _embedder
+    if os.getenv("RAG_EMBEDDINGS", "openai").lower() == "local":
+        if not isinstance(_embedder, HashingEmbeddings):
+            _embedder = HashingEmbeddings(dim=int(os.getenv("RAG_LOCAL_EMBEDDING_DIM", "512")))
+        return _embedder
     current_key = os.getenv("OPENAI_API_KEY")
-    if current_key and (not _embedder or getattr(_embedder, '_api_key', None) != current_key):
+    dimensions = int(os.getenv("RAG_EMBEDDING_DIMENSIONS", "0")) or None
+    if current_key and (
+        not _embedder
+        or getattr(_embedder, '_api_key', None) != current_key
+        or getattr(_embedder, 'dimensions', None) != dimensions
+    ):
         try:
-            _embedder = OpenAIEmbeddings(model="text-embedding-3-small")
+            _embedder = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=dimensions)
         except Exception:
             _embedder = None
     elif not current_key:
@@ -24,26 +298,413 @@ def _ensure_embedder() -> Optional[OpenAIEmbeddings]:
     return _embedder
 
 
-def ingest_corpus(docs: List[Dict[str, Any]]) -> None:
+def _sheets(product_sheet: ProductSheet) -> Dict[str, str]:
+    if isinstance(product_sheet, str):
+        product_sheet = {"es": product_sheet}
+    return {lang: sheet.strip() for lang, sheet in product_sheet.items() if sheet.strip()}
+
+
+def _product_sheet(language: str) -> str:
+    return _PRODUCT_SHEETS.get(language) or _PRODUCT_SHEETS.get("es", "")
+
+
+def _corpus_version(docs: List[Dict[str, Any]], product_sheet: ProductSheet) -> str:
+    digest = hashlib.sha256()
+    for lang, sheet in sorted(_sheets(product_sheet).items()):
+        digest.update(f"{lang}\x00{sheet}\x00".encode("utf-8"))
+    for d in docs:
+        digest.update(f"\x00{d.get('id')}\x00{d['section']}\x00{d['text']}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _ensure_llm(model: str = "gpt-4o-mini") -> ChatOpenAI:
+    """Reuse the chat client (and its connection pool) while the key is unchanged."""
+    global _llm_key
+    key = (ChatOpenAI, os.getenv("OPENAI_API_KEY", ""))
+    if _llm_key != key:
+        _llms.clear()
+        _llm_key = key
+    if model not in _llms:
+        _llms[model] = ChatOpenAI(model=model, temperature=0)
+    return _llms[model]
+
+
+def ingest_corpus(docs: List[Dict[str, Any]], product_sheet: ProductSheet = "") -> None:
     """Ingest documents into an in-memory vector store.
 
-    Each doc should be {id, section, text}.
+    Each doc should be {id, section, text}. `product_sheet` is the static
+    description of the item that goes into the cached prompt prefix, either
+    one string or {language: sheet} (see corpus.product_sheets).
     """
-    global _DOCS, _EMBEDDINGS
+    with _INDEX_LOCK.write():
+        _ingest_corpus(docs, product_sheet)
+
+
+def _ingest_corpus(docs: List[Dict[str, Any]], product_sheet: ProductSheet) -> None:
+    global _DOCS, _EMBEDDINGS, _COMPACT, _COMPACT_SCALES, _PRODUCT_SHEETS, _CORPUS_VERSION
     _DOCS = [d for d in docs if d.get("text")]
+    _PRODUCT_SHEETS = _sheets(product_sheet)
+    _CORPUS_VERSION = _corpus_version(_DOCS, _PRODUCT_SHEETS)
+    _PREFIX_CACHE.clear()
+    _clear_query_caches()
+    _index_keywords()
     if not _DOCS:
-        _EMBEDDINGS = None
+        _EMBEDDINGS = _COMPACT = _COMPACT_SCALES = None
         return
 
     embedder = _ensure_embedder()
     if embedder is None:
         # No API key, use simple keyword matching instead
-        _EMBEDDINGS = None
+        _EMBEDDINGS = _COMPACT = _COMPACT_SCALES = None
         return
         
+    _embed_corpus(embedder)
+
+
+def _embedder_signature(embedder: Any) -> str:
+    return f"{getattr(embedder, 'model', type(embedder).__name__)}@{getattr(embedder, 'dimensions', None)}"
+
+
+def _index_matches(embedder: Any) -> bool:
+    """Whether the vector index was built by `embedder`."""
+    return _EMBEDDINGS is not None and _embedder_signature(embedder) == _INDEX_META.get("embedder")
+
+
+def _clear_query_caches() -> None:
+    # Local embeddings refit their IDF on the corpus, so cached query vectors go too
+    _QUERY_VECTORS.clear()
+    _RETRIEVALS.clear()
+
+
+def normalize_query(query: str) -> str:
+    """Cache key (and embedded text) for a question: whitespace collapsed."""
+    return " ".join(query.split())
+
+
+def _index_keywords() -> None:
+    global _KEYWORDS
+    _KEYWORDS = [frozenset(d["text"].lower().split()) for d in _DOCS]
+
+
+def _embed_corpus(embedder: Any) -> None:
+    _clear_query_caches()
     texts = [d["text"] for d in _DOCS]
-    vectors = embedder.embed_documents(texts)
-    _EMBEDDINGS = np.array(vectors, dtype=np.float32)
+    vectors = np.array(embedder.embed_documents(texts), dtype=np.float32)
+    # Stored normalized, so scoring is a single dot product per query
+    _install_vectors(quantization.normalize(vectors), _embedder_signature(embedder))
+
+
+def _install_vectors(normalized: np.ndarray, signature: str) -> None:
+    """Build the search index from normalized float32 vectors, in the
+    storage configured by RAG_VECTOR_STORAGE/RAG_CANDIDATE_DIMENSIONS."""
+    global _EMBEDDINGS, _COMPACT, _COMPACT_SCALES, _INDEX_META
+    storage = os.getenv("RAG_VECTOR_STORAGE", "float32").lower()
+    candidate_dims = int(os.getenv("RAG_CANDIDATE_DIMENSIONS", "0"))
+    if not 0 < candidate_dims < normalized.shape[1]:
+        candidate_dims = 0
+    _INDEX_META = {
+        "embedder": signature,
+        "dims": int(normalized.shape[1]),
+        "candidate_dims": candidate_dims or None,
+        "storage": storage,
+        "corpus_version": _CORPUS_VERSION,
+    }
+
+    if storage == "float32" and not candidate_dims:
+        _EMBEDDINGS, _COMPACT, _COMPACT_SCALES = normalized, None, None
+        return
+    # Matryoshka embeddings keep most of their signal in the leading dims;
+    # the truncated prefix is re-normalized before scoring
+    stage = quantization.truncate(normalized, candidate_dims) if candidate_dims else normalized
+    _COMPACT, _COMPACT_SCALES = quantization.quantize(stage, storage)
+    if storage == "float32":
+        _EMBEDDINGS = normalized
+    else:
+        _EMBEDDINGS = quantization.spill_to_disk(normalized, os.getenv("RAG_VECTOR_DIR") or None)
+
+
+def index_metadata() -> Dict[str, Any]:
+    """How the current vectors were built (embedder, dims, storage, corpus)."""
+    return dict(_INDEX_META)
+
+
+def corpus_version() -> Optional[str]:
+    """Hash of the ingested docs and product sheet; None before ingest."""
+    return _CORPUS_VERSION
+
+
+def snapshot(path: Optional[str] = None) -> bool:
+    """Save docs, product sheet, normalized vectors, local embedder IDF and
+    the query caches to `path` (default RAG_SNAPSHOT_PATH).
+
+    One uncompressed .npz: a JSON header plus flat float32/int64 arrays, no
+    pickled objects. Written atomically, so a worker restoring it never sees
+    a partial file. Returns False when there is no path or nothing ingested.
+    """
+    path = SNAPSHOT_PATH if path is None else path
+    if not path or _CORPUS_VERSION is None:
+        return False
+    with timed("snapshot", "save"):
+        with _INDEX_LOCK.read():
+            query_items = _QUERY_VECTORS.items()
+            retrieval_items = _RETRIEVALS.items()
+            arrays: Dict[str, np.ndarray] = {
+                "query_vectors": _concat([v for _, v in query_items], np.float32),
+                "retrieval_idxs": _concat([r[0] for _, r in retrieval_items], np.int64),
+                "retrieval_scores": _concat([r[1] for _, r in retrieval_items], np.float32),
+            }
+            if _EMBEDDINGS is not None:
+                arrays["vectors"] = np.asarray(_EMBEDDINGS, dtype=np.float32)
+            if isinstance(_embedder, HashingEmbeddings) and _INDEX_META.get("embedder") == _embedder_signature(_embedder):
+                # Query vectors are only comparable with the IDF the corpus was embedded with
+                arrays["idf"] = _embedder._idf
+            header = {
+                "format": _SNAPSHOT_FORMAT,
+                "corpus_version": _CORPUS_VERSION,
+                "product_sheet": _PRODUCT_SHEETS,
+                "docs": _DOCS,
+                "index": _INDEX_META if _EMBEDDINGS is not None else {},
+                "query_keys": [list(k) for k, _ in query_items],
+                "query_sizes": [int(np.size(v)) for _, v in query_items],
+                "retrieval_keys": [list(k) for k, _ in retrieval_items],
+                "retrieval_sizes": [int(np.size(r[0])) for _, r in retrieval_items],
+            }
+            arrays["header"] = np.frombuffer(json.dumps(header, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        # Per-process temp name: several workers may save on the same shutdown
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp_path, path)
+    count_event("snapshot", "saved")
+    return True
+
+
+def restore(
+    path: Optional[str] = None,
+    docs: Optional[List[Dict[str, Any]]] = None,
+    product_sheet: ProductSheet = "",
+) -> bool:
+    """Load a snapshot written by snapshot() in place of ingest_corpus().
+
+    Returns False, leaving the current state untouched, when the file is
+    missing or of another format, holds another corpus than `docs` (if
+    given), or its vectors were not built by the configured embedder (the
+    first question would re-embed anyway).
+    """
+    global _EMBEDDINGS, _COMPACT, _COMPACT_SCALES, _INDEX_META
+    path = SNAPSHOT_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return False
+    with timed("snapshot", "restore"):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        header = json.loads(arrays["header"].tobytes().decode("utf-8"))
+        if header.get("format") != _SNAPSHOT_FORMAT:
+            count_event("snapshot", "stale_format")
+            return False
+        stale = _stale_reason(header, docs, product_sheet, "idf" in arrays)
+        if stale:
+            count_event("snapshot", stale)
+            return False
+
+        with _INDEX_LOCK.write():
+            _set_corpus(header, arrays.get("idf"))
+            if "vectors" in arrays:
+                _install_vectors(arrays["vectors"], header["index"]["embedder"])
+            else:
+                _EMBEDDINGS = _COMPACT = _COMPACT_SCALES = None
+                _INDEX_META = {}
+            # Oldest first, so the LRU order carries over
+            for key, vector in zip(header["query_keys"], _split(arrays["query_vectors"], header["query_sizes"])):
+                _QUERY_VECTORS.put(tuple(key), vector)
+            sizes = header["retrieval_sizes"]
+            for key, idxs, scores in zip(
+                header["retrieval_keys"],
+                _split(arrays["retrieval_idxs"], sizes),
+                _split(arrays["retrieval_scores"], sizes),
+            ):
+                _RETRIEVALS.put(tuple(key), (idxs, scores))
+    count_event("snapshot", "restored")
+    return True
+
+
+def _stale_reason(
+    header: Dict[str, Any],
+    docs: Optional[List[Dict[str, Any]]],
+    product_sheet: ProductSheet,
+    has_idf: bool,
+) -> Optional[str]:
+    """Why a saved index (snapshot or shared generation) can't replace the
+    current one, or None if it can."""
+    if docs is not None and header["corpus_version"] != _corpus_version(
+        [d for d in docs if d.get("text")], product_sheet
+    ):
+        return "stale_corpus"
+    embedder = _ensure_embedder()
+    if embedder is not None and (
+        header["index"].get("embedder") != _embedder_signature(embedder)
+        or (isinstance(embedder, HashingEmbeddings) and not has_idf)
+    ):
+        return "stale_embedder"
+    return None
+
+
+def _set_corpus(header: Dict[str, Any], idf: Optional[np.ndarray]) -> None:
+    # Caller holds the write lock and installs the vectors next
+    global _DOCS, _PRODUCT_SHEETS, _CORPUS_VERSION
+    _DOCS = header["docs"]
+    _PRODUCT_SHEETS = _sheets(header["product_sheet"])
+    _CORPUS_VERSION = header["corpus_version"]
+    _PREFIX_CACHE.clear()
+    _clear_query_caches()
+    _index_keywords()
+    if idf is not None and isinstance(_embedder, HashingEmbeddings):
+        _embedder._idf = np.array(idf, dtype=np.float32)
+
+
+def export_index(directory: str) -> None:
+    """Write the built index for attach_index(): state.json (docs, product
+    sheet, index metadata) and one plain .npy per array, in the storage it
+    is served from, so attaching needs no re-quantization."""
+    os.makedirs(directory, exist_ok=True)
+    with _INDEX_LOCK.read():
+        arrays = {"vectors": _EMBEDDINGS, "compact": _COMPACT, "scales": _COMPACT_SCALES}
+        if isinstance(_embedder, HashingEmbeddings) and _INDEX_META.get("embedder") == _embedder_signature(_embedder):
+            arrays["idf"] = _embedder._idf
+        for name, array in arrays.items():
+            if array is not None:
+                np.save(os.path.join(directory, f"{name}.npy"), np.asarray(array))
+        state = {
+            "corpus_version": _CORPUS_VERSION,
+            "product_sheet": _PRODUCT_SHEETS,
+            "docs": _DOCS,
+            "index": _INDEX_META if _EMBEDDINGS is not None else {},
+        }
+    with open(os.path.join(directory, "state.json"), "w", encoding="utf-8") as fh:
+        json.dump(state, fh, ensure_ascii=False)
+
+
+def attach_index(
+    directory: str,
+    docs: Optional[List[Dict[str, Any]]] = None,
+    product_sheet: ProductSheet = "",
+    generation: Optional[int] = None,
+) -> bool:
+    """Serve from an index written by export_index().
+
+    The arrays are memory-mapped read-only: every process attached to the
+    same directory shares one copy of the vectors in the page cache. Returns
+    False, like restore(), when it holds another corpus or embedder.
+    """
+    global _EMBEDDINGS, _COMPACT, _COMPACT_SCALES, _INDEX_META
+    with open(os.path.join(directory, "state.json"), encoding="utf-8") as fh:
+        header = json.load(fh)
+    paths = {
+        name: os.path.join(directory, f"{name}.npy") for name in ("vectors", "compact", "scales", "idf")
+    }
+    mapped = {name: np.load(path, mmap_mode="r") for name, path in paths.items() if os.path.exists(path)}
+    stale = _stale_reason(header, docs, product_sheet, "idf" in mapped)
+    if stale:
+        count_event("shared_index", stale)
+        return False
+    with _INDEX_LOCK.write():
+        _set_corpus(header, mapped.get("idf"))
+        _EMBEDDINGS = mapped.get("vectors")
+        _COMPACT = mapped.get("compact")
+        _COMPACT_SCALES = mapped.get("scales")
+        _INDEX_META = dict(header["index"]) if _EMBEDDINGS is not None else {}
+        if generation is not None:
+            _INDEX_META["generation"] = generation
+    return True
+
+
+def ingest_or_restore(docs: List[Dict[str, Any]], product_sheet: ProductSheet = "", path: Optional[str] = None) -> str:
+    """Startup path for both apps: restore the snapshot at `path` (default
+    RAG_SNAPSHOT_PATH) if it holds this corpus, else ingest and save one.
+    Returns "restored" or "ingested"."""
+    path = SNAPSHOT_PATH if path is None else path
+    if path:
+        try:
+            if restore(path, docs, product_sheet):
+                return "restored"
+        except Exception as e:
+            count_event("snapshot", "unreadable")
+            print(f"Ignoring unreadable RAG snapshot {path}: {e}")
+    ingest_corpus(docs, product_sheet=product_sheet)
+    if path:
+        try:
+            snapshot(path)
+        except OSError as e:
+            print(f"Could not save RAG snapshot {path}: {e}")
+    return "ingested"
+
+
+def _concat(values: List[np.ndarray], dtype: Any) -> np.ndarray:
+    if not values:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate([np.asarray(v, dtype=dtype).ravel() for v in values])
+
+
+def _split(flat: np.ndarray, sizes: List[int]) -> List[np.ndarray]:
+    return np.split(flat, np.cumsum(sizes)[:-1]) if sizes else []
+
+
+def vector_search(q_vec: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (doc indices, cosine scores) of the top_k docs, best first.
+
+    With compact storage or truncated candidate dims, the candidate matrix
+    picks RERANK_CANDIDATES and only those rows are re-scored with the full
+    float32 vectors.
+    """
+    query = quantization.normalize(q_vec)
+    if query.shape[-1] != _EMBEDDINGS.shape[1]:
+        raise ValueError(
+            f"Query embedding has {query.shape[-1]} dims but the index has {_EMBEDDINGS.shape[1]} "
+            f"({_INDEX_META.get('embedder')}); re-ingest the corpus with the same embedder"
+        )
+    if _COMPACT is None:
+        sims = _EMBEDDINGS @ query
+        idxs = quantization.top_indices(sims, top_k)
+        return idxs, sims[idxs]
+
+    candidate_dims = _INDEX_META.get("candidate_dims")
+    stage_query = quantization.truncate(query, candidate_dims) if candidate_dims else query
+    approx = quantization.approximate_scores(_COMPACT, _COMPACT_SCALES, stage_query)
+    candidates = np.sort(quantization.top_indices(approx, max(top_k, RERANK_CANDIDATES)))
+    exact = np.asarray(_EMBEDDINGS[candidates]) @ query
+    order = quantization.top_indices(exact, top_k)
+    return candidates[order], exact[order]
+
+
+def vector_stats() -> Dict[str, Any]:
+    """Size of the vector index; resident bytes exclude the memmapped floats."""
+    if _EMBEDDINGS is None:
+        return {
+            "docs": 0, "dims": 0, "candidate_dims": None, "storage": None, "resident_bytes": 0, "bytes_per_doc": 0,
+        }
+    docs, dims = _EMBEDDINGS.shape
+    resident = quantization.resident_bytes(_EMBEDDINGS, _COMPACT, _COMPACT_SCALES)
+    return {
+        "docs": docs,
+        "dims": dims,
+        "candidate_dims": _INDEX_META.get("candidate_dims"),
+        "storage": "float32" if _COMPACT is None else str(_COMPACT.dtype),
+        "resident_bytes": resident,
+        "bytes_per_doc": resident / docs if docs else 0,
+    }
+
+
+def keyword_search(query: str, top_k: int = 3) -> List[Tuple[int, int]]:
+    """Word-overlap fallback. Returns (score, doc index) best first."""
+    query_words = set(query.lower().split())
+    scored_docs = []
+    for i, doc_words in enumerate(_KEYWORDS):
+        score = len(query_words.intersection(doc_words))
+        if score > 0:
+            scored_docs.append((score, i))
+    
+    scored_docs.sort(reverse=True)
+    return scored_docs[:top_k]
 
 
 def _cosine_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
@@ -52,92 +713,300 @@ def _cosine_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     return np.dot(a_norm, b_norm)
 
 
-def answer_question(query: str, top_k: int = 3, language: str = "es") -> Dict[str, Any]:
+def _estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for es/pt/en text)."""
+    if not text:
+        return 0
+    return max(1, -(-len(text) // _CHARS_PER_TOKEN))
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _is_duplicate(shingles: set, packed: List[set]) -> bool:
+    if not shingles:
+        return True
+    for other in packed:
+        overlap = len(shingles & other) / len(shingles)
+        if overlap >= _DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def pack_context(
+    retrieved: List[Tuple[float, Dict[str, Any]]],
+    budget_tokens: Optional[int] = None,
+    known_text: str = "",
+) -> Tuple[str, Dict[str, int]]:
+    """Greedily pack the highest-scoring chunks into a token budget.
+
+    `retrieved` is a list of (score, doc). Docs are split into paragraph
+    chunks; near-duplicate chunks (of each other or of `known_text`, e.g. the
+    product sheet already in the prompt) are skipped and chunks that don't fit
+    the remaining budget are dropped (the first one is truncated instead, so
+    the context is never empty). Returns (context, stats).
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget_tokens is None else max(1, budget_tokens)
+    candidates = []
+    for rank, (score, doc) in enumerate(retrieved):
+        chunks = [c.strip() for c in doc["text"].split("\n\n") if c.strip()]
+        for pos, chunk in enumerate(chunks):
+            candidates.append((-score, rank, pos, doc["section"], chunk))
+    candidates.sort(key=lambda c: c[:3])
+
+    parts: List[str] = []
+    packed_shingles = [_shingles(line) for line in known_text.splitlines() if line.strip()]
+    used = duplicates = dropped = 0
+    for _, _, _, section, chunk in candidates:
+        shingles = _shingles(chunk)
+        if _is_duplicate(shingles, packed_shingles):
+            duplicates += 1
+            continue
+        part = f"{section}: {chunk}"
+        cost = _estimate_tokens(part) + (1 if parts else 0)
+        if used + cost > budget:
+            if parts:
+                dropped += 1
+                continue
+            part = part[: budget * _CHARS_PER_TOKEN]
+            cost = _estimate_tokens(part)
+        parts.append(part)
+        packed_shingles.append(shingles)
+        used += cost
+
+    stats = {
+        "context_budget": budget,
+        "context_tokens": used,
+        "packed_chunks": len(parts),
+        "dropped_chunks": dropped,
+        "duplicate_chunks": duplicates,
+    }
+    return "\n\n".join(parts), stats
+
+
+def prompt_prefix(language: str = "es") -> str:
+    """Static system prompt + product sheet for (language, corpus version).
+
+    Built once and reused verbatim so every request shares the same prefix.
+    Providers only cache prefixes past ~1024 tokens, so the product sheet
+    (not the per-question context) is what should grow.
+    """
+    language = language if language in _SYSTEM_PROMPTS else "es"
+    key = (language, _CORPUS_VERSION)
+    prefix = _PREFIX_CACHE.get(key)
+    count_event("prompt", "prefix_cache_miss" if prefix is None else "prefix_cache_hit")
+    if prefix is None:
+        prefix = _SYSTEM_PROMPTS[language]
+        sheet = _product_sheet(language)
+        if sheet:
+            prefix += f"\n\n{_PROMPT_LABELS[language][0]}\n{sheet}"
+        _PREFIX_CACHE[key] = prefix
+    return prefix
+
+
+def build_prompt(query: str, context: str, language: str = "es") -> List[Dict[str, str]]:
+    """Chat messages with the cacheable prefix first and only the retrieved
+    context and question in the trailing user message."""
+    labels = _PROMPT_LABELS.get(language, _PROMPT_LABELS["es"])
+    return [
+        {"role": "system", "content": prompt_prefix(language)},
+        {"role": "user", "content": f"{labels[1]}\n{context}\n\n{labels[2]} {query}"},
+    ]
+
+
+def _record_token_usage(msg: Any, usage: Dict[str, int]) -> None:
+    """Copy provider token counts (incl. cached prompt tokens) into usage."""
+    metadata = getattr(msg, "response_metadata", None)
+    token_usage = metadata.get("token_usage") if isinstance(metadata, dict) else None
+    if not isinstance(token_usage, dict):
+        return
+    details = token_usage.get("prompt_tokens_details") or {}
+    usage["prompt_tokens"] = int(token_usage.get("prompt_tokens") or usage.get("prompt_tokens", 0))
+    usage["completion_tokens"] = int(token_usage.get("completion_tokens") or 0)
+    usage["cached_tokens"] = int(details.get("cached_tokens") or 0)
+    _PROMPT_CACHE_STATS["requests"] += 1
+    _PROMPT_CACHE_STATS["prompt_tokens"] += usage["prompt_tokens"]
+    _PROMPT_CACHE_STATS["cached_tokens"] += usage["cached_tokens"]
+    count_tokens(usage)
+
+
+def prompt_cache_stats() -> Dict[str, float]:
+    """Aggregate prompt/cached token counts reported by the provider."""
+    stats: Dict[str, float] = dict(_PROMPT_CACHE_STATS)
+    stats["cached_ratio"] = (
+        stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+    )
+    return stats
+
+
+def _retrieve(embedder: Any, query: str, top_k: int, operation: str) -> Tuple[np.ndarray, np.ndarray, str]:
+    """Vector top-k through the query caches. Returns (idxs, scores, cache),
+    cache being "retrieval" (no work), "embedding" (search only) or "miss"."""
+    text = normalize_query(query)
+    signature = _embedder_signature(embedder)
+    cached = _RETRIEVALS.get((signature, text, top_k))
+    if cached is not None:
+        count_event(operation, "retrieval_cache_hit")
+        return cached[0], cached[1], "retrieval"
+    try:
+        with timed(operation, "embed"), span("embed", model=signature):
+            q_vec, hit = _QUERY_VECTORS.get_or_compute(
+                (signature, text), lambda: np.array(embedder.embed_query(text), dtype=np.float32)
+            )
+    except Overloaded:
+        raise
+    except Exception:
+        count_upstream_error("embeddings")
+        raise
+    count_event(operation, "query_cache_hit" if hit else "query_cache_miss")
+    with timed(operation, "retrieve"):
+        idxs, scores = vector_search(q_vec, top_k)
+    _RETRIEVALS.put((signature, text, top_k), (idxs, scores))
+    return idxs, scores, "embedding" if hit else "miss"
+
+
+def prefetch(query: str, top_k: int = 3) -> str:
+    """Warm the query caches for a question being typed, so that answering it
+    only needs the LLM call. Returns "cached", "warmed", or "skipped" when
+    there is no vector index for the current embedder (never re-embeds)."""
+    embedder = _ensure_embedder()
+    with _INDEX_LOCK.read():
+        if embedder is None or not _index_matches(embedder):
+            return "skipped"
+        with span("prefetch", top_k=top_k) as s:
+            _, _, cache = _retrieve(embedder, query, max(1, top_k), "prefetch")
+            if s:
+                s.set_attribute("cache", cache)
+    return "cached" if cache == "retrieval" else "warmed"
+
+
+def answer_question(
+    query: str,
+    top_k: int = 3,
+    language: str = "es",
+    token_budget: Optional[int] = None,
+) -> Dict[str, Any]:
     """Retrieve top-k docs and generate an answer with citations.
 
-    Returns {answer: str, sources: List[{section, snippet}]}.
+    Returns {answer: str, sources: List[{section, snippet}], usage: {...}}
+    where usage reports the context packing and prompt token counts.
     """
-    global _EMBEDDINGS
-    
+    with span("answer_question", top_k=top_k, language=language, docs=len(_DOCS)) as s:
+        result = _answer_question(query, top_k, language, token_budget)
+        if s:
+            s.set_attribute("sources", [src["section"] for src in result["sources"]])
+        return result
+
+
+def _answer_question(query: str, top_k: int, language: str, token_budget: Optional[int]) -> Dict[str, Any]:
     if not _DOCS:
+        count_event("answer", "empty_index")
         return {
             "answer": "Aún no hay información indexada para responder. Intentalo más tarde.",
             "sources": [],
         }
 
-    # Check if we need to re-embed with new API key
+    # Check if we need to re-embed with new API key or another backend
     embedder = _ensure_embedder()
-    if embedder is not None and _EMBEDDINGS is None:
-        # Re-embed documents with new API key
-        texts = [d["text"] for d in _DOCS]
-        vectors = embedder.embed_documents(texts)
-        _EMBEDDINGS = np.array(vectors, dtype=np.float32)
+    if embedder is not None and not _index_matches(embedder):
+        with _INDEX_LOCK.write():
+            # Checked again: a concurrent request may have re-embedded while
+            # this one waited for the lock
+            if not _index_matches(embedder):
+                count_event("answer", "reembed")
+                with timed("answer", "reembed"), \
+                        span("reembed", model=_embedder_signature(embedder), docs=len(_DOCS)):
+                    _embed_corpus(embedder)
 
-    # If no embeddings available, use simple keyword matching
-    if _EMBEDDINGS is None:
-        query_words = set(query.lower().split())
-        scored_docs = []
-        for i, doc in enumerate(_DOCS):
-            doc_words = set(doc["text"].lower().split())
-            score = len(query_words.intersection(doc_words))
-            if score > 0:
-                scored_docs.append((score, i))
-        
-        scored_docs.sort(reverse=True)
-        retrieved = [_DOCS[i] for _, i in scored_docs[:top_k]]
-        
-        if not retrieved:
+    # The LLM call below only needs the packed context, so an index swap
+    # waits for retrieval, not for generation
+    with _INDEX_LOCK.read():
+        # If no embedder or embeddings available (or another request swapped
+        # in vectors of another embedder meanwhile), use simple keyword matching
+        if embedder is None or not _index_matches(embedder):
+            count_event("answer", "keyword_fallback")
+            with timed("answer", "retrieve"), span("retrieval", method="keyword", top_k=top_k) as s:
+                retrieved = [_DOCS[i] for _, i in keyword_search(query, top_k)]
+                if s:
+                    s.set_attribute("doc_ids", [d.get("id") for d in retrieved])
+
+            if not retrieved:
+                count_event("answer", "no_match")
+                return {
+                    "answer": "No encontré información específica sobre tu pregunta en los datos del producto.",
+                    "sources": [],
+                }
+
+            # Create a clean summary without special characters
+            product_info = " ".join([d["text"][:200] for d in retrieved])
+            clean_info = product_info.replace("[", "").replace("]", "").replace("*", "").replace("<", "").replace(">", "")
             return {
-                "answer": "No encontré información específica sobre tu pregunta en los datos del producto.",
-                "sources": [],
+                "answer": f"Basado en la información disponible: {clean_info[:300]}...",
+                "sources": [{"section": d["section"], "snippet": d["text"][:160]} for d in retrieved],
             }
-        
-        # Create a clean summary without special characters
-        product_info = " ".join([d["text"][:200] for d in retrieved])
-        clean_info = product_info.replace("[", "").replace("]", "").replace("*", "").replace("<", "").replace(">", "")
-        return {
-            "answer": f"Basado en la información disponible: {clean_info[:300]}...",
-            "sources": [{"section": d["section"], "snippet": d["text"][:160]} for d in retrieved],
-        }
 
-    embedder = _ensure_embedder()
-    if embedder is None:
-        # Fallback to keyword matching
-        return answer_question(query, top_k, language)
-        
-    q_vec = np.array(embedder.embed_query(query), dtype=np.float32)
-    sims = _cosine_sim(_EMBEDDINGS, q_vec)
-    idxs = np.argsort(-sims)[: max(1, top_k)]
-    retrieved = [_DOCS[i] for i in idxs]
+        with span("retrieval", method="vector", top_k=top_k, storage=_INDEX_META.get("storage")) as retrieval:
+            idxs, scores, cache = _retrieve(embedder, query, max(1, top_k), "answer")
+            retrieved = [_DOCS[i] for i in idxs]
+            if retrieval:
+                retrieval.set_attributes({
+                    "doc_ids": [d.get("id") for d in retrieved],
+                    "scores": [round(float(x), 4) for x in scores],
+                    "cache": cache,
+                })
 
-    context = "\n\n".join(
-        [f"{d['section']}: {d['text'][:800]}" for d in retrieved]
-    )
+        # Model, completion and context budget from question and retrieval features
+        with timed("answer", "route"):
+            decision = route_question(query, [float(x) for x in scores])
+        route = decision.route
+        count_event("route", route.name)
+
+        with timed("answer", "pack"):
+            context, usage = pack_context(
+                [(float(score), _DOCS[i]) for i, score in zip(idxs, scores)],
+                route.context_tokens if token_budget is None else token_budget,
+                known_text=_product_sheet(language),
+            )
 
     # If no API key, return a heuristic extractive answer
     if not os.getenv("OPENAI_API_KEY"):
+        count_event("answer", "extractive_no_llm")
         return {
             "answer": (
                 "(Modo sin LLM) Resumen basado en contexto:\n" + context[:600]
             ),
             "sources": [{"section": d["section"], "snippet": d["text"][:160]} for d in retrieved],
+            "usage": usage,
+            "routing": decision.as_log(),
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    prompt = (
-        "Eres un asistente de compras inteligente. Responde en español de forma natural y conversacional. "
-        "Usa la información del contexto para responder de manera útil y precisa. "
-        "NO uses corchetes, asteriscos, o caracteres especiales en tu respuesta. "
-        "Responde de forma fluida como si fueras un experto en productos.\n\n"
-        f"Contexto del producto:\n{context}\n\n"
-        f"Pregunta del cliente: {query}\n\n"
-        "Responde de forma natural y útil, sin caracteres especiales o formato markdown."
-    )
-    msg = llm.invoke(prompt)
+    llm = _ensure_llm(route.model)
+    prefix_cached = (language if language in _SYSTEM_PROMPTS else "es", _CORPUS_VERSION) in _PREFIX_CACHE
+    with timed("answer", "prompt"):
+        messages = build_prompt(query, context, language)
+        usage["prompt_tokens"] = sum(_estimate_tokens(m["content"]) for m in messages)
+    with span("llm", model=llm.model, route=route.name, prefix_cache="hit" if prefix_cached else "miss", **usage) as s:
+        try:
+            with timed("answer", "llm"):
+                msg = llm.invoke(messages, max_tokens=route.max_tokens)
+        except Overloaded:
+            raise
+        except Exception:
+            count_upstream_error("llm")
+            raise
+        _record_token_usage(msg, usage)
+        if s:
+            s.set_attributes(usage)
     answer = msg.content if hasattr(msg, "content") else str(msg)
     return {
         "answer": answer,
         "sources": [{"section": d["section"], "snippet": d["text"][:160]} for d in retrieved],
+        "usage": usage,
+        "routing": decision.as_log(),
     }
 
 
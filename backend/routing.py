@@ -0,0 +1,102 @@
+"""
+LLM routing: pick the model, completion budget and context size for a RAG
+answer from cheap features of the question and of the retrieval.
+
+- light: short questions about one fact (a detected intent that wasn't
+  confident enough for the fast path, or one clearly best document) get a
+  small context and a short completion.
+- heavy: comparisons, why-questions and long questions get more context,
+  a longer completion and optionally a larger model.
+- standard: everything else; same model, context budget and (no) completion
+  cap as before routing.
+
+Each route is configurable with RAG_ROUTE_<NAME>_MODEL / _MAX_TOKENS /
+_CONTEXT_TOKENS (_MAX_TOKENS=0: no completion cap); RAG_ROUTING=off sends
+every question down the standard route.
+"""
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+from .intents import classify_intent, is_complex
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: str
+    max_tokens: Optional[int]
+    context_tokens: int
+
+
+@dataclass
+class RoutingDecision:
+    route: Route
+    reason: str
+    features: Dict[str, Any] = field(default_factory=dict)
+
+    def as_log(self) -> Dict[str, Any]:
+        """Flat record for the query log and span attributes."""
+        return {"route": self.route.name, "reason": self.reason, **asdict(self.route), **self.features}
+
+
+def _route_from_env(name: str, model: str, max_tokens: int, context_tokens: int) -> Route:
+    prefix = f"RAG_ROUTE_{name.upper()}_"
+    return Route(
+        name=name,
+        model=os.getenv(prefix + "MODEL", model),
+        max_tokens=int(os.getenv(prefix + "MAX_TOKENS", str(max_tokens))) or None,
+        context_tokens=int(os.getenv(prefix + "CONTEXT_TOKENS", str(context_tokens))),
+    )
+
+
+_STANDARD_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "700"))
+ROUTES: Dict[str, Route] = {
+    "light": _route_from_env("light", "gpt-4o-mini", 160, 350),
+    # Uncapped, like the single model the answers used before routing
+    "standard": _route_from_env("standard", "gpt-4o-mini", 0, _STANDARD_CONTEXT_TOKENS),
+    "heavy": _route_from_env("heavy", "gpt-4o", 700, 1200),
+}
+
+# Questions up to this many words may take the light route
+LIGHT_MAX_WORDS = int(os.getenv("RAG_ROUTE_LIGHT_MAX_WORDS", "8"))
+# Top-1 minus top-2 retrieval score for "one document clearly answers it"
+LIGHT_MIN_MARGIN = float(os.getenv("RAG_ROUTE_LIGHT_MIN_MARGIN", "0.08"))
+# Questions longer than this take the heavy route
+HEAVY_MIN_WORDS = int(os.getenv("RAG_ROUTE_HEAVY_MIN_WORDS", "25"))
+
+
+def routing_enabled() -> bool:
+    return os.getenv("RAG_ROUTING", "on").lower() not in ("0", "off", "false", "no")
+
+
+def question_features(question: str, scores: Sequence[float] = ()) -> Dict[str, Any]:
+    """Features used by route_question; scores are the retrieval scores, best first."""
+    intent, confidence = classify_intent(question)
+    top = float(scores[0]) if len(scores) else 0.0
+    second = float(scores[1]) if len(scores) > 1 else 0.0
+    return {
+        "words": len(question.split()),
+        "intent": intent,
+        "intent_confidence": round(confidence, 3),
+        "complex": is_complex(question),
+        "top_score": round(top, 4),
+        "margin": round(top - second, 4),
+    }
+
+
+def route_question(question: str, scores: Sequence[float] = ()) -> RoutingDecision:
+    """Pick a route for a question given its retrieval scores (best first)."""
+    features = question_features(question, scores)
+    if not routing_enabled():
+        return RoutingDecision(ROUTES["standard"], "disabled", features)
+    if features["complex"]:
+        return RoutingDecision(ROUTES["heavy"], "complex", features)
+    if features["words"] > HEAVY_MIN_WORDS:
+        return RoutingDecision(ROUTES["heavy"], "long", features)
+    if features["words"] <= LIGHT_MAX_WORDS:
+        if features["intent"] is not None:
+            return RoutingDecision(ROUTES["light"], "intent", features)
+        if features["margin"] >= LIGHT_MIN_MARGIN:
+            return RoutingDecision(ROUTES["light"], "confident_retrieval", features)
+    return RoutingDecision(ROUTES["standard"], "default", features)
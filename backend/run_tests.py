@@ -69,7 +69,7 @@ def main():
     
     # Add coverage if requested
     if args.coverage:
-        cmd.extend(["--cov=main", "--cov=rag", "--cov-report=html", "--cov-report=term"])
+        cmd.extend(["--cov=backend.main", "--cov=backend.rag", "--cov-report=html", "--cov-report=term"])
     
     # Add markers for specific test types
     if args.unit:
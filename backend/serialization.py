@@ -0,0 +1,66 @@
+"""
+Fast JSON responses.
+
+FastAPI validates a returned model against `response_model` and walks it
+through jsonable_encoder before rendering, ~20x the cost of serializing it
+once. Endpoints whose payload is already the right type return a Response
+directly instead, which FastAPI passes through untouched (response_model is
+still used for the OpenAPI schema):
+
+- model_response: typed models, serialized by pydantic-core in one pass.
+- StaticJSON: module-level models that never change, serialized once.
+- json_response: plain dicts, rendered with orjson when it is installed.
+- json_line: one NDJSON line, for streamed responses.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:
+    orjson = None
+    ORJSONResponse = None
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+if orjson is not None:
+    class FastJSONResponse(ORJSONResponse):
+        """orjson renderer that also accepts NumPy scalars/arrays."""
+
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+else:
+    FastJSONResponse = JSONResponse
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize a typed model without FastAPI's re-validation."""
+    return Response(model.model_dump_json().encode("utf-8"), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Render JSON-native content directly (skips jsonable_encoder)."""
+    return FastJSONResponse(content, status_code=status_code)
+
+
+def json_line(content: Any) -> bytes:
+    """One newline-terminated JSON document (application/x-ndjson)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(content, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class StaticJSON:
+    """A model serialized once, for payloads fixed at import time."""
+
+    def __init__(self, model: BaseModel):
+        self.body = model.model_dump_json().encode("utf-8")
+
+    def response(self) -> Response:
+        return Response(self.body, media_type=JSON_MEDIA_TYPE)
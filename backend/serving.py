@@ -0,0 +1,196 @@
+"""
+Request handling shared by the uvicorn app (main.py) and the Vercel function
+(api/index.py). The apps keep their catalog, startup and routes; the chat
+pipeline, prefetch, OpenAI key scoping, search and the admin endpoints live
+here so both serve the same answers, spans and query log records.
+
+- chat(): fast path -> FAQ table -> RAG for one ChatRequest.
+- chat_response(): the /agent/chat endpoint around it (span, query log,
+  routing kept out of the response).
+- prefetch_status(): the /agent/prefetch decision and warm-up.
+- search_response(): /search, traced and logged.
+- require_admin() / profile_response(): the X-Admin-Token endpoints.
+
+Must stay importable on the Vercel Python 3.9 runtime.
+"""
+import asyncio
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, Response
+
+from .faqs import FAQTable
+from .intents import answer_from_item
+from .limits import Overloaded, get_limiter, key_slot
+from .metrics import count_event, timed
+from .models import ChatRequest, PrefetchRequest, SearchRequest
+from .profiler import MAX_SECONDS, start_profiling, stop_profiling
+from .querylog import log_query
+from .rag import answer_question, corpus_version, prefetch
+from .serialization import json_response, model_response
+from .tracing import span
+from . import federation
+from . import sharedindex
+
+
+# Retrieved documents per chat answer; prefetch warms the same key
+CHAT_TOP_K = 4
+# Shorter partial questions are not worth an embedding call
+PREFETCH_MIN_CHARS = int(os.getenv("PREFETCH_MIN_CHARS", "8"))
+
+
+def require_admin(x_admin_token: Optional[str]) -> None:
+    """404 unless ADMIN_TOKEN is set and matches the X-Admin-Token header."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or not secrets.compare_digest(x_admin_token or "", admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+async def profile_response(seconds: float, interval_ms: float, include_idle: bool) -> Response:
+    """Sample all threads for `seconds` and return collapsed stacks."""
+    try:
+        profiler = start_profiling(interval_ms / 1000, include_idle=include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(min(max(seconds, 0.1), MAX_SECONDS))
+    finally:
+        stop_profiling()
+    return Response(
+        profiler.collapsed(),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.collapsed"',
+            "X-Profile-Mode": profiler.mode,
+            "X-Profile-Samples": str(profiler.sample_count),
+        },
+    )
+
+
+@contextmanager
+def openai_key(key: Optional[str]):
+    # Temporarily set the API key if provided
+    original_key = os.environ.get("OPENAI_API_KEY")
+    if key:
+        os.environ["OPENAI_API_KEY"] = key
+
+    try:
+        yield
+    finally:
+        # Restore original key
+        if original_key:
+            os.environ["OPENAI_API_KEY"] = original_key
+        elif "OPENAI_API_KEY" in os.environ:
+            del os.environ["OPENAI_API_KEY"]
+
+
+async def search_response(payload: SearchRequest) -> Response:
+    """/search: federated results, traced and logged."""
+    start = time.perf_counter()
+    with span("search_endpoint", query=payload.query[:100]) as s:
+        response, providers = await federation.search(payload.query)
+        if s:
+            s.set_attribute("results", len(response.results))
+    log_query("search", start, query=payload.query, results=len(response.results), providers=providers,
+              outcome="results" if response.results else "no_results")
+    return model_response(response)
+
+
+def chat(
+    payload: ChatRequest,
+    item: Any,
+    faq_table: FAQTable,
+    refresh: Optional[Callable[[], Any]] = None,
+    no_key_answer: Optional[str] = None,
+) -> dict:
+    """Answer one chat request.
+
+    `refresh` brings the index up to date before it is used (default:
+    sharedindex.refresh). With `no_key_answer`, questions that need the LLM
+    get that text when neither the request nor the server has an OpenAI key.
+    """
+    # Factual lookups are answered from the item fields, no LLM needed
+    with timed("chat", "intent"):
+        quick_answer = answer_from_item(item, payload.question, language=payload.language)
+    if quick_answer is not None:
+        count_event("chat", "fast_path")
+        return quick_answer
+
+    # Another worker may have published a newer index
+    (refresh or sharedindex.refresh)()
+
+    # Frequent questions precomputed for the current corpus, no embedding or LLM call
+    with timed("chat", "faq_table"):
+        entry = faq_table.lookup(item.id, payload.language, payload.question, corpus_version())
+    if entry is not None:
+        count_event("chat", "faq_table")
+        return {"answer": entry["answer"], "sources": entry["sources"], "faq": entry["question"]}
+
+    if no_key_answer is not None and not payload.openai_key and not os.getenv("OPENAI_API_KEY"):
+        count_event("answer", "no_api_key")
+        return {"answer": no_key_answer, "sources": []}
+
+    with openai_key(payload.openai_key):
+        if payload.openai_key:
+            # Requests on a user's own key share a small per-key limit
+            with key_slot(payload.openai_key):
+                return answer_question(payload.question, top_k=CHAT_TOP_K, language=payload.language)
+        return answer_question(payload.question, top_k=CHAT_TOP_K, language=payload.language)
+
+
+def chat_response(payload: ChatRequest, answer: Callable[[ChatRequest], dict]) -> Response:
+    """/agent/chat: `answer` (a chat() call) traced and logged."""
+    start = time.perf_counter()
+    logged = {"question": payload.question, "language": payload.language, "own_key": bool(payload.openai_key)}
+    with span("chat_endpoint", question_chars=len(payload.question), language=payload.language,
+              own_key=bool(payload.openai_key)) as s:
+        try:
+            result = answer(payload)
+        except Overloaded:
+            log_query("chat", start, status=429, outcome="rejected", **logged)
+            raise
+        except Exception:
+            log_query("chat", start, status=500, outcome="error", **logged)
+            raise
+        path = "fast_path" if "intent" in result else "faq_table" if "faq" in result else "rag"
+        # Routing decisions go to the query log, not to the client
+        routing = result.pop("routing", None)
+        if routing is not None:
+            logged["routing"] = routing
+        if s:
+            s.set_attribute("path", path)
+    log_query("chat", start, outcome=path, **logged)
+    return json_response(result)
+
+
+def prefetch_status(
+    payload: PrefetchRequest,
+    item: Any,
+    faq_table: FAQTable,
+    refresh: Optional[Callable[[], Any]] = None,
+) -> str:
+    """Warm embedding and retrieval for a question being typed; returns
+    "skipped", "busy", "failed" or the rag.prefetch() status."""
+    question = payload.question.strip()
+    if len(question) < PREFETCH_MIN_CHARS:
+        return "skipped"
+    # Answered without retrieval anyway
+    if answer_from_item(item, question, language=payload.language) is not None:
+        return "skipped"
+    (refresh or sharedindex.refresh)()
+    if faq_table.lookup(item.id, payload.language, question, corpus_version()) is not None:
+        return "skipped"
+    # Speculative work never queues behind real questions
+    if get_limiter("openai").waiting:
+        return "busy"
+    with openai_key(payload.openai_key):
+        try:
+            return prefetch(question, top_k=CHAT_TOP_K)
+        except Overloaded:
+            return "busy"
+        except Exception as e:
+            print(f"Prefetch error: {e}")
+            return "failed"
@@ -0,0 +1,181 @@
+"""
+Multi-worker mode: one RAG index per host instead of one per worker.
+
+With RAG_SHARED_DIR set, the first worker to start builds the index (the
+leader, elected with an flock on <dir>/leader.lock) and publishes it as a
+numbered generation, <dir>/gen-<n>/, written by rag.export_index(). The
+generation becomes visible when <dir>/CURRENT is atomically replaced with
+its number. Every worker, the leader included, then serves from read-only
+memory maps of the published arrays, so N workers share one copy of the
+vectors in the page cache.
+
+A reload (reload(), POST /admin/reindex) publishes generation n+1 next to
+the live one and flips CURRENT; each worker notices on its next chat
+request (refresh(), at most every RAG_SHARED_POLL_S) and swaps the new
+index in between retrievals. Generations older than n-1 are deleted; a
+worker still mapping one keeps reading the unlinked files until it swaps.
+
+Requires fcntl (Linux/macOS). Unset RAG_SHARED_DIR = every process builds
+its own index, as with a single `uvicorn backend.main:app`.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import rag
+from .metrics import count_event, timed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+SHARED_DIR = os.getenv("RAG_SHARED_DIR", "")
+POLL_S = float(os.getenv("RAG_SHARED_POLL_S", "1.0"))
+# Generations kept besides the current one, for workers that haven't swapped yet
+_KEEP_PREVIOUS = 1
+
+_directory: Optional[str] = None
+_attached: Optional[int] = None
+_checked_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    if SHARED_DIR and fcntl is None:
+        print("RAG_SHARED_DIR needs fcntl (Linux/macOS); building a private index instead")
+        return False
+    return bool(SHARED_DIR)
+
+
+def generation() -> Optional[int]:
+    """Generation this process serves; None outside multi-worker mode."""
+    return _attached
+
+
+def current_generation(directory: str) -> Optional[int]:
+    """Latest published generation, or None before the first publish."""
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as fh:
+            return int(fh.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def start(docs: List[Dict[str, Any]], product_sheet: rag.ProductSheet = "", directory: Optional[str] = None) -> str:
+    """Worker startup: attach to the published index, or build and publish
+    it if none matches this corpus and embedder yet. Returns "attached" or
+    "published"."""
+    global _directory
+    directory = SHARED_DIR if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+    published = current_generation(directory)
+    if published is not None and _attach(published, docs, product_sheet):
+        return "attached"
+    with _leader_lock(directory):
+        # Another worker may have published while this one waited for the lock
+        published = current_generation(directory)
+        if published is not None and _attach(published, docs, product_sheet):
+            return "attached"
+        rag.ingest_or_restore(docs, product_sheet)
+        _publish(directory)
+    return "published"
+
+
+def reload(docs: List[Dict[str, Any]], product_sheet: rag.ProductSheet = "") -> int:
+    """Rebuild the index and publish it as the next generation; the other
+    workers pick it up on refresh(). Returns the new generation."""
+    if _directory is None:
+        raise RuntimeError("sharedindex.start() was not called")
+    with _leader_lock(_directory):
+        rag.ingest_corpus(docs, product_sheet=product_sheet)
+        return _publish(_directory)
+
+
+def refresh() -> bool:
+    """Swap in a newer published generation. Cheap enough to call on every
+    request: CURRENT is read at most every POLL_S, by one thread at a time.
+    Returns True if the index changed."""
+    global _checked_at
+    if _directory is None or not _refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        now = time.monotonic()
+        if now - _checked_at < POLL_S:
+            return False
+        _checked_at = now
+        published = current_generation(_directory)
+        if published is None or published == _attached:
+            return False
+        return _attach(published)
+    finally:
+        _refresh_lock.release()
+
+
+def _publish(directory: str) -> int:
+    # Caller holds the leader lock
+    global _attached
+    generation = (current_generation(directory) or 0) + 1
+    final = _generation_dir(directory, generation)
+    with timed("shared_index", "publish"):
+        staging = tempfile.mkdtemp(prefix=f".gen-{generation}-", dir=directory)
+        rag.export_index(staging)
+        # Left over by a leader that died before flipping CURRENT; never served
+        shutil.rmtree(final, ignore_errors=True)
+        os.rename(staging, final)
+        _write_current(directory, generation)
+    count_event("shared_index", "published")
+    # The leader drops its private arrays for the shared maps too; if that
+    # fails it keeps serving its own copy of the same generation
+    if not _attach(generation):
+        _attached = generation
+    _prune(directory, generation)
+    return generation
+
+
+def _attach(generation: int, docs: Optional[List[Dict[str, Any]]] = None, product_sheet: rag.ProductSheet = "") -> bool:
+    global _attached
+    try:
+        with timed("shared_index", "attach"):
+            attached = rag.attach_index(_generation_dir(_directory, generation), docs, product_sheet, generation)
+    except (OSError, ValueError) as e:
+        # Pruned or half-written; the next refresh reads CURRENT again
+        print(f"Could not attach shared index generation {generation}: {e}")
+        return False
+    if attached:
+        _attached = generation
+        count_event("shared_index", "attached")
+    return attached
+
+
+def _generation_dir(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"gen-{generation}")
+
+
+def _write_current(directory: str, generation: int) -> None:
+    tmp_path = os.path.join(directory, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(f"{generation}\n")
+    os.replace(tmp_path, os.path.join(directory, "CURRENT"))
+
+
+def _prune(directory: str, generation: int) -> None:
+    for name in os.listdir(directory):
+        if name.startswith("gen-") and name[4:].isdigit() and int(name[4:]) < generation - _KEEP_PREVIOUS:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+@contextmanager
+def _leader_lock(directory: str) -> Iterator[None]:
+    with open(os.path.join(directory, "leader.lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
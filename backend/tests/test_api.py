@@ -6,10 +6,10 @@ import json
 import os
 import sys
 
-# Add the parent directory to the path so we can import main
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from main import app, SAMPLE_ITEM, REVIEWS_DATA
+from backend.main import app, SAMPLE_ITEM, REVIEWS_DATA
 
 client = TestClient(app)
 
@@ -109,8 +109,49 @@ class TestReviewsEndpoint:
         assert data["total_reviews"] == total_from_breakdown
 
 
+class TestPageEndpoint:
+    """Test the /page/{item_id} bootstrap endpoint"""
+
+    def test_page_matches_separate_endpoints(self):
+        """Test that the composite payload equals /item and /reviews"""
+        response = client.get(f"/page/{SAMPLE_ITEM.id}")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["item"] == client.get("/item").json()
+        assert data["reviews"] == client.get("/reviews").json()
+
+    @pytest.mark.parametrize("lang", ["es", "pt", "en"])
+    def test_page_includes_answered_faqs(self, lang):
+        """Test suggested questions come with their answers"""
+        data = client.get(f"/page/{SAMPLE_ITEM.id}?lang={lang}").json()
+
+        assert len(data["faqs"]) == 5
+        assert all(faq["question"] and faq["answer"] for faq in data["faqs"])
+
+    def test_page_unknown_item(self):
+        """Test 404 for an unknown item and 422 for an unsupported language"""
+        assert client.get("/page/MLA000").status_code == 404
+        assert client.get(f"/page/{SAMPLE_ITEM.id}?lang=fr").status_code == 422
+
+
 class TestSearchEndpoint:
     """Test the /search endpoint"""
+
+    def setup_method(self):
+        """Search needs a Tavily key"""
+        os.environ["TAVILY_API_KEY"] = "tvly-test"
+
+    def teardown_method(self):
+        os.environ.pop("TAVILY_API_KEY", None)
+
+    def test_search_not_configured(self):
+        """Test search without a Tavily key is a clear 503, not empty results"""
+        del os.environ["TAVILY_API_KEY"]
+        response = client.post("/search", json={"query": "samsung galaxy"})
+
+        assert response.status_code == 503
+        assert response.json() == {"detail": "Search is not configured"}
     
     @patch('httpx.AsyncClient')
     def test_search_success(self, mock_client_class):
@@ -188,7 +229,7 @@ class TestSearchEndpoint:
 class TestChatEndpoint:
     """Test the /agent/chat endpoint"""
     
-    @patch('main.answer_question')
+    @patch('backend.serving.answer_question')
     def test_chat_success(self, mock_answer_question):
         """Test successful chat response"""
         # Mock successful answer
@@ -212,7 +253,7 @@ class TestChatEndpoint:
         assert data["answer"] == "El Samsung Galaxy A55 tiene una cámara excelente con 50MP."
         assert len(data["sources"]) == 1
     
-    @patch('main.answer_question')
+    @patch('backend.serving.answer_question')
     def test_chat_with_openai_key(self, mock_answer_question):
         """Test chat with OpenAI API key"""
         mock_answer_question.return_value = {
@@ -232,6 +273,17 @@ class TestChatEndpoint:
         data = response.json()
         assert data["answer"] == "Respuesta con GPT-4"
     
+    @patch('backend.serving.answer_question')
+    def test_chat_fast_path_skips_rag(self, mock_answer_question):
+        """Test that factual questions are answered without RAG"""
+        response = client.post("/agent/chat", json={"question": "¿Cuánto cuesta?"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["intent"] == "price"
+        assert "972.000" in data["answer"]
+        mock_answer_question.assert_not_called()
+    
     def test_chat_missing_question(self):
         """Test chat with missing question"""
         response = client.post("/agent/chat", json={})
@@ -0,0 +1,148 @@
+import pytest
+import gzip
+import json
+import os
+import sys
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import compression
+from backend.compression import CompressionMiddleware, Precompressed, negotiate
+from backend.main import app
+
+client = TestClient(app)
+
+
+class TestNegotiate:
+    """Test Accept-Encoding negotiation"""
+
+    def test_prefers_brotli_when_available(self):
+        """Test br wins over gzip at equal weight"""
+        expected = "br" if compression.brotli is not None else "gzip"
+        assert negotiate("gzip, deflate, br") == expected
+
+    def test_honors_q_values(self):
+        """Test explicit weights and refusals"""
+        assert negotiate("br;q=0.1, gzip;q=0.9") == "gzip"
+        assert negotiate("gzip;q=0, br;q=0") is None
+        assert negotiate("identity") is None
+        assert negotiate(None) is None
+
+    def test_wildcard(self):
+        """Test '*' accepts any supported encoding"""
+        assert negotiate("*") in compression.supported_encodings()
+
+
+class TestPrecompressed:
+    """Test precompressed static payloads"""
+
+    body = json.dumps({"items": ["x" * 40] * 100}).encode()
+
+    def make_app(self, payload):
+        test_app = FastAPI()
+
+        @test_app.get("/static")
+        def static(request: compression.Request):
+            return payload.response(request)
+
+        return TestClient(test_app)
+
+    def test_variants_decode_to_body(self):
+        """Test every variant round-trips to the original bytes"""
+        payload = Precompressed(self.body)
+
+        assert gzip.decompress(payload.variants["gzip"]) == self.body
+        if compression.brotli is not None:
+            assert compression.brotli.decompress(payload.variants["br"]) == self.body
+
+    def test_small_bodies_not_compressed(self):
+        """Test payloads under the threshold are served as-is"""
+        payload = Precompressed(b'{"ok": true}')
+        response = self.make_app(payload).get("/static", headers={"Accept-Encoding": "gzip"})
+
+        assert payload.variants == {}
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] == payload.etag
+
+    def test_etag_per_encoding(self):
+        """Test each representation carries its own strong validator"""
+        payload = Precompressed(self.body)
+        test_client = self.make_app(payload)
+
+        plain = test_client.get("/static", headers={"Accept-Encoding": "identity"})
+        zipped = test_client.get("/static", headers={"Accept-Encoding": "gzip"})
+
+        assert plain.headers["etag"] == payload.etag
+        assert zipped.headers["content-encoding"] == "gzip"
+        assert zipped.headers["etag"] != plain.headers["etag"]
+        assert zipped.content == self.body  # decoded by the client
+        assert zipped.headers["vary"] == "Accept-Encoding"
+
+    def test_if_none_match_returns_304(self):
+        """Test revalidation with any of the payload's tags"""
+        payload = Precompressed(self.body)
+        test_client = self.make_app(payload)
+
+        for etag in payload.etags.values():
+            response = test_client.get("/static", headers={"If-None-Match": f"W/{etag}"})
+            assert response.status_code == 304
+            assert response.content == b""
+        stale = test_client.get("/static", headers={"If-None-Match": '"stale"'})
+        assert stale.status_code == 200
+
+    def test_edge_suffixed_etag_returns_304(self):
+        """Test a tag an edge re-encoded with its own suffix still revalidates"""
+        payload = Precompressed(self.body)
+        digest = payload.etag.strip('"')
+
+        response = self.make_app(payload).get("/static", headers={"If-None-Match": f'W/"{digest}-zstd"'})
+
+        assert response.status_code == 304
+
+
+class TestCompressionMiddleware:
+    """Test compression of dynamic responses"""
+
+    def make_client(self, text, media_type="application/json"):
+        test_app = FastAPI()
+        test_app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+        @test_app.get("/")
+        def root():
+            return PlainTextResponse(text, media_type=media_type)
+
+        return TestClient(test_app)
+
+    def test_compresses_large_json(self):
+        """Test bodies above the threshold are compressed"""
+        response = self.make_client("a" * 500).get("/", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text == "a" * 500
+        assert "Accept-Encoding" in response.headers["vary"]
+
+    def test_skips_small_and_binary(self):
+        """Test small and non-text bodies pass through"""
+        small = self.make_client("a" * 50).get("/", headers={"Accept-Encoding": "gzip"})
+        binary = self.make_client("a" * 500, "image/png").get("/", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in binary.headers
+
+
+class TestStaticEndpoints:
+    """Test caching headers on /item and /reviews"""
+
+    @pytest.mark.parametrize("path", ["/item", "/reviews"])
+    def test_revalidation(self, path):
+        """Test ETag/Cache-Control and a 304 on the second request"""
+        first = client.get(path)
+        assert first.status_code == 200
+        assert "max-age" in first.headers["cache-control"]
+
+        second = client.get(path, headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304
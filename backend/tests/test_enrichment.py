@@ -0,0 +1,167 @@
+import pytest
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import enrichment
+from backend import federation
+from backend.enrichment import ListingParser, enrich, is_allowed, parse_price
+from backend.benchmarks.stubs import StubServer
+
+
+@pytest.fixture(scope="module")
+def stub():
+    """Local stand-in for Tavily and the listing pages"""
+    with StubServer(latency_ms={"pages": 20}) as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Empty per-URL cache; the stub's host is the only one allowed"""
+    monkeypatch.setenv("ENRICH_ALLOWED_HOSTS", "127.0.0.1")
+    enrichment.CACHE.clear()
+    yield
+    enrichment.CACHE.clear()
+
+
+async def collect(urls, concurrency=4):
+    async with enrichment.enrichment_client() as client:
+        return [item async for item in enrich(client, urls, concurrency)]
+
+
+class TestListingParser:
+    """Test extraction of title and price"""
+
+    def test_parse_price(self):
+        """Test thousands separators and decimals in both conventions"""
+        assert parse_price("972000") == 972000
+        assert parse_price("$ 972.000") == 972000
+        assert parse_price("1.299.999") == 1299999
+        assert parse_price("1,299.99") == 1299.99
+        assert parse_price("1.299,99") == 1299.99
+        assert parse_price("12,5") == 12.5
+        assert parse_price("sin precio") is None
+
+    def test_meta_tags_across_chunks(self):
+        """Test tags split over stream chunks are still parsed"""
+        html = (
+            '<html><head><title>Galaxy | ML</title>'
+            '<meta property="og:title" content="Samsung Galaxy A55">'
+            '<meta itemprop="price" content="972000"><meta itemprop="priceCurrency" content="ars">'
+        )
+        parser = ListingParser()
+        for i in range(0, len(html), 7):
+            parser.feed(html[i:i + 7])
+
+        assert parser.done
+        assert parser.result() == {"title": "Samsung Galaxy A55", "price": 972000, "currency": "ARS"}
+
+    def test_fallbacks(self):
+        """Test <title> and the visible price when meta tags are missing"""
+        parser = ListingParser()
+        parser.feed('<title> Galaxy  A55 </title><span class="andes-money-amount__fraction">972.000</span>')
+
+        assert parser.result() == {"title": "Galaxy A55", "price": 972000, "currency": None}
+
+    def test_allowed_hosts(self, monkeypatch):
+        """Test only allow-listed hosts and their subdomains are fetched"""
+        monkeypatch.setenv("ENRICH_ALLOWED_HOSTS", "mercadolibre.com.ar")
+
+        assert is_allowed("https://articulo.mercadolibre.com.ar/MLA-1")
+        assert not is_allowed("https://mercadolibre.com.ar.evil.com/MLA-1")
+        assert not is_allowed("http://169.254.169.254/latest/meta-data")
+        assert not is_allowed("file:///etc/passwd")
+
+
+class TestEnrich:
+    """Test concurrent fetches against the stub pages"""
+
+    def test_pages_enriched_and_cached(self, stub):
+        """Test every page is parsed once, then served from the cache"""
+        urls = [f"{stub.url}/articulo/MLA-{1000 + i}" for i in range(5)]
+        before = stub.requests.get("pages", 0)
+
+        first = asyncio.run(collect(urls))
+        second = asyncio.run(collect(urls))
+
+        assert sorted(i for i, _ in first) == list(range(5))
+        listings = dict(first)
+        assert listings[2] == {"title": "Samsung Galaxy A55 5G 256 GB (MLA-1002)", "price": 901002, "currency": "ARS"}
+        assert dict(second) == listings
+        assert stub.requests["pages"] - before == 5
+
+    def test_bounded_concurrency(self, stub):
+        """Test at most `concurrency` pages are fetched at a time"""
+        urls = [f"{stub.url}/articulo/MLA-{2000 + i}" for i in range(6)]
+        in_flight = peak = 0
+        fetch = enrichment.fetch_listing
+
+        async def counting_fetch(client, url):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                return await fetch(client, url)
+            finally:
+                in_flight -= 1
+
+        with patch.object(enrichment, "fetch_listing", counting_fetch):
+            results = asyncio.run(collect(urls, concurrency=2))
+
+        assert len(results) == 6
+        assert peak == 2
+
+    def test_failures_and_blocked_hosts(self, stub):
+        """Test bad pages and disallowed hosts yield None without failing the rest"""
+        urls = [f"{stub.url}/missing", "https://example.com/x", f"{stub.url}/articulo/MLA-3000"]
+
+        results = dict(asyncio.run(collect(urls)))
+
+        assert results[0] is None
+        assert results[1] is None
+        assert results[2]["price"] == 903000
+
+    def test_redirect_hops_checked(self, stub):
+        """Test a redirect to a disallowed host is not followed, an allowed one is"""
+        outside = stub.url.replace("127.0.0.1", "localhost") + "/articulo/MLA-4000"
+        inside = f"{stub.url}/articulo/MLA-4001"
+        loop = f"{stub.url}/redirect?to={stub.url}/redirect?to={stub.url}/redirect?to={stub.url}/redirect?to={inside}"
+        urls = [f"{stub.url}/redirect?to={outside}", f"{stub.url}/redirect?to={inside}", loop]
+        before = stub.requests.get("pages", 0)
+
+        results = dict(asyncio.run(collect(urls)))
+
+        assert results[0] is None
+        assert results[1]["price"] == 904001
+        assert results[2] is None  # more than ENRICH_MAX_REDIRECTS hops
+        assert stub.requests["pages"] - before == 1
+
+
+class TestSearchStream:
+    """Test /search/stream end to end"""
+
+    def test_results_then_listings(self, stub):
+        """Test the Tavily results come first, then one line per enriched result"""
+        from backend import main
+
+        with patch.object(federation, "TAVILY_API_URL", f"{stub.url}/search"), \
+                patch.dict(os.environ, {"TAVILY_API_KEY": "tvly-stub"}), TestClient(main.app) as client:
+            response = client.post("/search/stream", json={"query": "galaxy a55"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines[0]["results"]) == 7
+        enriched = lines[1:]
+        assert len(enriched) == enrichment.ENRICH_TOP_N
+        assert sorted(e["index"] for e in enriched) == list(range(enrichment.ENRICH_TOP_N))
+        for e in enriched:
+            assert e["url"] == lines[0]["results"][e["index"]]["url"]
+            assert e["listing"]["price"] == 900000 + 1000 + e["index"]
@@ -0,0 +1,156 @@
+import pytest
+import json
+import os
+import sys
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import main
+from backend import rag
+from backend.faqs import FAQTable, build_table, learned_questions, normalize_question
+
+
+ITEM_ID = "MLA123456"
+
+
+def fake_answer(question, language="es"):
+    return {"answer": f"answer to {question}", "sources": [{"section": "Opiniones destacadas", "snippet": "..."}]}
+
+
+class TestFAQTable:
+    """Test lookups in the precomputed table"""
+
+    def make_table(self, version="v1"):
+        table = FAQTable()
+        table.put(ITEM_ID, "es", "¿Cómo es la cámara?", fake_answer("cámara"), version)
+        table.put(ITEM_ID, "es", "¿Cuánto dura la batería?", fake_answer("batería"), version)
+        return table
+
+    def test_normalize_question(self):
+        """Test case, accents and punctuation are ignored"""
+        assert normalize_question("¿Cómo es  la CÁMARA?") == "como es la camara"
+
+    def test_exact_match(self):
+        """Test a rewording that normalizes to the same key"""
+        entry = self.make_table().lookup(ITEM_ID, "es", "como es la camara", "v1")
+
+        assert entry["answer"] == "answer to cámara"
+        assert entry["question"] == "¿Cómo es la cámara?"
+
+    def test_near_match(self):
+        """Test small rewordings and typos above the threshold"""
+        table = self.make_table()
+
+        assert table.lookup(ITEM_ID, "es", "¿Cuanto dura la bateria?!", "v1") is not None
+        assert table.lookup(ITEM_ID, "es", "cuanto dura la bateriaa", "v1") is not None
+        assert table.lookup(ITEM_ID, "es", "¿Cuánto dura la carga del cargador?", "v1") is None
+
+    def test_negated_or_narrower_question_not_served(self):
+        """Test a near match must not add a negation or a qualifier"""
+        table = self.make_table()
+        table.put(ITEM_ID, "es", "¿Incluye cargador?", fake_answer("cargador"), "v1")
+
+        assert table.lookup(ITEM_ID, "es", "¿Incluye cargadorr?", "v1")["answer"] == "answer to cargador"
+        assert table.lookup(ITEM_ID, "es", "¿No incluye cargador?", "v1", threshold=0.5) is None
+        assert table.lookup(ITEM_ID, "es", "¿Incluye cargador en Brasil?", "v1", threshold=0.5) is None
+        assert table.lookup(ITEM_ID, "es", "¿Cuánto dura la batería sin cargador?", "v1", threshold=0.5) is None
+        assert table.lookup(ITEM_ID, "es", "¿No incluye cargador?", "v1") is None
+
+    def test_scoped_by_item_and_language(self):
+        """Test answers never leak across items or languages"""
+        table = self.make_table()
+
+        assert table.lookup(ITEM_ID, "pt", "¿Cómo es la cámara?", "v1") is None
+        assert table.lookup("MLA999", "es", "¿Cómo es la cámara?", "v1") is None
+
+    def test_stale_corpus_not_served(self):
+        """Test answers from another corpus version are ignored"""
+        table = self.make_table()
+
+        assert table.lookup(ITEM_ID, "es", "¿Cómo es la cámara?", "v2") is None
+        assert table.lookup(ITEM_ID, "es", "¿Cómo es la cámara?", None) is None
+
+    def test_save_and_load(self, tmp_path):
+        """Test the on-disk round trip"""
+        path = str(tmp_path / "faq_table.json.gz")
+        self.make_table().save(path)
+        loaded = FAQTable.load(path)
+
+        assert len(loaded) == 2
+        assert loaded.lookup(ITEM_ID, "es", "¿Cómo es la cámara?", "v1")["answer"] == "answer to cámara"
+        assert len(FAQTable.load(str(tmp_path / "missing.json.gz"))) == 0
+
+
+class TestBuildTable:
+    """Test the incremental offline job"""
+
+    def test_only_new_and_stale_questions_answered(self):
+        """Test that unchanged answers are kept"""
+        table = FAQTable()
+        calls = []
+
+        def answer_fn(question, language):
+            calls.append(question)
+            return fake_answer(question)
+
+        questions = ["¿Cómo es la cámara?", "¿Es resistente al agua?"]
+        assert build_table(table, ITEM_ID, "es", questions, "v1", answer_fn) == {"answered": 2, "kept": 0, "dropped": 0}
+
+        stats = build_table(table, ITEM_ID, "es", questions + ["¿Tiene 5G?"], "v1", answer_fn)
+        assert stats == {"answered": 1, "kept": 2, "dropped": 0}
+        assert calls[-1] == "¿Tiene 5G?"
+
+        stats = build_table(table, ITEM_ID, "es", ["¿Tiene 5G?"], "v2", answer_fn)
+        assert stats == {"answered": 1, "kept": 0, "dropped": 2}
+        assert table.lookup(ITEM_ID, "es", "¿Tiene 5G?", "v2") is not None
+
+    def test_learned_questions(self, tmp_path):
+        """Test frequent logged questions are picked per language"""
+        log = tmp_path / "chat.jsonl"
+        records = (
+            [{"question": "¿La cámara es buena?", "language": "es"}] * 3
+            + [{"question": "la camara es buena", "language": "es"}]
+            + [{"question": "¿Trae cargador?", "language": "es"}]
+            + [{"question": "Is the camera good?", "language": "en"}] * 5
+        )
+        log.write_text("\n".join(json.dumps(r) for r in records) + "\nnot json\n")
+
+        assert learned_questions(str(log), "es", min_count=3) == ["¿La cámara es buena?"]
+        assert learned_questions(str(log), "en", min_count=3) == ["Is the camera good?"]
+
+
+class TestChatFromTable:
+    """Test /agent/chat serving precomputed answers"""
+
+    def setup_method(self):
+        """Ingest the corpus offline, without embeddings"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+
+    def test_table_hit_skips_rag(self):
+        """Test a stored answer is returned without answer_question"""
+        with TestClient(main.app) as client:
+            table = FAQTable()
+            table.put(ITEM_ID, "es", "¿Cómo es la cámara?", fake_answer("cámara"), rag.corpus_version())
+
+            with patch.object(main, "FAQ_TABLE", table), patch("backend.serving.answer_question") as mock_answer:
+                data = client.post("/agent/chat", json={"question": "¿como es la camara?"}).json()
+
+        mock_answer.assert_not_called()
+        assert data["answer"] == "answer to cámara"
+        assert data["faq"] == "¿Cómo es la cámara?"
+
+    def test_table_miss_falls_through(self):
+        """Test unknown questions still go through RAG"""
+        with TestClient(main.app) as client:
+            table = FAQTable()
+            table.put(ITEM_ID, "es", "¿Cómo es la cámara?", fake_answer("cámara"), "old-version")
+
+            with patch.object(main, "FAQ_TABLE", table), patch("backend.serving.answer_question") as mock_answer:
+                mock_answer.return_value = {"answer": "rag", "sources": []}
+                data = client.post("/agent/chat", json={"question": "¿Cómo es la cámara?"}).json()
+
+        assert data["answer"] == "rag"
@@ -0,0 +1,195 @@
+import pytest
+import asyncio
+import os
+import sys
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import federation
+from backend.federation import PROVIDERS, Provider, canonical_url, configured_providers, federate, merge
+from backend.limits import Overloaded
+from backend.benchmarks.stubs import StubServer
+
+
+ML = PROVIDERS["mercadolibre"]
+AMAZON = PROVIDERS["amazon"]
+
+
+def hit(url, score, title="t"):
+    return {"title": title, "url": url, "content": "", "score": score}
+
+
+def fake_fetch(delays, results=None, failures=()):
+    """Fetch answering after `delays[name]` seconds; records cancellations"""
+    cancelled = []
+
+    async def fetch(provider, query):
+        try:
+            await asyncio.sleep(delays[provider.name])
+        except asyncio.CancelledError:
+            cancelled.append(provider.name)
+            raise
+        if provider.name in failures:
+            return None
+        return (results or {}).get(provider.name, [hit(f"https://{provider.name}.example/{query}", 0.5)])
+
+    fetch.cancelled = cancelled
+    return fetch
+
+
+class TestMerge:
+    """Test canonical URLs and score merging"""
+
+    def test_canonical_url(self):
+        """Test URLs of the same page share one key"""
+        assert canonical_url("https://www.amazon.com/Galaxy-A55/dp/B0CX123456/ref=sr_1_1?th=1&psc=1") == \
+            canonical_url("http://amazon.com/dp/B0CX123456")
+        assert canonical_url("https://articulo.mercadolibre.com.ar/MLA-123-galaxy-_JM#position=1&type=item") == \
+            canonical_url("https://articulo.mercadolibre.com.ar/MLA-123-galaxy-_JM/?utm_source=x")
+        assert canonical_url("https://example.com/p?id=1") != canonical_url("https://example.com/p?id=2")
+
+    def test_duplicates_merged(self):
+        """Test a page found twice is returned once, with both sources"""
+        results = merge([
+            (ML, [hit("https://a.com/1", 0.6, "first"), hit("https://a.com/2", 0.7)]),
+            (AMAZON, [hit("https://www.a.com/1/", 0.5, "second")]),
+        ])
+
+        assert [r["url"] for r in results] == ["https://a.com/2", "https://a.com/1"]
+        assert results[1]["score"] == pytest.approx(0.6)
+        assert results[1]["sources"] == ["mercadolibre", "amazon"]
+        assert results[1]["title"] == "first"
+
+    def test_best_provider_hit_kept(self):
+        """Test a page found by three providers ranks by its best single score"""
+        third = Provider("third", "{query}")
+        results = merge([
+            (ML, [hit("https://a.com/1", 0.5, "ml")]),
+            (AMAZON, [hit("https://a.com/1", 0.5, "amazon")]),
+            (third, [hit("https://a.com/1", 0.7, "third"), hit("https://b.com/1", 0.72)]),
+        ])
+
+        assert [r["url"] for r in results] == ["https://b.com/1", "https://a.com/1"]
+        assert results[1]["score"] == pytest.approx(0.7)
+        assert results[1]["title"] == "third"
+        assert results[1]["sources"] == ["mercadolibre", "amazon", "third"]
+
+    def test_agreement_breaks_ties(self):
+        """Test a page found by more providers wins an equal score"""
+        results = merge([
+            (ML, [hit("https://a.com/1", 0.6), hit("https://b.com/1", 0.6)]),
+            (AMAZON, [hit("https://b.com/1", 0.4)]),
+        ])
+
+        assert [r["url"] for r in results] == ["https://b.com/1", "https://a.com/1"]
+
+    def test_weights_and_limit(self):
+        """Test provider weights scale scores and results are capped"""
+        light = Provider("light", "{query}", weight=0.5)
+        results = merge([(light, [hit("https://a.com/1", 0.9)]), (ML, [hit("https://b.com/1", 0.6)])], max_results=1)
+
+        assert [r["url"] for r in results] == ["https://b.com/1"]
+
+
+class TestConfiguredProviders:
+    """Test SEARCH_PROVIDERS parsing"""
+
+    def test_mercadolibre_by_default(self, monkeypatch):
+        """Test other marketplaces are opt-in"""
+        monkeypatch.delenv("SEARCH_PROVIDERS", raising=False)
+
+        assert configured_providers() == [ML]
+
+
+class TestFederate:
+    """Test quorum, deadline and failure handling"""
+
+    def test_all_providers_answer(self):
+        """Test results from every provider are merged"""
+        fetch = fake_fetch({"mercadolibre": 0.01, "amazon": 0.02})
+
+        results, status = asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=0, deadline_s=1))
+
+        assert status == {"mercadolibre": "ok", "amazon": "ok"}
+        assert {r["sources"][0] for r in results} == {"mercadolibre", "amazon"}
+
+    def test_quorum_returns_early(self):
+        """Test the slow provider is cancelled once the quorum is met"""
+        fetch = fake_fetch({"mercadolibre": 0.01, "amazon": 5})
+
+        start = time.perf_counter()
+        results, status = asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=1, deadline_s=10))
+
+        assert time.perf_counter() - start < 1
+        assert status == {"mercadolibre": "ok", "amazon": "late"}
+        assert fetch.cancelled == ["amazon"]
+        assert len(results) == 1
+
+    def test_deadline_bounds_latency(self):
+        """Test the deadline cuts off a slow provider once another has answered"""
+        fetch = fake_fetch({"mercadolibre": 0.01, "amazon": 5})
+
+        start = time.perf_counter()
+        _, status = asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=0, deadline_s=0.1))
+
+        assert 0.1 <= time.perf_counter() - start < 1
+        assert status["amazon"] == "late"
+
+    def test_waits_past_deadline_for_first_answer(self):
+        """Test the deadline never turns a slow search into an empty one"""
+        fetch = fake_fetch({"mercadolibre": 0.2, "amazon": 5})
+
+        results, status = asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=0, deadline_s=0.05))
+
+        assert status == {"mercadolibre": "ok", "amazon": "late"}
+        assert len(results) == 1
+
+    def test_failed_provider_skipped(self):
+        """Test a failed provider neither blocks nor empties the response"""
+        fetch = fake_fetch({"mercadolibre": 0.01, "amazon": 0.01}, failures={"mercadolibre"})
+
+        results, status = asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=0, deadline_s=1))
+
+        assert status == {"mercadolibre": "error", "amazon": "ok"}
+        assert results[0]["sources"] == ["amazon"]
+
+    def test_all_rejected_raises(self):
+        """Test Overloaded surfaces when every provider was shed"""
+        async def fetch(provider, query):
+            raise Overloaded("tavily", 1.0)
+
+        with pytest.raises(Overloaded):
+            asyncio.run(federate("a55", [ML, AMAZON], fetch, quorum=0, deadline_s=1))
+
+
+class TestSearchEndpoint:
+    """Test /search against the stub Tavily"""
+
+    def test_requires_api_key(self, monkeypatch):
+        """Test nothing is sent upstream without TAVILY_API_KEY"""
+        monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+        with StubServer() as stub, patch.object(federation, "TAVILY_API_URL", f"{stub.url}/search"):
+            with pytest.raises(federation.SearchNotConfigured):
+                asyncio.run(federation.search("galaxy a55"))
+            assert stub.requests.get("tavily", 0) == 0
+
+    def test_providers_deduplicated(self, monkeypatch):
+        """Test both providers are queried and their shared hits returned once"""
+        from backend import main
+
+        monkeypatch.setenv("SEARCH_PROVIDERS", "mercadolibre,amazon")
+        monkeypatch.setenv("TAVILY_API_KEY", "tvly-stub")
+        with StubServer() as stub, patch.object(federation, "TAVILY_API_URL", f"{stub.url}/search"), \
+                TestClient(main.app) as client:
+            response = client.post("/search", json={"query": "galaxy a55"})
+            tavily_calls = stub.requests["tavily"]
+
+        results = response.json()["results"]
+        assert tavily_calls == 2
+        assert len(results) == 7
+        assert all(r["sources"] == ["mercadolibre", "amazon"] for r in results)
+        assert results[0]["score"] >= results[-1]["score"]
@@ -0,0 +1,114 @@
+import pytest
+import os
+import sys
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.intents import classify_intent, answer_from_item, FAST_PATH_MIN_CONFIDENCE
+from backend.main import SAMPLE_ITEM
+
+
+class TestIntentClassifier:
+    """Test intent classification for factual questions"""
+    
+    @pytest.mark.parametrize("question,intent", [
+        ("¿Cuánto cuesta?", "price"),
+        ("¿Cuál es el precio?", "price"),
+        ("How much is it?", "price"),
+        ("¿Hay stock?", "stock"),
+        ("¿Cuántos GB tiene?", "storage"),
+        ("¿Quién lo vende?", "seller"),
+        ("¿Tiene cuotas sin interés?", "installments"),
+        ("Quanto custa?", "price"),
+    ])
+    def test_confident_intents(self, question, intent):
+        """Test that simple lookups are classified with high confidence"""
+        detected, confidence = classify_intent(question)
+        
+        assert detected == intent
+        assert confidence >= FAST_PATH_MIN_CONFIDENCE
+    
+    def test_no_intent(self):
+        """Test that open questions have no intent"""
+        assert classify_intent("¿Cómo es la cámara?") == (None, 0.0)
+        assert classify_intent("") == (None, 0.0)
+    
+    def test_ambiguous_questions_lower_confidence(self):
+        """Test that mixed or comparative questions are not confident"""
+        _, mixed = classify_intent("¿Cuánto cuesta en cuotas?")
+        _, comparison = classify_intent("¿Es mejor que el S24 en precio?")
+        
+        assert mixed < FAST_PATH_MIN_CONFIDENCE
+        assert comparison < FAST_PATH_MIN_CONFIDENCE
+    
+    @pytest.mark.parametrize("question", [
+        "¿Está disponible en color negro?",
+        "¿Es compatible con memoria microSD?",
+        "¿La tienda hace envíos?",
+        "Does the store offer warranty?",
+        "¿El precio incluye envío?",
+        "How much does shipping cost?",
+        "¿Tiene buena cámara para el precio?",
+    ])
+    def test_keyword_with_other_subject_not_confident(self, question):
+        """Test a lookup keyword alongside a qualifier or another subject is not confident"""
+        _, confidence = classify_intent(question)
+        
+        assert confidence < FAST_PATH_MIN_CONFIDENCE
+        assert answer_from_item(SAMPLE_ITEM, question) is None
+    
+    def test_how_much_anchored(self):
+        """Test "how much" only means the price at the start of the question"""
+        assert classify_intent("How much does it cost?") == ("price", 1.0)
+        assert classify_intent("Tell me how much is it") == (None, 0.0)
+
+
+class TestTemplatedAnswers:
+    """Test answers rendered from the item fields"""
+    
+    def test_price_answer(self):
+        """Test price answer formatting"""
+        result = answer_from_item(SAMPLE_ITEM, "¿Cuánto cuesta?")
+        
+        assert result["intent"] == "price"
+        assert "972.000" in result["answer"]
+        assert "ARS" in result["answer"]
+        assert result["sources"][0]["section"] == "Precio"
+    
+    def test_storage_answer_from_title(self):
+        """Test storage parsed from the title"""
+        result = answer_from_item(SAMPLE_ITEM, "¿Cuántos GB tiene?")
+        
+        assert "256 GB" in result["answer"]
+        assert "8 GB de RAM" in result["answer"]
+    
+    def test_seller_and_stock_answers(self):
+        """Test seller and stock answers"""
+        seller = answer_from_item(SAMPLE_ITEM, "¿Quién vende?")
+        stock = answer_from_item(SAMPLE_ITEM, "¿Hay stock?")
+        
+        assert SAMPLE_ITEM.seller.name in seller["answer"]
+        assert str(SAMPLE_ITEM.stock) in stock["answer"]
+    
+    def test_installments_answer(self):
+        """Test installments list all payment methods"""
+        result = answer_from_item(SAMPLE_ITEM, "¿Tiene cuotas sin interés?")
+        
+        for method in SAMPLE_ITEM.payment_methods:
+            assert method.description in result["answer"]
+    
+    def test_language_templates(self):
+        """Test answers in other languages"""
+        result = answer_from_item(SAMPLE_ITEM, "How much is it?", language="en")
+        
+        assert result["answer"] == "The price is $ 972,000 ARS."
+    
+    def test_falls_through_without_confident_match(self):
+        """Test that open questions fall through to RAG"""
+        assert answer_from_item(SAMPLE_ITEM, "¿Cómo es la cámara?") is None
+        assert answer_from_item(SAMPLE_ITEM, "¿Es mejor que el S24 en precio?") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
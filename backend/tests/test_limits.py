@@ -0,0 +1,224 @@
+import pytest
+import asyncio
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import limits
+from backend.limits import AsyncLimiter, Limiter, Overloaded, TokenBucket, key_slot, upstream_slot
+
+
+@pytest.fixture(autouse=True)
+def fresh_limits(monkeypatch):
+    """Rebuild limiters from the environment around each test"""
+    yield monkeypatch
+    monkeypatch.undo()
+    limits.reset_limits()
+
+
+def hold(limiter, started, release):
+    with limiter.slot():
+        started.set()
+        release.wait(5)
+
+
+class TestTokenBucket:
+    """Test rate budgets"""
+
+    def test_paces_then_rejects(self):
+        """Test short waits are returned and long ones rejected"""
+        bucket = TokenBucket("openai_rpm", per_minute=60)  # one per second
+
+        assert bucket.reserve(60, max_wait=1) == 0.0
+        assert 0.9 < bucket.reserve(1, max_wait=1) <= 1.0
+        with pytest.raises(Overloaded) as exc:
+            bucket.reserve(1, max_wait=1)
+        assert exc.value.retry_after > 1
+        assert exc.value.retry_after_header == "2"
+
+    def test_rejection_takes_nothing(self):
+        """Test a rejected reservation leaves the budget untouched"""
+        bucket = TokenBucket("openai_tpm", per_minute=600)
+        bucket.reserve(600, max_wait=0)
+        with pytest.raises(Overloaded):
+            bucket.reserve(300, max_wait=1)
+
+        assert bucket.reserve(5, max_wait=1) <= 0.6
+
+    def test_background_waits_for_budget(self):
+        """Test max_wait=None never rejects, even above capacity"""
+        bucket = TokenBucket("openai_tpm", per_minute=600)
+
+        assert bucket.reserve(10_000, max_wait=None) == 0.0
+        assert bucket.reserve(600, max_wait=None) == pytest.approx(60, abs=0.1)
+
+
+class TestLimiter:
+    """Test concurrency limits with a bounded queue"""
+
+    def test_queue_full_rejects(self):
+        """Test callers beyond max_concurrent + max_queue are turned away"""
+        limiter = Limiter("openai", max_concurrent=1, max_queue=1, timeout=5)
+        started, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=hold, args=(limiter, started, release))
+        holder.start()
+        started.wait(5)
+        queued = threading.Thread(target=hold, args=(limiter, threading.Event(), release))
+        queued.start()
+        while limiter.waiting < 1:
+            time.sleep(0.001)
+
+        with pytest.raises(Overloaded) as exc:
+            with limiter.slot():
+                pass
+        release.set()
+        holder.join()
+        queued.join()
+
+        assert exc.value.limit == "openai"
+        assert limiter.in_flight == 0 and limiter.waiting == 0
+
+    def test_queue_timeout_rejects(self):
+        """Test a queued caller gives up after the timeout"""
+        limiter = Limiter("openai", max_concurrent=1, max_queue=4, timeout=0.05)
+        started, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=hold, args=(limiter, started, release))
+        holder.start()
+        started.wait(5)
+
+        with pytest.raises(Overloaded):
+            with limiter.slot():
+                pass
+        release.set()
+        holder.join()
+
+        with limiter.slot():
+            assert limiter.in_flight == 1
+
+    def test_async_limiter_hands_over_slots(self):
+        """Test queued coroutines run once slots free up, in order"""
+        limiter = AsyncLimiter("tavily", max_concurrent=2, max_queue=2, timeout=5)
+        order = []
+
+        async def call(i):
+            async with limiter.slot():
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            results = await asyncio.gather(*(call(i) for i in range(5)), return_exceptions=True)
+            return [type(r) for r in results]
+
+        outcomes = asyncio.run(run())
+
+        assert outcomes.count(Overloaded) == 1
+        assert order == [0, 1, 2, 3]
+        assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+class TestUpstreamSlots:
+    """Test per-upstream and per-key admission"""
+
+    def test_rate_limits_are_per_key(self, fresh_limits):
+        """Test one key's RPM budget doesn't throttle another key"""
+        fresh_limits.setenv("OPENAI_RPM", "1")
+        fresh_limits.setenv("LIMIT_MAX_WAIT_S", "0.5")
+        limits.reset_limits()
+
+        with upstream_slot("openai", "sk-a"):
+            pass
+        with pytest.raises(Overloaded):
+            with upstream_slot("openai", "sk-a"):
+                pass
+        with upstream_slot("openai", "sk-b"):
+            pass
+
+    def test_key_slot_isolated_and_cleaned_up(self, fresh_limits):
+        """Test a busy key is rejected while other keys are admitted"""
+        fresh_limits.setenv("USER_KEY_MAX_CONCURRENCY", "1")
+        fresh_limits.setenv("USER_KEY_MAX_QUEUE", "0")
+        limits.reset_limits()
+
+        with key_slot("sk-a"):
+            with pytest.raises(Overloaded):
+                with key_slot("sk-a"):
+                    pass
+            with key_slot("sk-b"):
+                pass
+        assert limits._KEY_LIMITERS == {}
+
+    def test_idle_key_buckets_dropped(self, fresh_limits):
+        """Test buckets of keys that stopped calling don't accumulate"""
+        fresh_limits.setenv("OPENAI_RPM", "60")
+        fresh_limits.setenv("LIMIT_BUCKET_SWEEP_S", "0")
+        limits.reset_limits()
+        now = time.monotonic()
+
+        with patch.object(limits.time, "monotonic", return_value=now):
+            for i in range(10):
+                with upstream_slot("openai", f"sk-{i}"):
+                    pass
+        assert len(limits._BUCKETS) == 10
+
+        # One second later each key has its one request back
+        with patch.object(limits.time, "monotonic", return_value=now + 1.5):
+            with upstream_slot("openai", "sk-new"):
+                pass
+        assert list(limits._BUCKETS) == [("openai", limits.hash_key("sk-new"), "RPM")]
+
+    def test_busy_key_bucket_kept(self, fresh_limits):
+        """Test a bucket still refilling survives the sweep"""
+        fresh_limits.setenv("OPENAI_RPM", "1")
+        fresh_limits.setenv("LIMIT_BUCKET_SWEEP_S", "0")
+        limits.reset_limits()
+
+        with upstream_slot("openai", "sk-a"):
+            pass
+        with upstream_slot("openai", "sk-b"):
+            pass
+
+        assert len(limits._BUCKETS) == 2
+        with pytest.raises(Overloaded):
+            with upstream_slot("openai", "sk-a"):
+                pass
+
+
+class TestAdmissionEndpoints:
+    """Test rejected requests become 429 with Retry-After"""
+
+    def setup_method(self):
+        """Keep chat offline"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+
+    def test_chat_rejected(self):
+        """Test an Overloaded upstream maps to 429"""
+        from backend.main import app
+
+        with TestClient(app) as client, patch("backend.serving.answer_question", side_effect=Overloaded("openai", 2.3)):
+            response = client.post("/agent/chat", json={"question": "¿Cómo es la cámara?"})
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "3"
+        assert response.json()["limit"] == "openai"
+
+    def test_search_rejected(self, fresh_limits):
+        """Test a full Tavily queue is not swallowed as an empty result"""
+        from backend.main import app
+
+        fresh_limits.setenv("TAVILY_API_KEY", "tvly-test")
+        fresh_limits.setenv("TAVILY_MAX_CONCURRENCY", "0")
+        fresh_limits.setenv("TAVILY_MAX_QUEUE", "0")
+        limits.reset_limits()
+
+        with TestClient(app) as client:
+            response = client.post("/search", json={"query": "galaxy a55"})
+
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
@@ -0,0 +1,99 @@
+import pytest
+import os
+import sys
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import metrics
+from backend.metrics import Counter, Histogram, server_timing, timed
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+
+
+class TestPrometheusFormat:
+    """Test the text exposition of counters and histograms"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that each observation counts in every bucket at or above it"""
+        hist = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        hist.observe(0.05, stage="llm")
+        hist.observe(0.5, stage="llm")
+
+        text = "\n".join(hist.render())
+
+        assert 'latency_seconds_bucket{stage="llm",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{stage="llm",le="1"} 2' in text
+        assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 2' in text
+        assert 'latency_seconds_count{stage="llm"} 2' in text
+        assert "# TYPE latency_seconds histogram" in text
+
+    def test_counter_labels(self):
+        """Test counters keep one series per label set"""
+        counter = Counter("events_total", "Events", ("event",))
+        counter.inc(event="hit")
+        counter.inc(event="hit")
+        counter.inc(3, event="miss")
+
+        assert counter.value(event="hit") == 2
+        assert 'events_total{event="miss"} 3' in "\n".join(counter.render())
+
+
+class TestServerTiming:
+    """Test the Server-Timing header value"""
+
+    def test_repeated_stages_are_summed(self):
+        """Test that a stage timed twice in a request appears once"""
+        value = server_timing([("embed", 0.002), ("llm", 0.5), ("embed", 0.001)], 0.6)
+
+        assert value == "embed;dur=3.00, llm;dur=500.00, total;dur=600.00"
+
+    def test_timed_outside_request_only_records_histogram(self):
+        """Test timing works without a request in flight"""
+        with timed("answer", "retrieve"):
+            pass
+
+        assert metrics.STAGE_SECONDS.count(operation="answer", stage="retrieve") == 1
+
+
+class TestMetricsEndpoint:
+    """Test /metrics and the Server-Timing header on the API"""
+
+    def setup_method(self):
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        os.environ["RAG_EMBEDDINGS"] = "local"
+
+    def teardown_method(self):
+        os.environ.pop("RAG_EMBEDDINGS", None)
+
+    def test_chat_reports_stages(self):
+        """Test that a RAG chat answer exposes its stage breakdown"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            response = client.post("/agent/chat", json={"question": "¿Cómo es la cámara?"})
+            body = client.get("/metrics").text
+
+        timing = response.headers["server-timing"]
+        for stage in ("intent", "embed", "retrieve", "pack", "total"):
+            assert f"{stage};dur=" in timing
+        assert 'app_stage_duration_seconds_count{operation="answer",stage="retrieve"} 1' in body
+        assert 'app_events_total{operation="answer",event="extractive_no_llm"} 1' in body
+        assert 'app_request_duration_seconds_count{method="POST",route="/agent/chat",status="200"} 1' in body
+
+    def test_fast_path_counted(self):
+        """Test that template answers are counted and skip the RAG stages"""
+        from backend.main import app
+
+        client = TestClient(app)
+        response = client.post("/agent/chat", json={"question": "¿Cuánto cuesta?"})
+
+        assert "embed;dur=" not in response.headers["server-timing"]
+        assert metrics.EVENTS.value(operation="chat", event="fast_path") == 1
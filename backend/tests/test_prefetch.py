@@ -0,0 +1,110 @@
+import pytest
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag
+from backend.querycache import QueryCache
+
+
+class TestQueryCache:
+    """Test the LRU with single-flight computation"""
+
+    def test_lru_eviction(self):
+        """Test the least recently used key is evicted first"""
+        cache = QueryCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+
+    def test_single_flight(self):
+        """Test concurrent misses on one key compute once"""
+        cache = QueryCache()
+        calls = []
+        started = threading.Event()
+
+        def slow():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return "vector"
+
+        results = []
+        owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("q", slow)))
+        owner.start()
+        started.wait(5)
+        results.append(cache.get_or_compute("q", slow))
+        owner.join()
+
+        assert len(calls) == 1
+        assert sorted(hit for _, hit in results) == [False, True]
+
+    def test_failed_compute_is_retried(self):
+        """Test a failure isn't cached"""
+        cache = QueryCache()
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("q", lambda: (_ for _ in ()).throw(RuntimeError("upstream")))
+
+        assert cache.get_or_compute("q", lambda: "ok") == ("ok", False)
+
+
+class TestPrefetchEndpoint:
+    """Test /agent/prefetch warms what /agent/chat needs"""
+
+    def setup_method(self):
+        """Local embeddings, no LLM"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        os.environ["RAG_EMBEDDINGS"] = "local"
+
+    def teardown_method(self):
+        os.environ.pop("RAG_EMBEDDINGS", None)
+
+    def test_chat_reuses_prefetch(self):
+        """Test the submitted question skips embedding and retrieval"""
+        from backend.main import app
+
+        question = "¿Qué dicen de la cámara de noche?"
+        with TestClient(app) as client:
+            with patch.object(rag.HashingEmbeddings, "embed_query", autospec=True,
+                              side_effect=rag.HashingEmbeddings.embed_query) as embed_query:
+                first = client.post("/agent/prefetch", json={"question": question}).json()
+                again = client.post("/agent/prefetch", json={"question": question + "  "}).json()
+                response = client.post("/agent/chat", json={"question": question})
+
+        assert first == {"status": "warmed"}
+        assert again == {"status": "cached"}
+        assert embed_query.call_count == 1
+        assert response.status_code == 200
+        assert "embed" not in response.headers["server-timing"]
+
+    def test_skips_what_needs_no_retrieval(self):
+        """Test short input and fast-path questions aren't embedded"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            short = client.post("/agent/prefetch", json={"question": "cám"}).json()
+            fast = client.post("/agent/prefetch", json={"question": "¿Cuánto cuesta?"}).json()
+
+        assert short == {"status": "skipped"}
+        assert fast == {"status": "skipped"}
+
+    def test_index_change_clears_cache(self):
+        """Test cached retrievals never outlive the index they came from"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            client.post("/agent/prefetch", json={"question": "¿Qué dicen de la batería?"})
+            assert len(rag._RETRIEVALS) == 1
+            rag.ingest_corpus([{"id": "x", "section": "Batería", "text": "Dura dos días."}])
+            assert len(rag._RETRIEVALS) == 0
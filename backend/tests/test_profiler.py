@@ -0,0 +1,104 @@
+import pytest
+import os
+import sys
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import profiler
+from backend.profiler import SamplingProfiler
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+
+class TestSamplingProfiler:
+    """Test stack sampling and the collapsed output"""
+
+    @pytest.mark.parametrize("mode", ["signal", "thread"])
+    def test_samples_hot_function(self, mode):
+        """Test that the busy function dominates the samples"""
+        sampler = SamplingProfiler(interval=0.002, mode=mode).start()
+        busy_loop(0.3)
+        samples = sampler.stop()
+
+        assert sampler.sample_count > 0
+        hot = sum(count for stack, count in samples.items() if "busy_loop" in stack)
+        assert hot / sum(samples.values()) > 0.5
+        assert not any("_handle_signal" in stack for stack in samples)
+
+    def test_collapsed_format(self):
+        """Test 'frame;frame count' lines, root first, hottest first"""
+        sampler = SamplingProfiler(interval=0.002, mode="thread").start()
+        busy_loop(0.1)
+        sampler.stop()
+
+        lines = sampler.collapsed().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        assert stack.startswith("MainThread;")
+        assert stack.endswith("test_profiler.py:busy_loop")
+        assert int(count) >= int(lines[-1].rsplit(" ", 1)[1])
+
+    def test_one_profile_at_a_time(self):
+        """Test that a second concurrent profile is refused"""
+        profiler.start_profiling(mode="thread")
+        try:
+            with pytest.raises(RuntimeError):
+                profiler.start_profiling(mode="thread")
+        finally:
+            profiler.stop_profiling()
+
+    def test_env_switch_writes_file(self, tmp_path):
+        """Test PROFILE_SECONDS/PROFILE_OUTPUT"""
+        output = tmp_path / "startup.collapsed"
+        env = {"PROFILE_SECONDS": "0.2", "PROFILE_INTERVAL_MS": "2", "PROFILE_OUTPUT": str(output)}
+        with patch.dict(os.environ, env):
+            timer = profiler.profile_from_env()
+        busy_loop(0.3)
+        timer.join(timeout=5)
+
+        assert "busy_loop" in output.read_text()
+
+    def test_env_switch_off_by_default(self):
+        """Test that nothing is profiled without PROFILE_SECONDS"""
+        with patch.dict(os.environ, {"PROFILE_SECONDS": ""}):
+            assert profiler.profile_from_env() is None
+
+
+class TestProfileEndpoint:
+    """Test the /admin/profile endpoint"""
+
+    def test_disabled_without_token(self):
+        """Test the endpoint is hidden unless ADMIN_TOKEN is configured"""
+        from backend.main import app
+
+        client = TestClient(app)
+        with patch.dict(os.environ, {"ADMIN_TOKEN": ""}):
+            assert client.post("/admin/profile?seconds=0.1").status_code == 404
+        with patch.dict(os.environ, {"ADMIN_TOKEN": "s3cret"}):
+            response = client.post("/admin/profile?seconds=0.1", headers={"X-Admin-Token": "wrong"})
+            assert response.status_code == 404
+
+    def test_returns_collapsed_stacks(self):
+        """Test a short profile with the right token"""
+        from backend.main import app
+
+        client = TestClient(app)
+        with patch.dict(os.environ, {"ADMIN_TOKEN": "s3cret"}):
+            response = client.post(
+                "/admin/profile?seconds=0.2&interval_ms=2&include_idle=true",
+                headers={"X-Admin-Token": "s3cret"},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-disposition"].startswith("attachment;")
+        assert int(response.headers["x-profile-samples"]) > 0
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.quantization import (
+    normalize, truncate, quantize, dequantize, approximate_scores, top_indices, spill_to_disk, resident_bytes,
+)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return normalize(rng.standard_normal((200, 64)))
+
+
+class TestQuantize:
+    """Test compact vector encodings"""
+    
+    def test_int8_round_trip(self, vectors):
+        """Test that int8 codes with per-vector scales reconstruct closely"""
+        codes, scales = quantize(vectors, "int8")
+        
+        assert codes.dtype == np.int8
+        assert scales.shape == (200,)
+        assert np.abs(dequantize(codes, scales) - vectors).max() < 0.01
+    
+    def test_float16_has_no_scales(self, vectors):
+        """Test float16 storage"""
+        codes, scales = quantize(vectors, "float16")
+        
+        assert codes.dtype == np.float16
+        assert scales is None
+    
+    def test_memory_reduction(self, vectors):
+        """Test that compact modes use 2x/~4x less memory than float32"""
+        int8 = resident_bytes(*quantize(vectors, "int8"))
+        float16 = resident_bytes(*quantize(vectors, "float16"))
+        
+        assert float16 * 2 == vectors.nbytes
+        assert int8 * 3 < vectors.nbytes
+    
+    def test_truncate_renormalizes(self, vectors):
+        """Test that the Matryoshka prefix is re-normalized"""
+        short = truncate(vectors, 16)
+        
+        assert short.shape == (200, 16)
+        assert np.allclose(np.linalg.norm(short, axis=1), 1.0, atol=1e-5)
+        assert np.allclose(truncate(vectors[0], 16), short[0])
+    
+    def test_unknown_mode(self, vectors):
+        """Test that an unknown storage mode is rejected"""
+        with pytest.raises(ValueError):
+            quantize(vectors, "int4")
+
+
+class TestScoring:
+    """Test approximate scoring and top-k selection"""
+    
+    def test_approximate_scores_close_to_exact(self, vectors):
+        """Test that compact scores track the exact dot products"""
+        query = vectors[3]
+        codes, scales = quantize(vectors, "int8")
+        
+        approx = approximate_scores(codes, scales, query)
+        assert np.allclose(approx, vectors @ query, atol=0.02)
+        assert top_indices(approx, 1)[0] == 3
+    
+    def test_top_indices_sorted_best_first(self):
+        """Test top-k ordering and k larger than the corpus"""
+        scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+        
+        assert list(top_indices(scores, 2)) == [1, 3]
+        assert list(top_indices(scores, 10)) == [1, 3, 2, 0]
+    
+    def test_spill_to_disk_is_not_resident(self, vectors):
+        """Test that spilled vectors are memory-mapped and readable"""
+        mapped = spill_to_disk(vectors)
+        
+        assert isinstance(mapped, np.memmap)
+        assert resident_bytes(mapped) == 0
+        assert np.array_equal(np.asarray(mapped[[5, 7]]), vectors[[5, 7]])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,166 @@
+import pytest
+import json
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import querylog
+from backend.querylog import QueryLog, read_query_log, set_query_log
+from backend.benchmarks.replay import parse_server_timing, to_request
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from backend.querylog import QueryLog
+log = QueryLog({path!r}, max_bytes=2000, backups=100)
+for i in range(200):
+    log.write({{"worker": {worker}, "i": i, "padding": "x" * 20}})
+log.close()
+"""
+
+
+@pytest.fixture
+def query_log(tmp_path):
+    """Route the app's query log to a temporary file"""
+    log = QueryLog(str(tmp_path / "query.jsonl"))
+    previous = set_query_log(log)
+    yield log
+    set_query_log(previous)
+    log.close()
+
+
+class TestQueryLog:
+    """Test the append-only JSONL writer"""
+
+    def test_rotation(self, tmp_path):
+        """Test files rotate by size and only `backups` files are kept"""
+        path = str(tmp_path / "query.jsonl")
+        log = QueryLog(path, max_bytes=200, backups=2)
+        for i in range(20):
+            log.write({"i": i, "padding": "x" * 40})
+        log.close()
+
+        assert os.path.getsize(path) <= 200
+        assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+        assert not os.path.exists(path + ".3")
+
+        records = [r["i"] for r in read_query_log(path)]
+        assert records == sorted(records)
+        assert records[-1] == 19
+
+    def test_shared_path_rotated_once(self, tmp_path):
+        """Test a worker reopens the file another worker already rotated"""
+        path = str(tmp_path / "query.jsonl")
+        first = QueryLog(path, max_bytes=200, backups=10)
+        second = QueryLog(path, max_bytes=200, backups=10)
+        for i in range(20):
+            (first if i % 2 else second).write({"i": i, "padding": "x" * 40})
+        first.close()
+        second.close()
+
+        names = [path] + [f"{path}.{n}" for n in range(1, 11) if os.path.exists(f"{path}.{n}")]
+        assert all(os.path.getsize(name) <= 200 for name in names)
+        assert [r["i"] for r in read_query_log(path)] == list(range(20))
+
+    def test_concurrent_workers(self, tmp_path):
+        """Test processes sharing a path lose no records and keep files bounded"""
+        path = str(tmp_path / "query.jsonl")
+        workers = [
+            subprocess.Popen([sys.executable, "-c", WORKER.format(root=ROOT_DIR, path=path, worker=w)])
+            for w in range(3)
+        ]
+        assert [w.wait(timeout=60) for w in workers] == [0, 0, 0]
+
+        records = list(read_query_log(path))
+        assert sorted((r["worker"], r["i"]) for r in records) == [(w, i) for w in range(3) for i in range(200)]
+        for w in range(3):
+            assert [r["i"] for r in records if r["worker"] == w] == list(range(200))
+        assert all(os.path.getsize(os.path.join(tmp_path, n)) <= 2000 for n in os.listdir(tmp_path) if n != "query.jsonl.lock")
+
+    def test_read_skips_bad_lines(self, tmp_path):
+        """Test partial or corrupt lines don't stop a read"""
+        path = tmp_path / "query.jsonl"
+        path.write_text('{"a": 1}\n{"trunc\n{"a": 2}\n')
+
+        assert [r["a"] for r in read_query_log(str(path))] == [1, 2]
+
+    def test_disabled_is_noop(self):
+        """Test log_query does nothing without a configured log"""
+        previous = set_query_log(None)
+        try:
+            querylog.log_query("chat", 0.0, question="x")
+        finally:
+            set_query_log(previous)
+
+
+class TestEndpointLogging:
+    """Test records written by /agent/chat and /search"""
+
+    def setup_method(self):
+        """Keep chat offline"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+
+    def test_chat_record(self, query_log):
+        """Test question, outcome, stages and events are captured"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            client.post("/agent/chat", json={"question": "¿Cuánto cuesta?"})
+            client.post("/agent/chat", json={"question": "¿Cómo es la cámara?"})
+
+        fast, rag = list(read_query_log(query_log.path))
+        assert fast["endpoint"] == "chat"
+        assert fast["question"] == "¿Cuánto cuesta?"
+        assert fast["outcome"] == "fast_path"
+        assert "chat:fast_path" in fast["events"]
+        assert "intent" in fast["stages"]
+        assert rag["outcome"] == "rag"
+        assert rag["ts"] >= fast["ts"]
+        assert rag["latency_ms"] > 0
+
+    def test_no_key_logged(self, query_log):
+        """Test that user API keys never reach the log"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            client.post("/agent/chat", json={"question": "¿Cuánto cuesta?", "openai_key": "sk-secret"})
+
+        with open(query_log.path) as fh:
+            line = fh.read()
+        assert "sk-secret" not in line
+        assert json.loads(line)["own_key"] is True
+
+
+class TestReplayHelpers:
+    """Test the replay tool's record handling"""
+
+    def test_to_request(self):
+        """Test logged records map back to requests"""
+        assert to_request({"endpoint": "chat", "question": "hola"}) == ("/agent/chat", {"question": "hola", "language": "es"})
+        assert to_request({"endpoint": "search", "query": "a55"}) == ("/search", {"query": "a55"})
+        assert to_request({"endpoint": "chat"}) is None
+
+    def test_logged_language_replayed(self, query_log):
+        """Test an English question is replayed in English, with the same outcome"""
+        from backend.main import app
+
+        with TestClient(app) as client:
+            logged = client.post("/agent/chat", json={"question": "How much is it?", "language": "en"}).json()
+            record, = read_query_log(query_log.path)
+            path, body = to_request(record)
+            replayed = client.post(path, json=body).json()
+
+        assert body == {"question": "How much is it?", "language": "en"}
+        assert replayed == logged
+        assert replayed["answer"].startswith("The price is")
+
+    def test_parse_server_timing(self):
+        """Test the Server-Timing header round-trips into stages"""
+        assert parse_server_timing("embed;dur=8.10, llm;dur=40.00, total;dur=50.00") == {"embed": 8.1, "llm": 40.0}
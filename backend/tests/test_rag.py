@@ -3,11 +3,17 @@ import numpy as np
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import threading
+import time
 
-# Add the parent directory to the path so we can import rag
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from rag import ingest_corpus, answer_question, _ensure_embedder, _cosine_sim
+from backend import rag
+from backend.rag import ingest_corpus, answer_question, _ensure_embedder, _cosine_sim, pack_context, _estimate_tokens
+from backend.rag import prompt_prefix, build_prompt, prompt_cache_stats, _record_token_usage
+from backend.rag import OpenAIEmbeddings, ChatOpenAI, HashingEmbeddings, keyword_search, vector_search, vector_stats
+from backend.rag import index_metadata
 
 
 class TestRAGIngestion:
@@ -32,7 +38,7 @@ class TestRAGIngestion:
         # Should not raise any errors even without API key
         ingest_corpus(docs)
     
-    @patch('rag._ensure_embedder')
+    @patch('backend.rag._ensure_embedder')
     def test_ingest_corpus_with_mock_embedder(self, mock_ensure_embedder):
         """Test ingestion with mocked embedder"""
         # Mock embedder
@@ -104,8 +110,8 @@ class TestRAGAnswering:
         # The answer should contain some content from the documents
         assert len(result["answer"]) > 0
     
-    @patch('rag.ChatOpenAI')
-    @patch('rag.OpenAIEmbeddings')
+    @patch('backend.rag.ChatOpenAI')
+    @patch('backend.rag.OpenAIEmbeddings')
     def test_answer_question_with_api_key(self, mock_embeddings, mock_chat_openai):
         """Test answering with OpenAI API key"""
         # Set a fake API key
@@ -209,7 +215,7 @@ class TestRAGUtilities:
         # Should handle zero norm gracefully
         assert not np.isnan(similarity[0])
     
-    @patch('rag.OpenAIEmbeddings')
+    @patch('backend.rag.OpenAIEmbeddings')
     def test_ensure_embedder_with_api_key(self, mock_openai_embeddings):
         """Test embedder creation with API key"""
         os.environ['OPENAI_API_KEY'] = 'sk-test123'
@@ -235,11 +241,374 @@ class TestRAGUtilities:
         """Test embedder creation with invalid API key"""
         os.environ['OPENAI_API_KEY'] = 'invalid-key'
         
-        with patch('rag.OpenAIEmbeddings', side_effect=Exception("Invalid API key")):
+        with patch('backend.rag.OpenAIEmbeddings', side_effect=Exception("Invalid API key")):
             embedder = _ensure_embedder()
             assert embedder is None
 
 
+class TestContextPacking:
+    """Test token-aware context packing"""
+    
+    def test_pack_respects_budget(self):
+        """Test that packed context stays within the token budget"""
+        docs = [
+            (0.9, {"section": "Reseñas", "text": "\n\n".join(f"Opinión número {i} sobre la cámara y la batería" for i in range(20))}),
+            (0.5, {"section": "Precio", "text": "El precio es de $972.000"}),
+        ]
+        context, stats = pack_context(docs, budget_tokens=40)
+        
+        assert stats["context_tokens"] <= 40
+        assert stats["context_budget"] == 40
+        assert _estimate_tokens(context) <= 40
+        assert stats["packed_chunks"] > 0
+        assert stats["dropped_chunks"] > 0
+    
+    def test_pack_orders_by_score(self):
+        """Test that the highest-scoring chunk is packed first"""
+        docs = [
+            (0.2, {"section": "Vendedor", "text": "Samsung Official Store"}),
+            (0.9, {"section": "Batería", "text": "Batería de 5000 mAh"}),
+        ]
+        context, _ = pack_context(docs, budget_tokens=100)
+        
+        assert context.startswith("Batería: Batería de 5000 mAh")
+    
+    def test_pack_skips_duplicates(self):
+        """Test that overlapping chunks are only packed once"""
+        text = "La cámara principal es de 50MP y saca fotos excelentes"
+        docs = [
+            (0.9, {"section": "Descripción", "text": text}),
+            (0.8, {"section": "Reseñas", "text": text + "\n\nLlegó rápido"}),
+        ]
+        context, stats = pack_context(docs, budget_tokens=200)
+        
+        assert context.count("50MP") == 1
+        assert stats["duplicate_chunks"] == 1
+        assert stats["packed_chunks"] == 2
+    
+    def test_pack_truncates_oversized_first_chunk(self):
+        """Test that a single oversized chunk is truncated rather than dropped"""
+        docs = [(1.0, {"section": "Descripción", "text": "palabra " * 500})]
+        context, stats = pack_context(docs, budget_tokens=10)
+        
+        assert context
+        assert stats["packed_chunks"] == 1
+        assert stats["context_tokens"] <= 10
+
+
+class TestPromptPrefix:
+    """Test the cache-friendly prompt layout"""
+    
+    def setup_method(self):
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        self.docs = [{"id": "desc", "section": "Descripción", "text": "Batería de 5000 mAh"}]
+        ingest_corpus(self.docs, product_sheet="Producto: Galaxy A55\nPrecio: 972000 ARS")
+    
+    def test_prefix_is_stable_across_questions(self):
+        """Test that the system message is byte-identical for every question"""
+        first = build_prompt("¿Cuánto cuesta?", "Precio: 972000", "es")
+        second = build_prompt("¿Cómo es la batería?", "Batería: 5000 mAh", "es")
+        
+        assert first[0] == second[0]
+        assert first[0]["role"] == "system"
+        assert "Galaxy A55" in first[0]["content"]
+        assert "¿Cuánto cuesta?" not in first[0]["content"]
+        assert "¿Cuánto cuesta?" in first[1]["content"]
+    
+    def test_prefix_per_language_and_corpus_version(self):
+        """Test that the prefix changes with the language and the corpus"""
+        es_prefix = prompt_prefix("es")
+        
+        assert prompt_prefix("en") != es_prefix
+        assert prompt_prefix("xx") == es_prefix
+        
+        ingest_corpus(self.docs, product_sheet="Producto: Galaxy A55\nPrecio: 900000 ARS")
+        assert prompt_prefix("es") != es_prefix
+    
+    def test_localized_product_sheet(self):
+        """Test each language's prefix carries that language's product sheet"""
+        from backend.corpus import product_sheets
+        from backend.main import SAMPLE_ITEM
+
+        ingest_corpus(self.docs, product_sheet=product_sheets(SAMPLE_ITEM))
+
+        assert "Precio: 972000 ARS" in prompt_prefix("es")
+        assert "Preço: 972000 ARS" in prompt_prefix("pt")
+        assert "Price: 972000 ARS" in prompt_prefix("en")
+        assert "Precio:" not in prompt_prefix("en")
+        assert prompt_prefix("xx") == prompt_prefix("es")
+
+    def test_context_skips_text_already_in_sheet(self):
+        """Test that retrieved chunks repeating the sheet are not packed again"""
+        docs = [(0.9, {"section": "Título", "text": "Producto: Galaxy A55"})]
+        context, stats = pack_context(docs, budget_tokens=100, known_text=rag._product_sheet("es"))
+        
+        assert context == ""
+        assert stats["duplicate_chunks"] == 1
+    
+    def test_record_cached_tokens(self):
+        """Test that cached prompt tokens from the response are recorded"""
+        before = prompt_cache_stats()
+        msg = MagicMock()
+        msg.response_metadata = {
+            "token_usage": {
+                "prompt_tokens": 1200,
+                "completion_tokens": 40,
+                "prompt_tokens_details": {"cached_tokens": 1024},
+            }
+        }
+        usage = {}
+        _record_token_usage(msg, usage)
+        after = prompt_cache_stats()
+        
+        assert usage == {"prompt_tokens": 1200, "completion_tokens": 40, "cached_tokens": 1024}
+        assert after["requests"] == before["requests"] + 1
+        assert after["cached_tokens"] == before["cached_tokens"] + 1024
+        assert 0 < after["cached_ratio"] <= 1
+
+
+class TestOpenAIProviders:
+    """Test the direct openai SDK providers"""
+    
+    @patch('backend.rag.OpenAI')
+    def test_embed_documents_keeps_input_order(self, mock_openai):
+        """Test that embeddings are returned in input order"""
+        mock_client = MagicMock()
+        mock_client.embeddings.create.return_value = MagicMock(data=[
+            MagicMock(index=1, embedding=[0.0, 1.0]),
+            MagicMock(index=0, embedding=[1.0, 0.0]),
+        ])
+        mock_openai.return_value = mock_client
+        
+        embedder = OpenAIEmbeddings(api_key="sk-test123")
+        vectors = embedder.embed_documents(["first", "second"])
+        
+        assert vectors == [[1.0, 0.0], [0.0, 1.0]]
+        mock_client.embeddings.create.assert_called_once_with(
+            model="text-embedding-3-small", input=["first", "second"]
+        )
+    
+    @patch('backend.rag.OpenAI')
+    def test_chat_invoke_returns_content_and_usage(self, mock_openai):
+        """Test that chat results expose content and token usage"""
+        mock_client = MagicMock()
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(message=MagicMock(content="Respuesta"))]
+        mock_response.usage.model_dump.return_value = {"prompt_tokens": 10, "completion_tokens": 2}
+        mock_response.model = "gpt-4o-mini"
+        mock_client.chat.completions.create.return_value = mock_response
+        mock_openai.return_value = mock_client
+        
+        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key="sk-test123")
+        result = llm.invoke("Hola")
+        
+        assert result.content == "Respuesta"
+        assert result.response_metadata["token_usage"]["prompt_tokens"] == 10
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["messages"] == [{"role": "user", "content": "Hola"}]
+        assert kwargs["temperature"] == 0
+    
+    def test_embedder_is_reused_for_same_key(self):
+        """Test that the embedder client is cached while the key is unchanged"""
+        os.environ['OPENAI_API_KEY'] = 'sk-test123'
+        
+        with patch('backend.rag.OpenAI'):
+            first = _ensure_embedder()
+            second = _ensure_embedder()
+        
+        assert first is second
+
+
+class TestLocalEmbeddings:
+    """Test the local hashing embedding backend"""
+    
+    def teardown_method(self):
+        os.environ.pop('RAG_EMBEDDINGS', None)
+    
+    def test_vectors_are_normalized_and_deterministic(self):
+        """Test that vectors have unit norm and don't depend on the process"""
+        embedder = HashingEmbeddings(dim=64)
+        vectors = np.array(embedder.embed_documents(["batería de 5000 mAh", "cámara de 50MP"]))
+        
+        assert vectors.shape == (2, 64)
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+        assert embedder.embed_documents(["batería"]) == HashingEmbeddings(dim=64).embed_documents(["batería"])
+    
+    def test_similar_text_scores_higher(self):
+        """Test that n-gram overlap drives similarity, including inflections"""
+        embedder = HashingEmbeddings()
+        docs = np.array(embedder.embed_documents([
+            "La batería de 5000 mAh dura todo el día",
+            "Vendido por Samsung Official Store",
+        ]))
+        query = np.array(embedder.embed_query("¿cuánto dura la bateria?"))
+        
+        sims = _cosine_sim(docs, query)
+        assert sims[0] > sims[1]
+    
+    def test_local_backend_retrieves_without_api_key(self):
+        """Test offline retrieval when RAG_EMBEDDINGS=local"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        os.environ['RAG_EMBEDDINGS'] = 'local'
+        
+        docs = [
+            {"id": "battery", "section": "Batería", "text": "La batería tiene 5000mAh de capacidad"},
+            {"id": "seller", "section": "Vendedor", "text": "Samsung Official Store reputación Platinum"},
+        ]
+        ingest_corpus(docs)
+        
+        assert isinstance(_ensure_embedder(), HashingEmbeddings)
+        assert rag._EMBEDDINGS.shape[0] == 2
+        result = answer_question("¿Qué reputación tiene el vendedor?", top_k=1)
+        assert result["sources"][0]["section"] == "Vendedor"
+    
+    def test_keyword_search_ranks_by_overlap(self):
+        """Test the keyword fallback ranking"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        ingest_corpus([
+            {"id": "a", "section": "A", "text": "la batería dura"},
+            {"id": "b", "section": "B", "text": "la batería dura todo el día"},
+        ])
+        
+        assert keyword_search("la batería dura todo el día", top_k=2) == [(6, 1), (3, 0)]
+
+    def test_concurrent_reembed_runs_once(self):
+        """Test requests racing on a stale index re-embed it once"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        ingest_corpus([
+            {"id": "battery", "section": "Batería", "text": "La batería tiene 5000mAh de capacidad"},
+            {"id": "seller", "section": "Vendedor", "text": "Samsung Official Store reputación Platinum"},
+        ])
+        assert rag._EMBEDDINGS is None
+        os.environ["RAG_EMBEDDINGS"] = "local"
+
+        embed_documents = HashingEmbeddings.embed_documents
+        calls = []
+
+        def slow_embed(self, texts):
+            calls.append(len(texts))
+            time.sleep(0.05)
+            return embed_documents(self, texts)
+
+        results = []
+        with patch.object(HashingEmbeddings, "embed_documents", autospec=True, side_effect=slow_embed):
+            threads = [
+                threading.Thread(target=lambda: results.append(answer_question("¿Qué reputación tiene el vendedor?", top_k=1)))
+                for _ in range(4)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(5)
+
+        assert calls == [2]
+        assert [r["sources"][0]["section"] for r in results] == ["Vendedor"] * 4
+
+
+class TestVectorStorage:
+    """Test compact vector storage with float re-rank"""
+    
+    def teardown_method(self):
+        os.environ.pop('RAG_VECTOR_STORAGE', None)
+    
+    @pytest.mark.parametrize("storage", ["float16", "int8"])
+    @patch('backend.rag._ensure_embedder')
+    def test_compact_storage_matches_float32(self, mock_ensure_embedder, storage):
+        """Test that compact storage returns the float32 ranking and exact scores"""
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((50, 32))
+        mock_embedder = MagicMock()
+        mock_embedder.embed_documents.return_value = vectors.tolist()
+        mock_ensure_embedder.return_value = mock_embedder
+        docs = [{"id": str(i), "section": "S", "text": f"doc {i}"} for i in range(50)]
+        query = vectors[7] + 0.1 * rng.standard_normal(32)
+        
+        ingest_corpus(docs)
+        expected_idxs, expected_scores = vector_search(query, 5)
+        
+        os.environ['RAG_VECTOR_STORAGE'] = storage
+        ingest_corpus(docs)
+        idxs, scores = vector_search(query, 5)
+        stats = vector_stats()
+        
+        assert list(idxs) == list(expected_idxs)
+        assert np.allclose(scores, expected_scores, atol=1e-5)
+        assert stats["storage"] == storage
+        assert stats["resident_bytes"] < 50 * 32 * 4
+
+
+class TestEmbeddingDimensions:
+    """Test Matryoshka dimension truncation"""
+    
+    def teardown_method(self):
+        for name in ('RAG_CANDIDATE_DIMENSIONS', 'RAG_EMBEDDING_DIMENSIONS', 'RAG_VECTOR_STORAGE'):
+            os.environ.pop(name, None)
+    
+    @patch('backend.rag.OpenAI')
+    def test_dimensions_passed_to_api(self, mock_openai):
+        """Test that a configured dimension is requested from the API"""
+        mock_client = MagicMock()
+        mock_client.embeddings.create.return_value = MagicMock(data=[MagicMock(index=0, embedding=[0.6, 0.8])])
+        mock_openai.return_value = mock_client
+        
+        OpenAIEmbeddings(api_key="sk-test123", dimensions=256).embed_query("hola")
+        
+        assert mock_client.embeddings.create.call_args.kwargs["dimensions"] == 256
+    
+    def test_embedder_follows_configured_dimensions(self):
+        """Test that changing the dimension setting rebuilds the embedder"""
+        os.environ['OPENAI_API_KEY'] = 'sk-test123'
+        
+        with patch('backend.rag.OpenAI'):
+            full = _ensure_embedder()
+            os.environ['RAG_EMBEDDING_DIMENSIONS'] = '512'
+            short = _ensure_embedder()
+        
+        assert full.dimensions is None
+        assert short.dimensions == 512
+    
+    @pytest.mark.parametrize("storage", ["float32", "int8"])
+    @patch('backend.rag._ensure_embedder')
+    def test_two_stage_search(self, mock_ensure_embedder, storage):
+        """Test short-vector candidates re-ranked with the full vectors"""
+        rng = np.random.default_rng(2)
+        vectors = rng.standard_normal((40, 64))
+        mock_embedder = MagicMock(model="test-embedding", dimensions=None)
+        mock_embedder.embed_documents.return_value = vectors.tolist()
+        mock_ensure_embedder.return_value = mock_embedder
+        docs = [{"id": str(i), "section": "S", "text": f"doc {i}"} for i in range(40)]
+        query = vectors[11] + 0.05 * rng.standard_normal(64)
+        
+        ingest_corpus(docs)
+        expected_idxs, expected_scores = vector_search(query, 3)
+        
+        os.environ['RAG_CANDIDATE_DIMENSIONS'] = '16'
+        os.environ['RAG_VECTOR_STORAGE'] = storage
+        ingest_corpus(docs)
+        idxs, scores = vector_search(query, 3)
+        
+        assert idxs[0] == expected_idxs[0] == 11
+        assert np.allclose(scores[0], expected_scores[0], atol=1e-5)
+        assert vector_stats()["candidate_dims"] == 16
+        assert index_metadata()["dims"] == 64
+        assert index_metadata()["embedder"] == "test-embedding@None"
+    
+    @patch('backend.rag._ensure_embedder')
+    def test_query_dimension_mismatch_detected(self, mock_ensure_embedder):
+        """Test that a query from a different vector space is rejected"""
+        mock_embedder = MagicMock(model="test-embedding", dimensions=None)
+        mock_embedder.embed_documents.return_value = np.eye(4).tolist()
+        mock_ensure_embedder.return_value = mock_embedder
+        ingest_corpus([{"id": str(i), "section": "S", "text": f"doc {i}"} for i in range(4)])
+        
+        with pytest.raises(ValueError, match="dims"):
+            vector_search(np.ones(8), 2)
+
+
 class TestRAGIntegration:
     """Test RAG integration scenarios"""
     
@@ -270,8 +639,8 @@ class TestRAGIntegration:
             assert isinstance(result["sources"], list)
             assert len(result["answer"]) > 0
     
-    @patch('rag.ChatOpenAI')
-    @patch('rag.OpenAIEmbeddings')
+    @patch('backend.rag.ChatOpenAI')
+    @patch('backend.rag.OpenAIEmbeddings')
     def test_workflow_with_dynamic_api_key(self, mock_embeddings, mock_chat):
         """Test RAG workflow with dynamic API key switching"""
         # Start without API key
@@ -0,0 +1,107 @@
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag
+from backend.querylog import QueryLog, read_query_log, set_query_log
+from backend.routing import ROUTES, route_question
+
+
+class TestRouteQuestion:
+    """Test route selection from question and retrieval features"""
+
+    def test_lookup_question_goes_light(self):
+        """Test short questions with a detected intent get the small budget"""
+        decision = route_question("¿Cuánto cuesta con cuotas?", [0.41, 0.40])
+
+        assert decision.route.name == "light"
+        assert decision.reason == "intent"
+        assert decision.features["intent"] is not None
+
+    def test_confident_retrieval_goes_light(self):
+        """Test a short question with one clearly best document"""
+        assert route_question("¿Es resistente al agua?", [0.62, 0.35]).reason == "confident_retrieval"
+        assert route_question("¿Es resistente al agua?", [0.42, 0.40]).route.name == "standard"
+
+    def test_comparison_goes_heavy(self):
+        """Test comparisons and long questions take the larger path"""
+        assert route_question("¿Es mejor que el Galaxy A54?", [0.7, 0.3]).reason == "complex"
+        long_question = " ".join(["palabra"] * 30)
+        assert route_question(long_question).reason == "long"
+
+    def test_routes_grow_with_difficulty(self):
+        """Test the light route is cheaper than standard, and heavy larger"""
+        light, standard, heavy = ROUTES["light"], ROUTES["standard"], ROUTES["heavy"]
+
+        assert light.max_tokens < heavy.max_tokens
+        assert standard.max_tokens is None  # no completion cap, as before routing
+        assert light.context_tokens < standard.context_tokens < heavy.context_tokens
+
+    def test_disabled(self, monkeypatch):
+        """Test RAG_ROUTING=off keeps every question on the standard route"""
+        monkeypatch.setenv("RAG_ROUTING", "off")
+
+        decision = route_question("¿Es mejor que el Galaxy A54?", [0.7, 0.3])
+        assert decision.route.name == "standard"
+        assert decision.reason == "disabled"
+
+
+class TestRoutedAnswers:
+    """Test the route is applied to the LLM call and logged"""
+
+    def setup_method(self):
+        """Use local embeddings with a mocked LLM"""
+        os.environ["RAG_EMBEDDINGS"] = "local"
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+
+    def teardown_method(self):
+        os.environ.pop("RAG_EMBEDDINGS", None)
+        os.environ.pop("OPENAI_API_KEY", None)
+
+    def mock_llm(self):
+        llm = MagicMock()
+        llm.model = "mock"
+        llm.invoke.return_value = rag.ChatResult(content="respuesta")
+        return llm
+
+    def test_route_applied(self):
+        """Test model, max_tokens and context budget follow the route"""
+        rag.ingest_corpus([
+            {"id": "camera", "section": "Cámara", "text": "Cámara principal de 50 MP con estabilización óptica."},
+            {"id": "battery", "section": "Batería", "text": "Batería de 5000 mAh con carga rápida de 25 W."},
+        ])
+        llm = self.mock_llm()
+        with patch.object(rag, "_ensure_llm", return_value=llm) as ensure_llm:
+            result = rag.answer_question("¿Es mejor que el Galaxy A54 en cámara?", top_k=2)
+
+        heavy = ROUTES["heavy"]
+        ensure_llm.assert_called_once_with(heavy.model)
+        assert llm.invoke.call_args.kwargs["max_tokens"] == heavy.max_tokens
+        assert result["usage"]["context_budget"] == heavy.context_tokens
+        assert result["routing"]["route"] == "heavy"
+        assert result["routing"]["reason"] == "complex"
+
+    def test_decision_logged_not_returned(self, tmp_path):
+        """Test /agent/chat writes the decision to the query log only"""
+        from backend.main import app
+
+        log = QueryLog(str(tmp_path / "query.jsonl"))
+        previous = set_query_log(log)
+        try:
+            with TestClient(app) as client, patch.object(rag, "_ensure_llm", return_value=self.mock_llm()):
+                data = client.post("/agent/chat", json={"question": "¿Qué dicen de la cámara?"}).json()
+        finally:
+            set_query_log(previous)
+            log.close()
+
+        assert "routing" not in data
+        assert "route" not in data["usage"]
+        record = next(read_query_log(log.path))
+        assert record["routing"]["route"] in ROUTES
+        assert {"words", "margin", "top_score", "model", "max_tokens"} <= set(record["routing"])
+        assert f"route:{record['routing']['route']}" in record["events"]
@@ -0,0 +1,61 @@
+import pytest
+import json
+import os
+import sys
+import numpy as np
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.serialization import StaticJSON, json_response, model_response
+from backend.main import app, SAMPLE_ITEM, REVIEWS_DATA, ItemDetail, ReviewsData
+
+client = TestClient(app)
+
+
+class TestFastResponses:
+    """Test the response helpers"""
+
+    def test_model_response_matches_model_dump(self):
+        """Test that bytes decode to the same data FastAPI would return"""
+        response = model_response(SAMPLE_ITEM)
+
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == SAMPLE_ITEM.model_dump(mode="json")
+
+    def test_static_json_serialized_once(self):
+        """Test that every response shares the precomputed body"""
+        static = StaticJSON(REVIEWS_DATA)
+
+        assert static.response().body is static.body
+        assert json.loads(static.body)["total_reviews"] == REVIEWS_DATA.total_reviews
+
+    def test_json_response_accepts_numpy(self):
+        """Test that NumPy scores from retrieval serialize"""
+        response = json_response({"score": np.float32(0.5), "ids": np.arange(3)})
+
+        assert json.loads(response.body) == {"score": 0.5, "ids": [0, 1, 2]}
+
+
+class TestEndpointPayloads:
+    """Test that the fast path keeps the documented schema"""
+
+    def test_item_validates_against_schema(self):
+        """Test /item still matches its response_model"""
+        data = client.get("/item").json()
+
+        assert ItemDetail.model_validate(data) == SAMPLE_ITEM
+
+    def test_reviews_validates_against_schema(self):
+        """Test /reviews still matches its response_model"""
+        data = client.get("/reviews").json()
+
+        assert ReviewsData.model_validate(data) == REVIEWS_DATA
+
+    def test_openapi_keeps_response_models(self):
+        """Test that the OpenAPI schema still documents the models"""
+        schema = client.get("/openapi.json").json()
+        item_schema = schema["paths"]["/item"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+        assert item_schema["$ref"].endswith("/ItemDetail")
@@ -0,0 +1,179 @@
+import pytest
+import os
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag
+from backend import sharedindex
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DOCS = [
+    {"id": "battery", "section": "Batería", "text": "La batería tiene 5000mAh y dura todo el día"},
+    {"id": "camera", "section": "Cámara", "text": "La cámara de 50MP saca buenas fotos de noche"},
+    {"id": "seller", "section": "Vendedor", "text": "Samsung Official Store reputación Platinum"},
+]
+WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from backend import sharedindex, rag
+docs = [{{"id": str(i), "section": "S", "text": "documento número %d" % i}} for i in range(50)]
+print(sharedindex.start(docs, "ficha", directory={directory!r}), sharedindex.generation(), rag.vector_stats()["resident_bytes"])
+"""
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """A fresh worker's module state, with local embeddings"""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("RAG_EMBEDDINGS", "local")
+    monkeypatch.setattr(sharedindex, "_directory", None)
+    monkeypatch.setattr(sharedindex, "_attached", None)
+    monkeypatch.setattr(sharedindex, "_checked_at", 0.0)
+    monkeypatch.setattr(sharedindex, "POLL_S", 0.0)
+    rag.ingest_corpus([])
+    yield
+    rag.ingest_corpus([])
+
+
+def new_worker():
+    """Forget the index, as a newly started process would"""
+    rag.ingest_corpus([])
+    rag._embedder = None
+    sharedindex._attached = None
+
+
+class TestSharedIndex:
+    """Test one published index served to every worker"""
+
+    def test_first_worker_publishes(self, worker, tmp_path):
+        """Test the leader builds generation 1 and serves it memory-mapped"""
+        assert sharedindex.start(DOCS, "ficha", directory=str(tmp_path)) == "published"
+
+        assert sharedindex.current_generation(str(tmp_path)) == 1
+        assert isinstance(rag._EMBEDDINGS, np.memmap)
+        assert rag.vector_stats()["resident_bytes"] == 0
+        assert rag.index_metadata()["generation"] == 1
+        assert rag.answer_question("¿Qué reputación tiene el vendedor?", top_k=1)["sources"][0]["section"] == "Vendedor"
+
+    def test_next_worker_attaches(self, worker, tmp_path):
+        """Test later workers map the published arrays without embedding"""
+        sharedindex.start(DOCS, "ficha", directory=str(tmp_path))
+        vectors = np.array(rag._EMBEDDINGS)
+        new_worker()
+
+        with patch.object(rag.HashingEmbeddings, "embed_documents", side_effect=AssertionError("re-embedded")):
+            assert sharedindex.start(DOCS, "ficha", directory=str(tmp_path)) == "attached"
+
+        np.testing.assert_array_equal(rag._EMBEDDINGS, vectors)
+        assert rag.prefetch("¿Cómo es la cámara de noche?") == "warmed"
+        assert rag.answer_question("¿Cómo es la cámara de noche?", top_k=1)["sources"][0]["section"] == "Cámara"
+
+    def test_other_corpus_republished(self, worker, tmp_path):
+        """Test a deploy with a changed corpus publishes a new generation"""
+        sharedindex.start(DOCS, "ficha", directory=str(tmp_path))
+        new_worker()
+
+        assert sharedindex.start(DOCS[:2], "ficha", directory=str(tmp_path)) == "published"
+        assert sharedindex.generation() == 2
+        assert len(rag._DOCS) == 2
+
+    def test_compact_storage_shared(self, worker, tmp_path, monkeypatch):
+        """Test int8 codes are published as built, not re-quantized per worker"""
+        monkeypatch.setenv("RAG_VECTOR_STORAGE", "int8")
+        sharedindex.start(DOCS, directory=str(tmp_path))
+        new_worker()
+        sharedindex.start(DOCS, directory=str(tmp_path))
+
+        assert isinstance(rag._COMPACT, np.memmap)
+        assert rag.vector_stats()["storage"] == "int8"
+        assert rag.answer_question("¿Qué reputación tiene el vendedor?", top_k=1)["sources"][0]["section"] == "Vendedor"
+
+    def test_reload_reaches_other_workers(self, worker, tmp_path):
+        """Test a reload is picked up on refresh and old generations pruned"""
+        directory = str(tmp_path)
+        sharedindex.start(DOCS, directory=directory)
+        stale = os.path.join(directory, "gen-1")
+
+        assert sharedindex.reload(DOCS[:2]) == 2
+        # A worker still serving generation 1
+        rag.attach_index(stale, generation=1)
+        sharedindex._attached = 1
+
+        assert sharedindex.refresh()
+        assert rag.index_metadata()["generation"] == 2
+        assert len(rag._DOCS) == 2
+        assert not sharedindex.refresh()
+
+        sharedindex.reload(DOCS)
+        assert sorted(n for n in os.listdir(directory) if n.startswith("gen-")) == ["gen-2", "gen-3"]
+
+    def test_swap_waits_for_retrieval(self, worker, tmp_path):
+        """Test an index swap never lands in the middle of a retrieval"""
+        directory = str(tmp_path)
+        sharedindex.start(DOCS, directory=directory)
+        sharedindex.reload(DOCS[:1])
+
+        with rag._INDEX_LOCK.read():
+            swap = threading.Thread(target=rag.attach_index, args=(os.path.join(directory, "gen-1"),))
+            swap.start()
+            time.sleep(0.05)
+            assert swap.is_alive()
+            assert len(rag._DOCS) == 1
+        swap.join(5)
+
+        assert len(rag._DOCS) == 3
+
+    def test_one_leader_across_processes(self, tmp_path):
+        """Test concurrently started workers build the index once"""
+        env = dict(os.environ, RAG_EMBEDDINGS="local")
+        env.pop("OPENAI_API_KEY", None)
+        script = WORKER.format(root=ROOT_DIR, directory=str(tmp_path))
+        workers = [
+            subprocess.Popen([sys.executable, "-c", script], env=env, stdout=subprocess.PIPE, text=True)
+            for _ in range(3)
+        ]
+        results = sorted(w.communicate(timeout=60)[0].split() for w in workers)
+
+        assert [r[0] for r in results] == ["attached", "attached", "published"]
+        assert {r[1] for r in results} == {"1"}
+        assert {r[2] for r in results} == {"0"}
+
+
+class TestReindexEndpoint:
+    """Test POST /admin/reindex"""
+
+    def test_requires_admin_token(self, worker, monkeypatch):
+        """Test the endpoint is hidden without the admin token"""
+        from backend.main import app
+
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        with TestClient(app) as client:
+            assert client.post("/admin/reindex").status_code == 404
+            response = client.post("/admin/reindex", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200
+        assert response.json() == {"corpus_version": rag.corpus_version(), "generation": None}
+
+    def test_publishes_generation(self, worker, tmp_path, monkeypatch):
+        """Test workers started in shared mode reindex into a new generation"""
+        from backend.main import app
+
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        monkeypatch.setattr(sharedindex, "SHARED_DIR", str(tmp_path))
+        with TestClient(app) as client:
+            assert sharedindex.generation() == 1
+            response = client.post("/admin/reindex", headers={"X-Admin-Token": "secret"})
+            chat = client.post("/agent/chat", json={"question": "¿Qué dicen de la batería?"})
+
+        assert response.json()["generation"] == 2
+        assert chat.status_code == 200
+        assert rag.index_metadata()["generation"] == 2
@@ -0,0 +1,123 @@
+import pytest
+import os
+import sys
+import numpy as np
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import rag
+
+
+DOCS = [
+    {"id": "battery", "section": "Batería", "text": "La batería tiene 5000mAh y dura todo el día"},
+    {"id": "camera", "section": "Cámara", "text": "La cámara de 50MP saca buenas fotos de noche"},
+    {"id": "seller", "section": "Vendedor", "text": "Samsung Official Store reputación Platinum"},
+]
+SHEET = "Producto: Galaxy A55"
+
+
+class TestSnapshot:
+    """Test saving and restoring the RAG index state"""
+
+    def setup_method(self):
+        """Local embeddings, no LLM"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        os.environ["RAG_EMBEDDINGS"] = "local"
+
+    def teardown_method(self):
+        os.environ.pop("RAG_EMBEDDINGS", None)
+        os.environ.pop("RAG_VECTOR_STORAGE", None)
+
+    def test_round_trip(self, tmp_path):
+        """Test a fresh embedder restores the same index, IDF and warm caches"""
+        path = str(tmp_path / "rag.npz")
+        rag.ingest_corpus(DOCS, product_sheet=SHEET)
+        assert rag.prefetch("¿Cómo es la cámara de noche?") == "warmed"
+        vectors = np.array(rag._EMBEDDINGS)
+        query = rag._ensure_embedder().embed_query("batería")
+        assert rag.snapshot(path)
+
+        rag.ingest_corpus([{"id": "x", "section": "Otro", "text": "otro producto"}])
+        rag._embedder = None
+        assert rag.restore(path)
+
+        assert rag._DOCS == DOCS
+        assert rag.corpus_version() == rag._corpus_version(DOCS, SHEET)
+        assert SHEET in rag.prompt_prefix("es")
+        np.testing.assert_allclose(rag._EMBEDDINGS, vectors)
+        np.testing.assert_allclose(rag._ensure_embedder().embed_query("batería"), query)
+        assert rag.keyword_search("reputación Platinum", top_k=1) == [(2, 2)]
+        assert rag.prefetch("¿Cómo es la cámara de noche?") == "cached"
+        assert rag.answer_question("¿Cómo es la cámara de noche?", top_k=1)["sources"][0]["section"] == "Cámara"
+
+    def test_compact_storage_rebuilt(self, tmp_path):
+        """Test the configured vector storage is applied on restore"""
+        path = str(tmp_path / "rag.npz")
+        rag.ingest_corpus(DOCS)
+        rag.snapshot(path)
+
+        os.environ["RAG_VECTOR_STORAGE"] = "int8"
+        assert rag.restore(path)
+
+        assert rag.vector_stats()["storage"] == "int8"
+        assert rag.answer_question("¿Qué reputación tiene el vendedor?", top_k=1)["sources"][0]["section"] == "Vendedor"
+
+    def test_other_corpus_rejected(self, tmp_path):
+        """Test a snapshot of another corpus leaves the state untouched"""
+        path = str(tmp_path / "rag.npz")
+        rag.ingest_corpus(DOCS[:1])
+        rag.snapshot(path)
+        rag.ingest_corpus(DOCS)
+
+        assert not rag.restore(path, DOCS, SHEET)
+        assert not rag.restore(str(tmp_path / "missing.npz"))
+        assert rag._DOCS == DOCS
+
+    def test_other_embedder_rejected(self, tmp_path):
+        """Test keyword-only state isn't restored when vectors can be built"""
+        path = str(tmp_path / "rag.npz")
+        os.environ["RAG_EMBEDDINGS"] = "openai"
+        rag.ingest_corpus(DOCS)
+        rag.snapshot(path)
+
+        os.environ["RAG_EMBEDDINGS"] = "local"
+        assert not rag.restore(path)
+
+    def test_ingest_or_restore(self, tmp_path):
+        """Test the second start skips embedding the corpus"""
+        path = str(tmp_path / "rag.npz")
+        assert rag.ingest_or_restore(DOCS, SHEET, path=path) == "ingested"
+
+        with patch.object(rag.HashingEmbeddings, "embed_documents", side_effect=AssertionError("re-embedded")):
+            assert rag.ingest_or_restore(DOCS, SHEET, path=path) == "restored"
+        assert rag.ingest_or_restore(DOCS[:2], SHEET, path=path) == "ingested"
+
+    def test_unreadable_snapshot_ingests(self, tmp_path):
+        """Test a corrupt file falls back to ingesting"""
+        path = tmp_path / "rag.npz"
+        path.write_bytes(b"not a snapshot")
+
+        assert rag.ingest_or_restore(DOCS, SHEET, path=str(path)) == "ingested"
+        assert rag.restore(str(path), DOCS, SHEET)
+
+    def test_startup_and_shutdown_hooks(self, tmp_path, monkeypatch):
+        """Test the app restores before serving and saves its caches on shutdown"""
+        from backend.main import app
+
+        path = str(tmp_path / "rag.npz")
+        monkeypatch.setattr(rag, "SNAPSHOT_PATH", path)
+        with TestClient(app) as client:
+            client.post("/agent/prefetch", json={"question": "¿Qué dicen de la batería?"})
+        assert os.path.exists(path)
+
+        rag.ingest_corpus([])
+        with patch.object(rag.HashingEmbeddings, "embed_documents", side_effect=AssertionError("re-embedded")), \
+                TestClient(app) as client:
+            assert len(rag._RETRIEVALS) == 1
+            response = client.post("/agent/prefetch", json={"question": "¿Qué dicen de la batería?"})
+
+        assert response.json() == {"status": "cached"}
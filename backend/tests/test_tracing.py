@@ -0,0 +1,130 @@
+import pytest
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import tracing
+from backend.tracing import InMemorySpanExporter, JsonLinesSpanExporter, SpanExporter, exporter_from_env, set_exporter, span
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    previous = set_exporter(exporter)
+    yield exporter
+    set_exporter(previous)
+
+
+class TestSpans:
+    """Test span nesting and export"""
+
+    def test_children_share_trace(self, exporter):
+        """Test that nested spans link to their parent and trace"""
+        with span("parent", top_k=3) as parent:
+            with span("child") as child:
+                child.set_attribute("doc_ids", ["a", "b"])
+
+        child_span, parent_span = exporter.spans
+        assert child_span.trace_id == parent_span.trace_id
+        assert child_span.parent_id == parent_span.span_id
+        assert parent_span.parent_id is None
+        assert parent_span.attributes == {"top_k": 3}
+        assert child_span.attributes["doc_ids"] == ["a", "b"]
+        assert parent_span.duration_ms >= child_span.duration_ms
+
+    def test_error_status(self, exporter):
+        """Test that exceptions mark the span and propagate"""
+        with pytest.raises(RuntimeError):
+            with span("llm"):
+                raise RuntimeError("upstream timeout")
+
+        assert exporter.spans[0].status == "error"
+        assert "upstream timeout" in exporter.spans[0].error
+
+    def test_disabled_yields_none(self):
+        """Test that tracing is a no-op without an exporter"""
+        previous = set_exporter(None)
+        try:
+            with span("chat") as s:
+                assert s is None
+        finally:
+            set_exporter(previous)
+
+    def test_json_lines_exporter(self, tmp_path):
+        """Test that the file exporter writes one JSON object per span"""
+        path = tmp_path / "spans.jsonl"
+        previous = set_exporter(JsonLinesSpanExporter(path=str(path)))
+        try:
+            with span("search_endpoint"):
+                with span("tavily", status_code=200):
+                    pass
+        finally:
+            set_exporter(previous)
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["name"] for r in records] == ["tavily", "search_endpoint"]
+        assert records[0]["attributes"]["status_code"] == 200
+
+    def test_exporter_from_env(self, tmp_path):
+        """Test the TRACE_EXPORTER setting"""
+        with patch.dict(os.environ, {"TRACE_EXPORTER": f"file:{tmp_path / 'x.jsonl'}"}):
+            assert isinstance(exporter_from_env(), JsonLinesSpanExporter)
+        with patch.dict(os.environ, {"TRACE_EXPORTER": "bogus"}):
+            with pytest.raises(ValueError):
+                exporter_from_env()
+
+    def test_exporter_interface(self):
+        """Test exporters must implement export()"""
+        class Incomplete(SpanExporter):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+        assert isinstance(InMemorySpanExporter(), SpanExporter)
+
+
+class TestChatTrace:
+    """Test the span tree of a chat request"""
+
+    def setup_method(self):
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+        os.environ["RAG_EMBEDDINGS"] = "local"
+
+    def teardown_method(self):
+        os.environ.pop("RAG_EMBEDDINGS", None)
+
+    def test_chat_retrieval_embed_llm(self, exporter):
+        """Test chat_endpoint -> answer_question -> retrieval -> embed, and the LLM call"""
+        from backend import rag
+        from backend.main import app
+
+        llm = MagicMock()
+        llm.model = "gpt-4o-mini"
+        llm.invoke.return_value = rag.ChatResult(
+            content="Tiene buena cámara.",
+            response_metadata={"token_usage": {"prompt_tokens": 900, "completion_tokens": 12,
+                                               "prompt_tokens_details": {"cached_tokens": 768}}},
+        )
+        with TestClient(app) as client, patch.object(rag, "_ensure_llm", return_value=llm):
+            exporter.clear()
+            response = client.post(
+                "/agent/chat", json={"question": "¿Cómo es la cámara?", "openai_key": "sk-test"}
+            )
+
+        assert response.status_code == 200
+        spans = {s.name: s for s in exporter.spans}
+        assert spans["answer_question"].parent_id == spans["chat_endpoint"].span_id
+        assert spans["retrieval"].parent_id == spans["answer_question"].span_id
+        assert spans["embed"].parent_id == spans["retrieval"].span_id
+        assert spans["llm"].parent_id == spans["answer_question"].span_id
+        assert len(spans["retrieval"].attributes["doc_ids"]) == 4
+        assert spans["llm"].attributes["cached_tokens"] == 768
+        assert spans["llm"].attributes["prefix_cache"] in ("hit", "miss")
+        assert spans["chat_endpoint"].attributes["path"] == "rag"
+        assert len({s.trace_id for s in exporter.spans}) == 1
@@ -0,0 +1,114 @@
+import pytest
+import importlib.util
+import os
+import sys
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the repository root to the path so we can import the backend package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import federation
+from backend import main
+from backend import rag
+from backend import serving
+from backend.benchmarks.stubs import StubServer
+from backend.faqs import FAQTable
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "api", "index.py")
+
+
+@pytest.fixture(scope="module")
+def vercel():
+    """api/index.py loaded the way the Vercel runtime loads it"""
+    spec = importlib.util.spec_from_file_location("vercel_index", INDEX_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestVercelFunction:
+    """Test the Vercel function runs on the shared engine"""
+
+    def setup_method(self):
+        """Keep chat offline"""
+        if 'OPENAI_API_KEY' in os.environ:
+            del os.environ['OPENAI_API_KEY']
+
+    def test_shared_engine(self, vercel):
+        """Test the function uses the backend modules, not copies"""
+        for name in ("chat", "chat_response", "prefetch_status", "require_admin", "search_response"):
+            assert getattr(vercel, name) is getattr(serving, name)
+            assert getattr(main, name) is getattr(serving, name)
+        assert vercel.ChatRequest.model_fields["language"].default == "es"
+
+    def test_localized_routes(self, vercel):
+        """Test both route prefixes and the localized catalog"""
+        client = TestClient(vercel.app)
+
+        item = client.get("/py-api/item?lang=en")
+        legacy = client.get("/item?lang=pt")
+        answer = client.post("/py-api/agent/chat", json={"question": "How much does it cost?", "language": "en"})
+
+        assert item.status_code == 200
+        assert item.json()["title"].endswith("(Light Blue)")
+        assert legacy.json()["title"].endswith("(Azul Claro)")
+        assert answer.json()["intent"] == "price"
+        assert answer.json()["answer"].startswith("The price is")
+        assert "server-timing" in answer.headers
+
+    def test_static_revalidation(self, vercel):
+        """Test localized payloads are precompressed and answer 304"""
+        client = TestClient(vercel.app)
+
+        first = client.get("/py-api/reviews?lang=en", headers={"Accept-Encoding": "gzip"})
+        again = client.get("/py-api/reviews?lang=en", headers={"If-None-Match": first.headers["etag"]})
+        other = client.get("/py-api/reviews?lang=pt", headers={"If-None-Match": first.headers["etag"]})
+
+        assert first.headers["content-encoding"] == "gzip"
+        assert "max-age" in first.headers["cache-control"]
+        assert again.status_code == 304
+        assert other.status_code == 200
+
+    def test_chat_served_from_faq_table(self, vercel):
+        """Test the function answers precomputed questions like the uvicorn app"""
+        client = TestClient(vercel.app)
+        vercel._ensure_docs()
+        table = FAQTable()
+        table.put(vercel.SAMPLE_ITEM.id, "en", "How is the camera?",
+                  {"answer": "Great camera", "sources": []}, rag.corpus_version())
+
+        with patch.object(vercel, "FAQ_TABLE", table):
+            data = client.post("/py-api/agent/chat", json={"question": "how is the camera?", "language": "en"}).json()
+
+        assert data["answer"] == "Great camera"
+        assert data["faq"] == "How is the camera?"
+
+    def test_chat_without_key(self, vercel):
+        """Test questions that need the LLM get the localized key prompt"""
+        data = TestClient(vercel.app).post(
+            "/py-api/agent/chat", json={"question": "How is the camera?", "language": "en"}
+        ).json()
+
+        assert data == {"answer": vercel.TRANSLATIONS["en"]["no_api_key"], "sources": []}
+
+    def test_admin_guard(self, vercel, monkeypatch):
+        """Test the admin endpoints are hidden without the token"""
+        client = TestClient(vercel.app)
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+        missing = client.post("/py-api/admin/profile?seconds=0.1")
+        wrong = client.post("/py-api/admin/profile?seconds=0.1", headers={"X-Admin-Token": "nope"})
+
+        assert missing.status_code == 404
+        assert wrong.status_code == 404
+
+    def test_search_is_federated(self, vercel, monkeypatch):
+        """Test /py-api/search goes through the shared search client"""
+        monkeypatch.setenv("SEARCH_PROVIDERS", "mercadolibre,amazon")
+        monkeypatch.setenv("TAVILY_API_KEY", "tvly-stub")
+        with StubServer() as stub, patch.object(federation, "TAVILY_API_URL", f"{stub.url}/search"):
+            response = TestClient(vercel.app).post("/py-api/search", json={"query": "galaxy a55"})
+
+        assert response.status_code == 200
+        assert response.json()["results"][0]["sources"] == ["mercadolibre", "amazon"]
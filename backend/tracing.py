@@ -0,0 +1,161 @@
+"""
+Lightweight OpenTelemetry-style tracing.
+
+Spans nest through a context variable (so they follow requests into the
+threadpool) and are handed to a pluggable exporter when they end. Exporters:
+in-memory (tests), JSON lines to a file or stdout (production, no collector
+needed). Select one with TRACE_EXPORTER=memory|stdout|file:<path>; tracing
+is a no-op when it is unset.
+"""
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+_CURRENT_SPAN: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class SpanExporter(ABC):
+    """Receives every finished span."""
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        ...
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def by_name(self, name: str) -> List[Span]:
+        return [s for s in self.spans if s.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """One JSON object per span, appended to a file (or a stream such as stdout)."""
+
+    def __init__(self, path: Optional[str] = None, stream=None):
+        self._path = path
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._stream is not None:
+                self._stream.write(line)
+                self._stream.flush()
+            else:
+                with open(self._path, "a", encoding="utf-8") as f:
+                    f.write(line)
+
+
+def exporter_from_env() -> Optional[SpanExporter]:
+    setting = os.getenv("TRACE_EXPORTER", "").strip()
+    if not setting:
+        return None
+    if setting == "memory":
+        return InMemorySpanExporter()
+    if setting == "stdout":
+        return JsonLinesSpanExporter(stream=sys.stdout)
+    if setting.startswith("file:"):
+        return JsonLinesSpanExporter(path=setting[len("file:"):])
+    raise ValueError(f"Unknown TRACE_EXPORTER: {setting!r} (expected memory, stdout or file:<path>)")
+
+
+_exporter: Optional[SpanExporter] = exporter_from_env()
+
+
+def set_exporter(exporter: Optional[SpanExporter]) -> Optional[SpanExporter]:
+    """Install an exporter (None disables tracing); returns the previous one."""
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    return previous
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a child of the current span. Yields None when tracing is off, so
+    callers guard attribute updates with `if s:`."""
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+    current = Span(name, parent=_CURRENT_SPAN.get(), attributes=attributes)
+    token = _CURRENT_SPAN.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.error = f"{type(exc).__name__}: {exc}"[:200]
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        current.end_ns = time.time_ns()
+        try:
+            exporter.export(current)
+        except Exception as exc:  # tracing must never break a request
+            print(f"Trace export error: {exc}")
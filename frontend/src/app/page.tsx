@@ -4,6 +4,7 @@ import Image from "next/image";
 import { useEffect, useMemo, useState, useRef } from "react";
 import styles from "./page.module.css";
 
+const ITEM_ID = "MLA123456";
 const API_URL = process.env.NEXT_PUBLIC_API_URL || (typeof window !== 'undefined' ? '/py-api' : 'http://127.0.0.1:8000');
 
 type Language = 'es' | 'pt' | 'en';
@@ -385,6 +386,17 @@ interface ReviewsData {
   reviews: Review[];
 }
 
+interface FAQ {
+  question: string;
+  answer: string;
+}
+
+interface PageData {
+  item: ItemDetail;
+  reviews: ReviewsData;
+  faqs: FAQ[];
+}
+
 interface SearchResult {
   title: string;
   url: string;
@@ -505,12 +517,15 @@ export default function Home() {
   const [alsoBoughtIndex, setAlsoBoughtIndex] = useState<number>(0);
   const [sellerProductsIndex, setSellerProductsIndex] = useState<number>(0);
   const [reviews, setReviews] = useState<ReviewsData | null>(null);
+  const [faqs, setFaqs] = useState<FAQ[]>([]);
   const [chatOpen, setChatOpen] = useState<boolean>(false);
   const [chatMessages, setChatMessages] = useState<{role: 'user'|'bot', text: string, timestamp: Date}[]>([]);
   const [chatInput, setChatInput] = useState<string>("");
   const [openaiKey, setOpenaiKey] = useState<string>("");
   const [isTyping, setIsTyping] = useState<boolean>(false);
   const chatBodyRef = useRef<HTMLDivElement>(null);
+  const prefetchTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const lastPrefetchRef = useRef<string>("");
   
   // Search functionality
   const [searchQuery, setSearchQuery] = useState<string>("");
@@ -549,25 +564,19 @@ export default function Home() {
   }, []);
 
   useEffect(() => {
-    fetch(`${API_URL}/item?lang=${language}`)
+    // Item, reviews and suggested Q&A in a single round-trip
+    fetch(`${API_URL}/page/${ITEM_ID}?lang=${language}`)
       .then((res) => res.json())
-      .then((data: ItemDetail) => {
-        setItem(data);
+      .then((data: PageData) => {
+        setItem(data.item);
         // Set default selected image explicitly to ensure initial render shows the hero
-        const firstImage = Array.isArray(data.images) && data.images.length > 0 ? data.images[0] : "";
+        const firstImage = Array.isArray(data.item.images) && data.item.images.length > 0 ? data.item.images[0] : "";
         setSelectedImage(firstImage);
+        setReviews(data.reviews);
+        setFaqs(data.faqs || []);
       })
       .catch((error) => {
-        console.error("Failed to load item detail", error);
-      });
-
-    fetch(`${API_URL}/reviews?lang=${language}`)
-      .then((res) => res.json())
-      .then((data) => {
-        setReviews(data);
-      })
-      .catch((error) => {
-        console.error("Failed to load reviews", error);
+        console.error("Failed to load product page", error);
       });
   }, [language]);
 
@@ -639,9 +648,44 @@ export default function Home() {
     setSearchQuery("");
   };
 
+  // Warm retrieval for the question being typed, so submitting it only waits for the LLM
+  const handleChatInput = (value: string) => {
+    setChatInput(value);
+
+    if (prefetchTimeoutRef.current) {
+      clearTimeout(prefetchTimeoutRef.current);
+    }
+
+    const question = value.trim();
+    if (question.length < 8 || question === lastPrefetchRef.current) return;
+
+    prefetchTimeoutRef.current = setTimeout(() => {
+      lastPrefetchRef.current = question;
+      // Best effort: failures only mean the chat request does the work itself
+      fetch(`${API_URL}/agent/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question, openai_key: openaiKey || undefined, language })
+      }).catch(() => {});
+    }, 300); // 300ms debounce
+  };
+
+  const askFaq = (faq: FAQ) => {
+    // Answers come precomputed with the page, no chat round-trip
+    const now = new Date();
+    setChatMessages((m) => [
+      ...m,
+      { role: 'user', text: faq.question, timestamp: now },
+      { role: 'bot', text: faq.answer, timestamp: now },
+    ]);
+  };
+
   const sendChat = async () => {
     if (!chatInput.trim() || isTyping) return;
     const question = chatInput.trim();
+    if (prefetchTimeoutRef.current) {
+      clearTimeout(prefetchTimeoutRef.current);
+    }
     const now = new Date();
     setChatMessages((m) => [...m, { role: 'user', text: question, timestamp: now }]);
     setChatInput("");
@@ -1216,11 +1260,20 @@ export default function Home() {
               {!openaiKey && <><br/><br/><strong>{t.chatTip}</strong> {t.chatTipText}</>}
             </div>
           )}
+          {chatMessages.length === 0 && !isTyping && faqs.length > 0 && (
+            <div className={styles.chatSuggestions}>
+              {faqs.map((faq) => (
+                <button key={faq.question} type="button" onClick={() => askFaq(faq)}>
+                  {faq.question}
+                </button>
+              ))}
+            </div>
+          )}
         </div>
         <div className={styles.chatInputRow}>
           <input 
             value={chatInput} 
-            onChange={(e) => setChatInput(e.target.value)} 
+            onChange={(e) => handleChatInput(e.target.value)} 
             placeholder={t.chatPlaceholder}
             onKeyDown={(e) => { if (e.key === 'Enter' && !isTyping) sendChat(); }} 
             disabled={isTyping}
@@ -106,7 +106,7 @@ cleanup_processes() {
     fi
     
     # Kill any existing uvicorn or npm processes
-    pkill -f "uvicorn main:app" 2>/dev/null || true
+    pkill -f "uvicorn backend.main:app" 2>/dev/null || true
     pkill -f "npm run dev" 2>/dev/null || true
     
     sleep 2
@@ -117,15 +117,21 @@ cleanup_processes() {
 start_backend() {
     print_status "Starting backend server..."
     
-    cd backend
-    source .venv/bin/activate
-    
-    # Start backend in background
-    nohup uvicorn main:app --reload --host 127.0.0.1 --port 8000 > ../backend.log 2>&1 &
+    source backend/.venv/bin/activate
+    
+    # Start backend in background from the repository root, which imports it
+    # as the backend package. WORKERS=N (N > 1) starts N worker processes
+    # sharing one RAG index in RAG_SHARED_DIR; --reload needs a single process
+    WORKERS=${WORKERS:-1}
+    if [ "$WORKERS" -gt 1 ]; then
+        export RAG_SHARED_DIR=${RAG_SHARED_DIR:-$PWD/backend/.rag-index}
+        print_status "Starting $WORKERS workers sharing the index in $RAG_SHARED_DIR..."
+        nohup uvicorn backend.main:app --workers "$WORKERS" --host 127.0.0.1 --port 8000 > backend.log 2>&1 &
+    else
+        nohup uvicorn backend.main:app --reload --reload-dir backend --host 127.0.0.1 --port 8000 > backend.log 2>&1 &
+    fi
     BACKEND_PID=$!
     
-    cd ..
-    
     # Wait for backend to start
     print_status "Waiting for backend to start..."
     for i in {1..30}; do